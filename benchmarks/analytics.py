@@ -0,0 +1,101 @@
+"""Параллельная статистика по диапазонам ключей против одного GROUP BY по всей таблице
+
+Запуск: python -m benchmarks.analytics --messages 50000000 --workers 1 2 4 8
+
+Таблица заполняется одним INSERT ... SELECT из рекурсивного CTE; триггеры FTS,
+user_message_stats и ленты изменений удаляются заранее, иначе генерация 50 млн
+строк занимает часы.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.search import timed
+from pydantic_sqlalchemy import DatabaseService
+from pydantic_sqlalchemy.analytics import ParallelAnalytics
+
+GENERATED_TRIGGERS = (
+    'trg_messages_fts_insert',
+    'trg_messages_stats_insert',
+    'trg_messages_feed_insert',
+)
+
+
+def generate(path: Path, messages: int, users: int, days: int) -> DatabaseService:
+    """База со схемой ORM и messages сообщениями, равномерно по users и days"""
+    db_service = DatabaseService(f'sqlite:///{path}')
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_service.create_tables()
+    conn = sqlite3.connect(path)
+    for trigger in GENERATED_TRIGGERS:
+        conn.execute(f'DROP TRIGGER {trigger}')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executemany(
+        'INSERT INTO users (id, username, email, created_at) VALUES (?, ?, ?, ?)',
+        (
+            (i, f'user{i}', f'user{i}@example.com', '2024-01-01 00:00:00.000000')
+            for i in range(1, users + 1)
+        ),
+    )
+    # Одна строка на секунду периода: день от 2024-01-01 плюс смещение в секундах
+    conn.execute(
+        'WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) '
+        'INSERT INTO messages (id, user_id, message_text, created_at) '
+        "SELECT n, 1 + (n * 7919) % ?, 'x', "
+        "strftime('%Y-%m-%d %H:%M:%S.000000', '2024-01-01', ((n * 86400 * ?) / ?) || ' seconds') "
+        'FROM seq',
+        (messages, users, days, messages),
+    )
+    conn.commit()
+    conn.close()
+    return db_service
+
+
+def single_query(path: Path) -> None:
+    """Те же два GROUP BY, но по всей таблице в одном соединении"""
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        conn.execute(
+            'SELECT user_id, COUNT(*), MAX(created_at) FROM messages GROUP BY user_id'
+        ).fetchall()
+        conn.execute(
+            'SELECT substr(created_at, 1, 10), COUNT(*) FROM messages GROUP BY 1'
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=50_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'analytics.db'
+        print(f'🏗  Генерируем {args.messages:,} сообщений...')
+        start = time.perf_counter()
+        db_service = generate(path, args.messages, args.users, args.days)
+        print(f'  готово за {time.perf_counter() - start:.1f} с, ядер: {os.cpu_count()}')
+
+        baseline = timed(lambda: single_query(path), args.repeat)
+        print(f'⏱  Медиана из {args.repeat}, мс')
+        print(f'  {"вариант":<22} {"время, мс":>10} {"ускорение":>10}')
+        print(f'  {"один GROUP BY":<22} {baseline:10.0f} {1:10.2f}')
+        for workers in args.workers:
+            with ParallelAnalytics(db_service, workers=workers) as analytics:
+                analytics.aggregate()  # Прогрев: запуск процессов пула
+                elapsed = timed(analytics.aggregate, args.repeat)
+            name = f'{workers} процесс(ов)'
+            print(f'  {name:<22} {elapsed:10.0f} {baseline / elapsed:10.2f}')
+        db_service.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Нагрузочный тест: асинхронные сервисы против синхронных в пуле потоков
+
+Каждый "запрос" читает страницу сообщений пользователя, каждый десятый
+еще и пишет сообщение. Запуск: python -m benchmarks.async_load --requests 2000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.concurrency import prepare
+from pydantic_sqlalchemy import DatabaseService, EngineProfile, MessageCreate, MessageService
+from pydantic_sqlalchemy.async_services import AsyncDatabaseService, AsyncMessageService
+
+
+async def run_async(message_service: AsyncMessageService, user_ids, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(i):
+        async with semaphore:
+            user_id = user_ids[i % len(user_ids)]
+            await message_service.get_messages_page(limit=50, user_id=user_id)
+            if i % 10 == 0:
+                await message_service.create_message(
+                    MessageCreate(user_id=user_id, message_text='новое')
+                )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+async def run_threadpool(message_service: MessageService, user_ids, requests, concurrency):
+    loop = asyncio.get_running_loop()
+
+    def request(i):
+        user_id = user_ids[i % len(user_ids)]
+        message_service.get_messages_page(limit=50, user_id=user_id)
+        if i % 10 == 0:
+            message_service.create_message(MessageCreate(user_id=user_id, message_text='новое'))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        await asyncio.gather(
+            *(loop.run_in_executor(executor, request, i) for i in range(requests))
+        )
+    return time.perf_counter() - start
+
+
+async def compare(path: Path, user_ids, args) -> None:
+    # Оба движка живут в одном цикле событий, иначе соединения aiosqlite к нему не привязать
+    profile = EngineProfile.for_workers(max(args.concurrency))
+    sync_db = DatabaseService(f'sqlite:///{path}', profile)
+    async_db = AsyncDatabaseService(f'sqlite+aiosqlite:///{path}', profile)
+
+    print(f'⚡ {args.requests} запросов, запросов/с при разной конкурентности')
+    print(f'  {"конкурентность":>14} {"async":>10} {"потоки":>10}')
+    for concurrency in args.concurrency:
+        with contextlib.redirect_stdout(io.StringIO()):
+            async_elapsed = await run_async(
+                AsyncMessageService(async_db), user_ids, args.requests, concurrency
+            )
+            sync_elapsed = await run_threadpool(
+                MessageService(sync_db), user_ids, args.requests, concurrency
+            )
+        print(
+            f'  {concurrency:>14} {args.requests / async_elapsed:10,.0f}'
+            f' {args.requests / sync_elapsed:10,.0f}'
+        )
+
+    await async_db.dispose()
+    sync_db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'bench.db'
+        seed_db = DatabaseService(f'sqlite:///{path}')
+        user_ids = prepare(seed_db, args.users, args.messages)
+        seed_db.engine.dispose()
+        asyncio.run(compare(path, user_ids, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Сравнение скорости импорта пользователей: цикл create_user против create_users
+
+Запуск: python -m benchmarks.bulk_users --rows 20000
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic_sqlalchemy import DatabaseService, UserCreate, UserService
+
+
+def make_users(count: int, prefix: str) -> list[UserCreate]:
+    return [
+        UserCreate(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com')
+        for i in range(count)
+    ]
+
+
+def bench_loop(user_service: UserService, users: list[UserCreate]) -> float:
+    """Импорт по одному пользователю через create_user"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for user_data in users:
+            user_service.create_user(user_data)
+    return time.perf_counter() - start
+
+
+def bench_bulk(
+    user_service: UserService,
+    users: list[UserCreate],
+    batch_size: int,
+    on_conflict_do_nothing: bool = False,
+) -> float:
+    """Импорт пачками через create_users"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in user_service.create_users(
+            users, batch_size=batch_size, on_conflict_do_nothing=on_conflict_do_nothing
+        ):
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scenarios = [
+            ('create_user (цикл)', lambda s: bench_loop(s, make_users(args.rows, 'loop'))),
+            (
+                'create_users',
+                lambda s: bench_bulk(s, make_users(args.rows, 'bulk'), args.batch_size),
+            ),
+            (
+                'create_users + ON CONFLICT',
+                lambda s: bench_bulk(s, make_users(args.rows, 'upsert'), args.batch_size, True),
+            ),
+        ]
+
+        print(f'👥 Импорт {args.rows} пользователей, пачка {args.batch_size}')
+        for i, (name, run) in enumerate(scenarios):
+            db_service = DatabaseService(f'sqlite:///{Path(tmp) / f"bench{i}.db"}')
+            with contextlib.redirect_stdout(io.StringIO()):
+                db_service.create_tables()
+            elapsed = run(UserService(db_service))
+            print(f'  {name:<28} {elapsed:8.2f} с  {args.rows / elapsed:12,.0f} строк/с')
+            db_service.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
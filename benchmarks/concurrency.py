@@ -0,0 +1,116 @@
+"""Пропускная способность: несколько читателей и один писатель, до и после настройки SQLite
+
+Запуск: python -m benchmarks.concurrency --readers 8 --seconds 5
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    EngineProfile,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+
+
+def prepare(db_service: DatabaseService, users: int, messages: int) -> list[int]:
+    """Создает таблицы и начальные данные, возвращает ID пользователей"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_service.create_tables()
+        user_ids = [
+            result.user.id
+            for result in UserService(db_service).create_users(
+                UserCreate(username=f'user{i}', email=f'user{i}@example.com')
+                for i in range(users)
+            )
+        ]
+        MessageService(db_service).create_messages(
+            MessageCreate(user_id=user_ids[i % users], message_text=f'Сообщение {i}')
+            for i in range(messages)
+        )
+    return user_ids
+
+
+def run(db_service: DatabaseService, user_ids: list[int], readers: int, seconds: float) -> dict:
+    """Гоняет читателей и одного писателя seconds секунд, считает операции и ошибки"""
+    message_service = MessageService(db_service)
+    stop = threading.Event()
+    counters = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def count(name):
+        with lock:
+            counters[name] += 1
+
+    def reader(offset: int):
+        i = offset
+        while not stop.is_set():
+            try:
+                message_service.get_messages_page(limit=50, user_id=user_ids[i % len(user_ids)])
+                count('reads')
+            except OperationalError:
+                count('errors')
+            i += 1
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            try:
+                message_service.create_message(
+                    MessageCreate(user_id=user_ids[i % len(user_ids)], message_text='новое')
+                )
+                count('writes')
+            except OperationalError:
+                count('errors')
+            i += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=50000)
+    args = parser.parse_args()
+
+    profiles = [
+        ('без настройки', EngineProfile.untuned()),
+        ('WAL + PRAGMA', EngineProfile.for_workers(args.readers + 1)),
+    ]
+    print(f'🔀 {args.readers} читателей и 1 писатель, {args.seconds} с на профиль')
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (name, profile) in enumerate(profiles):
+            db_service = DatabaseService(f'sqlite:///{Path(tmp) / f"bench{i}.db"}', profile)
+            user_ids = prepare(db_service, args.users, args.messages)
+            counters = run(db_service, user_ids, args.readers, args.seconds)
+            print(
+                f'  {name:<14} чтений/с {counters["reads"] / args.seconds:10,.0f}'
+                f'  записей/с {counters["writes"] / args.seconds:8,.0f}'
+                f'  ошибок {counters["errors"]}'
+            )
+            db_service.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
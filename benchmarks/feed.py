@@ -0,0 +1,102 @@
+"""Лента изменений: опрос get_all_messages с diff против tail, задержка доставки subscribe
+
+Запуск: python -m benchmarks.feed --messages 200000 --posts 200
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.search import timed
+from benchmarks.workload import Workload
+from pydantic_sqlalchemy import MessageCreate, MessageService
+
+
+def feed_end(message_service: MessageService) -> int:
+    """seq последнего сообщения в ленте"""
+    since_seq = 0
+    while page := message_service.tail(since_seq, 10_000):
+        if not page.items:
+            return since_seq
+        since_seq = page.next_seq
+
+
+def follow(message_service: MessageService, posts: int, since_seq: int, poll, received: dict):
+    """Читает ленту, пока не получит posts сообщений; poll - функция чтения с since_seq"""
+    while len(received) < posts:
+        page = poll(since_seq)
+        now = time.perf_counter()
+        for message in page.items:
+            received[message.message_text] = now
+        since_seq = page.next_seq
+
+
+def delivery(message_service: MessageService, posts: int, interval: float, poll) -> list:
+    """Задержки от начала записи сообщения до его получения подписчиком, мс, по возрастанию"""
+    since_seq = feed_end(message_service)
+    received = {}
+    follower = threading.Thread(
+        target=follow, args=(message_service, posts, since_seq, poll, received)
+    )
+    follower.start()
+    sent = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(posts):
+            text = f'feed {time.perf_counter_ns()} {i}'
+            sent[text] = time.perf_counter()
+            message_service.create_message(MessageCreate(user_id=1, message_text=text))
+            time.sleep(interval)
+    follower.join()
+    return sorted((received[text] - sent[text]) * 1000 for text in sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=200, help='сообщений для замера задержки')
+    parser.add_argument('--interval', type=float, default=0.005, help='пауза между ними, с')
+    parser.add_argument('--poll', type=float, default=0.1, help='период опроса tail, с')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workload = Workload(users=args.users, messages=args.messages)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'🏗  {args.messages:,} сообщений в базе...')
+        message_service = MessageService(workload.load_orm(Path(tmp) / 'feed.db'))
+        seen = {message.id for message in message_service.get_all_messages()}
+        latest = feed_end(message_service)
+
+        def diff_poll():
+            return [m for m in message_service.get_all_messages() if m.id not in seen]
+
+        print(f'⏱  Проверка "есть ли новое", медиана из {args.repeat}, мс')
+        tail = timed(lambda: message_service.tail(latest), args.repeat)
+        print(f'  get_all_messages + diff: {timed(diff_poll, args.repeat):10.2f}')
+        print(f'  tail(since_seq):         {tail:10.2f}')
+
+        def polling(since_seq):
+            page = message_service.tail(since_seq)
+            if not page.items:
+                time.sleep(args.poll)
+            return page
+
+        print(f'📬 Задержка доставки {args.posts} сообщений, мс')
+        print(f'  {"способ":<26} {"p50":>8} {"p99":>8} {"max":>8}')
+        for name, poll in (
+            (f'опрос tail раз в {args.poll} с', polling),
+            ('subscribe', lambda since_seq: message_service.subscribe(since_seq, timeout=1)),
+        ):
+            latencies = delivery(message_service, args.posts, args.interval, poll)
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f'  {name:<26} {p50:8.2f} {p99:8.2f} {latencies[-1]:8.2f}')
+        message_service.db_service.dispose()
+
+
+if __name__ == '__main__':
+    main()
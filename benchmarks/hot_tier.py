@@ -0,0 +1,85 @@
+"""Горячий слой: последние сообщения активного пользователя из памяти против базы
+
+Запуск: python -m benchmarks.hot_tier --messages 200000 --limit 20
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.search import timed
+from benchmarks.workload import Workload
+from pydantic_sqlalchemy import MessageService
+from pydantic_sqlalchemy.hot_tier import HotMessageTier
+from pydantic_sqlalchemy.repositories import SQLiteMessageRepository
+
+
+def response_bytes(message_service: MessageService, user_ids, per_user: int) -> int:
+    """Память тех же сообщений в виде списков MessageResponse (tracemalloc)"""
+    tracemalloc.start()
+    kept = [message_service.repository.get_recent_by_user(u, per_user) for u in user_ids]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=20, help='сколько последних сообщений читать')
+    parser.add_argument('--per-user', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    workload = Workload(users=args.users, messages=args.messages)
+    hot_user = workload.hot_user_id()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'🏗  {args.messages:,} сообщений в базе...')
+        db_service = workload.load_orm(Path(tmp) / 'hot.db')
+        print(f'⏱  get_user_messages(самый активный, limit={args.limit}), медиана, мс')
+        for name, repository in (
+            ('ORM', None),
+            ('SQLite', SQLiteMessageRepository(db_service)),
+        ):
+            plain = MessageService(db_service, repository=repository)
+            tier = HotMessageTier(args.per_user)
+            hot = MessageService(db_service, repository=repository, hot_tier=tier)
+            with contextlib.redirect_stdout(io.StringIO()):
+                full = timed(lambda plain=plain: plain.get_user_messages(hot_user), 5)
+                recent = timed(
+                    lambda plain=plain: plain.get_user_messages(hot_user, limit=args.limit),
+                    args.repeat,
+                )
+                hot.get_user_messages(hot_user, limit=args.limit)  # Заполняет кольцо
+                cached = timed(
+                    lambda hot=hot: hot.get_user_messages(hot_user, limit=args.limit),
+                    args.repeat,
+                )
+            for label, ms in (
+                ('вся история', full),
+                ('база, limit', recent),
+                ('горячий слой', cached),
+            ):
+                print(f'  {name + ": " + label:<22} {ms:9.2f}')
+
+        tier = HotMessageTier(args.per_user)
+        plain = MessageService(db_service)
+        user_ids = range(1, args.users + 1)
+        for user_id in user_ids:
+            token = tier.begin_load(user_id)
+            tier.load(user_id, plain.repository.get_recent_by_user(user_id, args.per_user), token)
+        stats = tier.stats()
+        responses = response_bytes(plain, user_ids, args.per_user)
+        print(f'💾 Последние {args.per_user} сообщений {stats["users"]} пользователей')
+        print(f'  кольца:          {stats["bytes"] / stats["messages"]:8.0f} байт/сообщение')
+        print(f'  MessageResponse: {responses / stats["messages"]:8.0f} байт/сообщение')
+        db_service.dispose()
+
+
+if __name__ == '__main__':
+    main()
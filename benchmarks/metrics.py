@@ -0,0 +1,63 @@
+"""Накладные расходы инструментирования: те же запросы без метрик и с метриками
+
+Запуск: python -m benchmarks.metrics --messages 100000
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.search import timed
+from benchmarks.workload import Workload
+from pydantic_sqlalchemy import DatabaseService, MessageService
+from pydantic_sqlalchemy.metrics import Metrics, instrument, instrument_service
+
+ROUNDS = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workload = Workload(users=args.users, messages=args.messages)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'🏗  Генерируем {args.messages:,} сообщений...')
+        path = Path(tmp) / 'metrics.db'
+        plain_db = workload.load_orm(path)
+        # Второй сервис на тот же файл: замеры чередуются, прогрев кэшей одинаковый
+        metrics = Metrics(slow_threshold=None)
+        measured_db = DatabaseService(f'sqlite:///{path}')
+        instrument(measured_db, metrics)
+        services = {'plain': MessageService(plain_db), 'measured': MessageService(measured_db)}
+        instrument_service(services['measured'], metrics)
+
+        hot_user = workload.hot_user_id()
+        scenarios = {
+            'страница 1000': lambda s: s.get_messages_page(limit=1000),
+            'сообщения пользователя': lambda s: s.get_user_messages(hot_user),
+            'статистика': lambda s: s.get_conversation_stats(),
+        }
+        best = {}
+        for _ in range(ROUNDS):
+            for name, scenario in scenarios.items():
+                for kind, service in services.items():
+                    ms = timed(
+                        lambda scenario=scenario, service=service: scenario(service), args.repeat
+                    )
+                    best[name, kind] = min(best.get((name, kind), ms), ms)
+
+        print(f'⏱  Лучшая из {ROUNDS} медиан по {args.repeat} вызовов, мс')
+        print(f'  {"сценарий":<24} {"без метрик":>11} {"с метриками":>12} {"разница":>8}')
+        for name in scenarios:
+            plain, measured = best[name, 'plain'], best[name, 'measured']
+            print(f'  {name:<24} {plain:11.2f} {measured:12.2f} {measured / plain - 1:8.1%}')
+        print(f'📊 Запросов учтено: {sum(s.count for s in metrics.statements.values())}')
+        plain_db.dispose()
+        measured_db.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Удаление старых сообщений: один DELETE против пачек PurgeService под живой записью
+
+Запуск: python -m benchmarks.purge --messages 500000 --keep 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from sqlalchemy import delete
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.read_write import p99
+from benchmarks.workload import START, Workload
+from pydantic_sqlalchemy import MessageCreate, MessageService
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.purge import PurgeService
+
+
+def under_writes(message_service: MessageService, purge) -> dict:
+    """Выполняет purge(), пока отдельный поток пишет сообщения; задержки записи в мс"""
+    stop = threading.Event()
+    latencies, errors = [], []
+
+    def write():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                message_service.create_message(MessageCreate(user_id=1, message_text='новое'))
+            except OperationalError:
+                errors.append(time.perf_counter() - start)
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.2)  # Запись уже идет, когда начинается удаление
+        start = time.perf_counter()
+        purge()
+        seconds = time.perf_counter() - start
+        stop.set()
+        writer.join()
+    return {'seconds': seconds, 'latencies': latencies, 'errors': len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=500_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--keep', type=float, default=0.2, help='доля самых новых, что остаются')
+    parser.add_argument('--chunk', type=int, default=1000)
+    parser.add_argument('--pause', type=float, default=0.005)
+    args = parser.parse_args()
+
+    workload = Workload(users=args.users, messages=args.messages)
+    # В workload сообщения идут раз в секунду от START
+    cutoff = START + timedelta(seconds=int(args.messages * (1 - args.keep)))
+    print(f'🗑  Удаляем {1 - args.keep:.0%} из {args.messages:,} сообщений под записью')
+    print(
+        f'  {"способ":<28} {"время, с":>9} {"записей":>8} {"p99, мс":>9} '
+        f'{"max, мс":>9} {"ошибок":>7}'
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, name in enumerate(('один DELETE', f'пачки по {args.chunk}')):
+            db_service = workload.load_orm(Path(tmp) / f'purge{i}.db')
+            message_service = MessageService(db_service)
+            if i == 0:
+
+                def purge(db_service=db_service):
+                    with db_service.engine.begin() as connection:
+                        connection.execute(delete(Message).where(Message.created_at < cutoff))
+
+            else:
+                purge_service = PurgeService(db_service, args.chunk, args.pause)
+
+                def purge(purge_service=purge_service):
+                    purge_service.purge_messages_before(cutoff)
+
+            result = under_writes(message_service, purge)
+            latencies = result['latencies']
+            print(
+                f'  {name:<28} {result["seconds"]:9.1f} {len(latencies):8} '
+                f'{p99(latencies):9.1f} {max(latencies, default=0):9.1f} {result["errors"]:7}'
+            )
+            db_service.dispose()
+
+
+if __name__ == '__main__':
+    main()
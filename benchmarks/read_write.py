@@ -0,0 +1,99 @@
+"""Нагрузка N читателей и M писателей: общий пул против разделения чтения и записи
+
+Запуск: python -m benchmarks.read_write --readers 8 --writers 4 --seconds 5
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.concurrency import prepare
+from pydantic_sqlalchemy import DatabaseService, EngineProfile, MessageCreate, MessageService
+
+
+def p99(latencies: list[float]) -> float:
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100)[98]
+
+
+def stress(
+    db_service: DatabaseService, user_ids: list[int], readers: int, writers: int, seconds: float
+) -> dict:
+    """Гоняет потоки seconds секунд, собирает задержки операций (мс) и ошибки"""
+    message_service = MessageService(db_service)
+    stop = threading.Event()
+    latencies = {'reads': [], 'writes': []}
+    errors = []
+
+    def worker(kind: str, offset: int, operation):
+        done = []  # Свой список на поток, без блокировок в горячем цикле
+        i = offset
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                operation(user_ids[i % len(user_ids)])
+            except OperationalError:
+                errors.append(kind)
+            else:
+                done.append((time.perf_counter() - start) * 1000)
+            i += 1
+        latencies[kind].extend(done)
+
+    def read(user_id):
+        message_service.get_messages_page(limit=50, user_id=user_id)
+
+    def write(user_id):
+        message_service.create_message(MessageCreate(user_id=user_id, message_text='новое'))
+
+    threads = [
+        threading.Thread(target=worker, args=('reads', i, read)) for i in range(readers)
+    ] + [threading.Thread(target=worker, args=('writes', i, write)) for i in range(writers)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return {'latencies': latencies, 'errors': len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=50000)
+    args = parser.parse_args()
+
+    profile = EngineProfile.for_workers(args.readers + args.writers)
+    print(f'🔀 {args.readers} читателей и {args.writers} писателей, {args.seconds} с на режим')
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (name, split_reads) in enumerate([('общий пул', False), ('чтение/запись', True)]):
+            db_service = DatabaseService(
+                f'sqlite:///{Path(tmp) / f"bench{i}.db"}', profile, split_reads=split_reads
+            )
+            user_ids = prepare(db_service, args.users, args.messages)
+            result = stress(db_service, user_ids, args.readers, args.writers, args.seconds)
+            line = f'  {name:<14}'
+            for kind, label in (('reads', 'чтений'), ('writes', 'записей')):
+                latencies = result['latencies'][kind]
+                line += (
+                    f'  {label}/с {len(latencies) / args.seconds:8,.0f}'
+                    f' (p99 {p99(latencies):6.1f} мс)'
+                )
+            print(f'{line}  ошибок {result["errors"]}')
+            db_service.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Стоимость чтения одной строки: ORM против голого sqlite3
+
+Запуск: python -m benchmarks.repositories --messages 100000
+
+Для каждого пути печатается время на строку: ORM-репозиторий, SQLiteMessageRepository
+и "потолок" - тот же SQL через sqlite3 без сборки pydantic-моделей.
+"""
+
+import argparse
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from benchmarks.search import timed
+from benchmarks.workload import Workload
+from pydantic_sqlalchemy.repositories import OrmMessageRepository, SQLiteMessageRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=10_000, help='строк в одной выборке')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'repositories.db'
+        workload = Workload(users=args.users, messages=args.messages)
+        print(f'🏗  Генерируем {args.messages:,} сообщений...')
+        db_service = workload.load_orm(path)
+
+        orm = OrmMessageRepository(db_service)
+        raw = SQLiteMessageRepository(db_service)
+        sql = raw._sql['page'][0]
+        conn = sqlite3.connect(path)
+        hot_user = workload.hot_user_id()
+
+        scenarios = {
+            f'страница {args.rows}': {
+                'repo': lambda repo: list(repo.iter_page(None, None, args.rows, 1000)),
+                'sqlite3': lambda _: conn.execute(sql, (args.rows, 0)).fetchall(),
+            },
+            'сообщения пользователя': {
+                'repo': lambda repo: repo.get_by_user(hot_user),
+            },
+            'последнее у каждого': {
+                'repo': lambda repo: repo.get_latest_per_user(1),
+            },
+        }
+
+        print(f'⏱  Медиана из {args.repeat}, мкс на строку')
+        print(f'  {"сценарий":<24} {"строк":>7} {"ORM":>8} {"raw":>8} {"sqlite3":>8} {"x":>6}')
+        for name, fns in scenarios.items():
+            rows = len(fns['repo'](orm))
+            orm_us = timed(lambda fns=fns: fns['repo'](orm), args.repeat) * 1000 / rows
+            raw_us = timed(lambda fns=fns: fns['repo'](raw), args.repeat) * 1000 / rows
+            bare = fns.get('sqlite3')
+            bare_us = (
+                timed(lambda bare=bare: bare(None), args.repeat) * 1000 / rows if bare else None
+            )
+            bare_col = f'{bare_us:8.2f}' if bare_us is not None else f'{"-":>8}'
+            print(
+                f'  {name:<24} {rows:7} {orm_us:8.2f} {raw_us:8.2f} {bare_col}'
+                f' {orm_us / raw_us:6.1f}'
+            )
+
+        conn.close()
+        db_service.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Лента комнаты: время чтения в горячей, средней и холодной комнате, с индексом и без
+
+Запуск: python -m benchmarks.rooms --rooms 10000 --messages 200000
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+from itertools import accumulate
+from pathlib import Path
+
+from benchmarks.search import timed
+from benchmarks.workload import ORM_DATETIME_FORMAT, START, Workload
+from pydantic_sqlalchemy import RoomService
+from pydantic_sqlalchemy.database import DatabaseService
+
+ROOM_INDEX = 'ix_messages_room_id_created_at_id'
+
+
+def load_rooms(workload: Workload, rooms: int, path: Path) -> tuple[DatabaseService, list[int]]:
+    """База workload, где сообщения разложены по rooms комнатам по закону Ципфа
+
+    Возвращает сервис и ID комнат от самой активной к самой тихой.
+    """
+    db_service = workload.load_orm(path)
+    rng = random.Random(workload.seed)
+    ranks = list(range(1, rooms + 1))
+    rng.shuffle(ranks)
+    cum_weights = list(accumulate(1 / rank**workload.zipf_s for rank in ranks))
+
+    conn = sqlite3.connect(path)
+    created_at = START.strftime(ORM_DATETIME_FORMAT)
+    conn.executemany(
+        'INSERT INTO rooms (id, name, created_at) VALUES (?, ?, ?)',
+        ((i, f'room{i}', created_at) for i in range(1, rooms + 1)),
+    )
+    room_ids = rng.choices(range(1, rooms + 1), cum_weights=cum_weights, k=workload.messages)
+    conn.executemany(
+        'UPDATE messages SET room_id = ? WHERE id = ?',
+        ((room_id, i) for i, room_id in enumerate(room_ids, 1)),
+    )
+    # Участники - все, кто писал в комнату; отметок прочтения нет, все непрочитано
+    conn.execute(
+        'INSERT OR IGNORE INTO room_members (room_id, user_id, joined_at) '
+        'SELECT DISTINCT room_id, user_id, ? FROM messages',
+        (created_at,),
+    )
+    conn.commit()
+    by_activity = [
+        row[0]
+        for row in conn.execute(
+            'SELECT room_id FROM messages GROUP BY room_id ORDER BY COUNT(*) DESC, room_id'
+        )
+    ]
+    conn.close()
+    return db_service, by_activity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, default=10_000)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workload = Workload(users=args.users, messages=args.messages)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'🏗  {args.messages:,} сообщений в {args.rooms:,} комнатах...')
+        db_service, by_activity = load_rooms(workload, args.rooms, Path(tmp) / 'rooms.db')
+        room_service = RoomService(db_service)
+        samples = {
+            'горячая': by_activity[0],
+            'средняя': by_activity[len(by_activity) // 2],
+            'холодная': by_activity[-1],
+        }
+        with sqlite3.connect(Path(tmp) / 'rooms.db') as conn:
+            for name, room_id in samples.items():
+                count, user_id = conn.execute(
+                    'SELECT COUNT(*), MIN(user_id) FROM messages WHERE room_id = ?', (room_id,)
+                ).fetchone()
+                samples[name] = (room_id, user_id)
+                print(f'  {name:<9} комната {room_id}: {count:,} сообщений')
+
+        def scenarios(room_id: int, user_id: int):
+            first = room_service.get_timeline(room_id, limit=50)
+            return {
+                'последние 50': lambda: room_service.get_timeline(room_id, limit=50),
+                'до курсора': lambda: room_service.get_timeline(
+                    room_id, limit=50, before=first.next_cursor
+                ),
+                'непрочитанные (до 100)': lambda: room_service.unread_count(room_id, user_id),
+            }
+
+        results = {}
+        for indexed in (True, False):
+            if not indexed:
+                with db_service.engine.begin() as conn:
+                    conn.exec_driver_sql(f'DROP INDEX {ROOM_INDEX}')
+            for name, (room_id, user_id) in samples.items():
+                for scenario, fn in scenarios(room_id, user_id).items():
+                    results[scenario, name, indexed] = timed(fn, args.repeat)
+
+        print(f'⏱  Медиана из {args.repeat}, мс: с индексом {ROOM_INDEX} / без него')
+        print(f'  {"запрос":<24}' + ''.join(f' {name:>18}' for name in samples))
+        for scenario in scenarios(*samples['горячая']):
+            cells = [
+                f'{results[scenario, name, True]:7.2f} /{results[scenario, name, False]:8.2f}'
+                for name in samples
+            ]
+            print(f'  {scenario:<24}' + ''.join(f' {cell:>18}' for cell in cells))
+        db_service.dispose()
+
+
+if __name__ == '__main__':
+    main()
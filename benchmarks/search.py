@@ -0,0 +1,78 @@
+"""Полнотекстовый поиск FTS5 против LIKE на сгенерированном корпусе сообщений
+
+Запуск: python -m benchmarks.search --messages 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+
+from benchmarks.workload import RARE_WORDS, Workload
+from pydantic_sqlalchemy import MessageService
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.repositories import select_messages_with_user
+
+
+def timed(fn, repeat: int) -> float:
+    """Медианное время вызова, в миллисекундах"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'search.db'
+        print(f'🏗  Генерируем {args.messages:,} сообщений...')
+        start = time.perf_counter()
+        db_service = Workload(users=args.users, messages=args.messages).load_orm(path)
+        print(f'   готово за {time.perf_counter() - start:.1f} с')
+
+        message_service = MessageService(db_service)
+
+        def like(term):
+            with db_service.get_session() as session:
+                return (
+                    session.execute(
+                        select_messages_with_user()
+                        .where(Message.message_text.like(f'%{term}%'))
+                        .limit(args.limit)
+                    )
+                    .scalars()
+                    .all()
+                )
+
+        def count_like(term):
+            with db_service.get_session() as session:
+                return session.execute(
+                    select(Message.id).where(Message.message_text.like(f'%{term}%'))
+                ).all()
+
+        print(f'🔍 Медиана из {args.repeat}, мс (limit={args.limit})')
+        print(f'  {"запрос":<24} {"FTS5":>10} {"LIKE":>10} {"LIKE (все)":>12}')
+        for term in ['пицца', 'пицца кофе', RARE_WORDS[0]]:
+            fts_ms = timed(
+                lambda term=term: message_service.search(term, limit=args.limit), args.repeat
+            )
+            like_ms = timed(lambda term=term: like(term.split()[0]), args.repeat)
+            like_all_ms = timed(lambda term=term: count_like(term.split()[0]), args.repeat)
+            print(f'  {term:<24} {fts_ms:10.1f} {like_ms:10.1f} {like_all_ms:12.1f}')
+
+        db_service.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
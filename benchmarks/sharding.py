@@ -0,0 +1,75 @@
+"""Масштабирование по шардам: запись из нескольких потоков и чтение со слиянием при K = 1, 2, 4, 8
+
+Запуск: python -m benchmarks.sharding --writers 8 --messages 2000
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+
+from benchmarks.search import timed
+from benchmarks.write_behind import produce
+from pydantic_sqlalchemy import EngineProfile, MessageCreate, UserCreate
+from pydantic_sqlalchemy.sharding import (
+    ShardedDatabaseService,
+    ShardedMessageService,
+    ShardedUserService,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=2000, help='сообщений на запись')
+    parser.add_argument('--preload', type=int, default=100_000, help='сообщений для чтения')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--synchronous', default='FULL', help='PRAGMA synchronous шардов')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    profile = EngineProfile.for_workers(args.writers, synchronous=args.synchronous)
+    print(
+        f'🧩 {args.writers} писателей по сообщению на коммит, synchronous={args.synchronous}; '
+        f'чтение по {args.preload:,} сообщений'
+    )
+    print(
+        f'  {"K":>3} {"запись, сообщ/с":>16} {"страница 50, мс":>16} '
+        f'{"статистика, мс":>15} {"все сообщения, мс":>18}'
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for k in args.shards:
+            sharded = ShardedDatabaseService.in_directory(Path(tmp) / f'k{k}', k, profile)
+            message_service = ShardedMessageService(sharded)
+            with contextlib.redirect_stdout(io.StringIO()):
+                sharded.create_tables()
+                user_service = ShardedUserService(sharded)
+                user_ids = [
+                    user_service.create_user(
+                        UserCreate(username=f'user{i}', email=f'user{i}@example.com')
+                    ).id
+                    for i in range(args.users)
+                ]
+                rate = produce(
+                    message_service.create_message, args.writers, args.messages, user_ids
+                )
+                message_service.create_messages(
+                    MessageCreate(
+                        user_id=user_ids[i % len(user_ids)], message_text=f'Сообщение {i}'
+                    )
+                    for i in range(args.preload)
+                )
+
+            page = timed(
+                lambda service=message_service: service.get_messages_page(limit=50), args.repeat
+            )
+            stats = timed(message_service.get_conversation_stats, args.repeat)
+            everything = timed(message_service.get_all_messages, max(1, args.repeat // 5))
+            print(f'  {k:>3} {rate:16,.0f} {page:16.2f} {stats:15.2f} {everything:18.1f}')
+            sharded.dispose()
+
+
+if __name__ == '__main__':
+    main()
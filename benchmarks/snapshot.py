@@ -0,0 +1,71 @@
+"""Аналитика по снимку Arrow/Parquet против запросов к SQLite
+
+Запуск: python -m benchmarks.snapshot --messages 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from benchmarks.search import timed
+from benchmarks.workload import Workload
+from pydantic_sqlalchemy import MessageService
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.snapshot import Snapshot, write_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'🏗  Генерируем {args.messages:,} сообщений...')
+        db_service = Workload(users=args.users, messages=args.messages).load_orm(
+            Path(tmp) / 'snapshot.db'
+        )
+        message_service = MessageService(db_service)
+
+        print('📦 Размер и время записи снимка')
+        for format in ('arrow', 'parquet'):
+            start = time.perf_counter()
+            paths = write_snapshot(db_service, Path(tmp) / format, format=format)
+            size = sum(path.stat().st_size for path in paths.values()) / 2**20
+            print(f'  {format:<8} {time.perf_counter() - start:6.1f} с {size:8.1f} МиБ')
+
+        def sqlite_histogram():
+            hour = func.strftime('%H', Message.created_at)
+            with db_service.get_session() as session:
+                return session.execute(select(hour, func.count()).group_by(hour)).all()
+
+        def sqlite_last_message():
+            with db_service.get_session() as session:
+                return session.execute(
+                    select(Message.user_id, func.max(Message.created_at)).group_by(
+                        Message.user_id
+                    )
+                ).all()
+
+        print(f'⏱  Медиана из {args.repeat}, мс')
+        print(f'  {"запрос":<22} {"SQLite":>10} {"arrow":>10} {"parquet":>10}')
+        snapshots = {format: Snapshot.open(Path(tmp) / format) for format in ('arrow', 'parquet')}
+        for name, live, method in [
+            ('статистика', message_service.get_conversation_stats, 'conversation_stats'),
+            ('последнее сообщение', sqlite_last_message, 'last_message_at'),
+            ('гистограмма по часам', sqlite_histogram, 'hourly_histogram'),
+        ]:
+            times = [timed(live, args.repeat)] + [
+                timed(getattr(snapshot, method), args.repeat) for snapshot in snapshots.values()
+            ]
+            print(f'  {name:<22}' + ''.join(f' {ms:10.1f}' for ms in times))
+
+        db_service.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
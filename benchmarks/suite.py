@@ -0,0 +1,258 @@
+"""Набор бенчмарков для pydantic_sqlalchemy и pure_sql.py с отчетом в JSON
+
+Запуск:
+    python -m benchmarks.suite --messages 100000 --output current.json
+    python -m benchmarks.suite --messages 100000 --baseline main.json
+
+С --baseline печатается сравнение с прошлым отчетом; --fail-on-regression
+завершает процесс с кодом 1, если какой-то сценарий замедлился сильнее порога.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+import pure_sql
+from benchmarks.workload import START, WORDS, Workload
+from pydantic_sqlalchemy import DatabaseService, MessageCreate, MessageService
+
+INSERT_BATCH = 100
+
+Scenarios = Dict[str, Callable[[], object]]
+
+
+@contextmanager
+def orm_scenarios(workload: Workload, path: Path) -> Iterator[Scenarios]:
+    db_service = DatabaseService(f'sqlite:///{path}')
+    message_service = MessageService(db_service)
+    hot_user = workload.hot_user_id()
+
+    def insert():
+        message_service.create_messages(
+            MessageCreate(user_id=(i % workload.users) + 1, message_text=' '.join(WORDS[:8]))
+            for i in range(INSERT_BATCH)
+        )
+
+    try:
+        yield {
+            'insert': insert,
+            'list': lambda: message_service.get_messages_page(limit=1000),
+            'user_messages': lambda: message_service.get_user_messages(hot_user),
+            'latest_per_user': lambda: message_service.get_latest_messages_per_user(),
+            'stats': message_service.get_conversation_stats,
+            'search': lambda: message_service.search('пицца кофе'),
+        }
+    finally:
+        db_service.dispose()
+
+
+@contextmanager
+def pure_sql_scenarios(workload: Workload, path: Path) -> Iterator[Scenarios]:
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    hot_user = workload.hot_user_id()
+
+    def insert():
+        cursor.executemany(
+            'INSERT INTO Messages (user_id, message_text, created_at) VALUES (?, ?, ?)',
+            (
+                ((i % workload.users) + 1, ' '.join(WORDS[:8]), str(START))
+                for i in range(INSERT_BATCH)
+            ),
+        )
+        conn.commit()
+
+    def query(sql: str, *params):
+        return lambda: cursor.execute(sql, params).fetchall()
+
+    try:
+        yield {
+            'insert': insert,
+            'list': query(
+                'SELECT m.id, u.username, m.message_text, m.created_at FROM Messages m '
+                'JOIN Users u ON m.user_id = u.id ORDER BY m.created_at, m.id LIMIT 1000'
+            ),
+            'user_messages': query(
+                'SELECT m.message_text, m.created_at FROM Messages m '
+                'WHERE m.user_id = ? ORDER BY m.created_at',
+                hot_user,
+            ),
+            'latest_per_user': lambda: pure_sql.latest_messages_per_user(cursor),
+            'stats': query(
+                'SELECT u.username, COALESCE(s.message_count, 0) AS message_count FROM Users u '
+                'LEFT JOIN UserMessageStats s ON u.id = s.user_id ORDER BY message_count DESC'
+            ),
+            'search': lambda: pure_sql.search_messages(cursor, 'пицца кофе'),
+        }
+    finally:
+        conn.close()
+
+
+BACKENDS = {'orm': orm_scenarios, 'pure_sql': pure_sql_scenarios}
+# Заполняют базу-образец, копии которой получает каждый сценарий
+LOADERS = {
+    'orm': lambda workload, path: workload.load_orm(path).dispose(),
+    'pure_sql': lambda workload, path: workload.load_pure_sql(path).close(),
+}
+
+
+def clone(template: Path, path: Path) -> Path:
+    """Копия заполненной базы, чтобы insert не менял данные сценариев чтения"""
+    with closing(sqlite3.connect(template)) as source, closing(sqlite3.connect(path)) as target:
+        source.backup(target)
+    return path
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 1) -> dict:
+    """Время (мс) по repeat запускам и пик памяти (КиБ) отдельного запуска"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        # tracemalloc замедляет код, поэтому память меряем отдельным запуском
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    samples.sort()
+    return {
+        'median_ms': samples[len(samples) // 2],
+        'min_ms': samples[0],
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'peak_kib': peak / 1024,
+        'repeat': repeat,
+    }
+
+
+def run_suite(
+    workload: Workload,
+    repeat: int = 5,
+    backends=tuple(BACKENDS),
+    scenarios: Optional[set] = None,
+    workdir: Optional[Path] = None,
+) -> dict:
+    """Прогоняет сценарии и возвращает отчет, пригодный для json.dump"""
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for backend in backends:
+            template = Path(tmp) / f'{backend}.db'
+            LOADERS[backend](workload, template)
+            with BACKENDS[backend](workload, template) as fns:
+                names = [name for name in fns if not scenarios or name in scenarios]
+            for name in names:
+                path = clone(template, Path(tmp) / f'{backend}.{name}.db')
+                with BACKENDS[backend](workload, path) as fns:
+                    results[f'{backend}.{name}'] = measure(fns[name], repeat)
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'workload': workload.describe(),
+        },
+        'results': results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Сравнивает медианы с базовым отчетом; ratio > 1 - ускорение"""
+    rows = []
+    for name, current in report['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        ratio = previous['median_ms'] / current['median_ms'] if current['median_ms'] else 0.0
+        rows.append(
+            {
+                'scenario': name,
+                'baseline_ms': previous['median_ms'],
+                'current_ms': current['median_ms'],
+                'ratio': ratio,
+                'regression': ratio < 1 - threshold,
+            }
+        )
+    return rows
+
+
+def print_report(report: dict) -> None:
+    print(f'  {"сценарий":<26} {"медиана, мс":>12} {"p95, мс":>10} {"пик, КиБ":>10}')
+    for name, result in report['results'].items():
+        print(
+            f'  {name:<26} {result["median_ms"]:12.2f} {result["p95_ms"]:10.2f}'
+            f' {result["peak_kib"]:10.0f}'
+        )
+
+
+def print_comparison(rows: list[dict]) -> None:
+    print(f'  {"сценарий":<26} {"было, мс":>10} {"стало, мс":>10} {"x":>7}')
+    for row in rows:
+        mark = '❌' if row['regression'] else ('✅' if row['ratio'] > 1 else '  ')
+        print(
+            f'  {row["scenario"]:<26} {row["baseline_ms"]:10.2f} {row["current_ms"]:10.2f}'
+            f' {row["ratio"]:7.2f} {mark}'
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--backend', choices=list(BACKENDS), action='append')
+    parser.add_argument('--scenario', action='append', help='запустить только эти сценарии')
+    parser.add_argument('--output', type=Path, help='куда сохранить отчет JSON')
+    parser.add_argument('--baseline', type=Path, help='отчет JSON для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.1, help='допуск замедления')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    workload = Workload(
+        users=args.users, messages=args.messages, zipf_s=args.zipf, seed=args.seed
+    )
+    print(f'📊 Нагрузка: {workload.describe()}')
+    report = run_suite(
+        workload,
+        repeat=args.repeat,
+        backends=args.backend or tuple(BACKENDS),
+        scenarios=set(args.scenario or ()),
+    )
+    print_report(report)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f'💾 Отчет сохранен в {args.output}')
+
+    if args.baseline:
+        rows = compare(report, json.loads(args.baseline.read_text()), args.threshold)
+        print(f'\n⚖️  Сравнение с {args.baseline}')
+        print_comparison(rows)
+        if args.fail_on_regression and any(row['regression'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
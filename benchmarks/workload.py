@@ -0,0 +1,107 @@
+"""Детерминированный генератор нагрузки мессенджера для бенчмарков
+
+N пользователей, сообщения распределены между ними по закону Ципфа: несколько
+"болтунов" пишут большую часть сообщений, у остальных - длинный хвост.
+"""
+
+import contextlib
+import io
+import random
+import sqlite3
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterator
+
+import pure_sql
+from pydantic_sqlalchemy import DatabaseService
+from pydantic_sqlalchemy.services import batches
+
+WORDS = (
+    'привет как дела пицца суши кофе встреча завтра сегодня вечером офис проект релиз '
+    'баг тест деплой отпуск погода футбол кино книга музыка концерт поезд самолет билет '
+    'отчет задача срок бюджет клиент договор звонок письмо обед ужин'
+).split()
+RARE_WORDS = ['квазар', 'эпифания', 'палимпсест']
+START = datetime(2024, 1, 1)
+# Формат DateTime в SQLAlchemy для SQLite; pure_sql.py хранит время без микросекунд
+ORM_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+PURE_SQL_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+@dataclass(frozen=True)
+class Workload:
+    users: int = 1000
+    messages: int = 100_000
+    zipf_s: float = 1.1
+    seed: int = 42
+    rare_word_rate: float = 0.0005
+
+    def describe(self) -> dict:
+        return asdict(self)
+
+    def user_rows(self) -> Iterator[tuple[int, str, str, datetime]]:
+        """(id, username, email, created_at)"""
+        for i in range(1, self.users + 1):
+            yield i, f'user{i}', f'user{i}@example.com', START
+
+    def message_rows(self, chunk: int = 10_000) -> Iterator[tuple[int, str, datetime]]:
+        """(user_id, message_text, created_at), по секунде между сообщениями"""
+        rng = random.Random(self.seed)
+        # Перемешиваем ранги, чтобы самые активные не были просто первыми по id
+        ranks = list(range(1, self.users + 1))
+        rng.shuffle(ranks)
+        cum_weights = list(accumulate(1 / rank**self.zipf_s for rank in ranks))
+        user_ids = range(1, self.users + 1)
+
+        produced = 0
+        while produced < self.messages:
+            size = min(chunk, self.messages - produced)
+            for user_id in rng.choices(user_ids, cum_weights=cum_weights, k=size):
+                words = rng.choices(WORDS, k=rng.randint(3, 15))
+                if rng.random() < self.rare_word_rate:
+                    words.append(rng.choice(RARE_WORDS))
+                yield user_id, ' '.join(words), START + timedelta(seconds=produced)
+                produced += 1
+
+    def hot_user_id(self) -> int:
+        """Самый активный пользователь (ранг 1 в распределении Ципфа)"""
+        rng = random.Random(self.seed)
+        ranks = list(range(1, self.users + 1))
+        rng.shuffle(ranks)
+        return ranks.index(1) + 1
+
+    def load_orm(self, path: Path) -> DatabaseService:
+        """Создает базу со схемой ORM и заполняет ее напрямую через sqlite3"""
+        db_service = DatabaseService(f'sqlite:///{path}')
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_service.create_tables()
+        self._fill(path, 'users', 'messages', ORM_DATETIME_FORMAT)
+        return db_service
+
+    def load_pure_sql(self, path: Path) -> sqlite3.Connection:
+        """Создает базу со схемой pure_sql.py и заполняет ее"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            conn, _ = pure_sql.create_database(str(path))
+        conn.close()
+        self._fill(path, 'Users', 'Messages', PURE_SQL_DATETIME_FORMAT)
+        return sqlite3.connect(path)
+
+    def _fill(
+        self, path: Path, users_table: str, messages_table: str, datetime_format: str
+    ) -> None:
+        # Время пишем в том же формате, что и сама схема, иначе сравнения строк врут
+        conn = sqlite3.connect(path)
+        conn.executemany(
+            f'INSERT INTO {users_table} (id, username, email, created_at) VALUES (?, ?, ?, ?)',
+            (row[:3] + (row[3].strftime(datetime_format),) for row in self.user_rows()),
+        )
+        for rows in batches(self.message_rows(), 50_000):
+            conn.executemany(
+                f'INSERT INTO {messages_table} (user_id, message_text, created_at) '
+                'VALUES (?, ?, ?)',
+                (row[:2] + (row[2].strftime(datetime_format),) for row in rows),
+            )
+            conn.commit()
+        conn.close()
@@ -0,0 +1,71 @@
+"""Прием сообщений: коммит на каждое сообщение против write-behind с групповым коммитом
+
+Запуск: python -m benchmarks.write_behind --producers 8 --messages 2000
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.concurrency import prepare
+from pydantic_sqlalchemy import DatabaseService, EngineProfile, MessageCreate, MessageService
+from pydantic_sqlalchemy.write_behind import WriteBehindQueue
+
+
+def produce(send, producers: int, messages: int, user_ids: list[int], finish=None) -> float:
+    """Отправляет messages сообщений из producers потоков, возвращает сообщений в секунду"""
+    data = [
+        MessageCreate(user_id=user_ids[i % len(user_ids)], message_text=f'Сообщение {i}')
+        for i in range(messages)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(producers) as pool:
+        list(pool.map(send, data))
+    if finish:
+        finish()  # Ждем записи всего принятого, иначе считали бы только постановку в очередь
+    return messages / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--producers', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--synchronous', default='FULL', help='PRAGMA synchronous для записи')
+    args = parser.parse_args()
+
+    profile = EngineProfile.for_workers(args.producers, synchronous=args.synchronous)
+    print(
+        f'✍️  {args.producers} производителей, {args.messages} сообщений, '
+        f'synchronous={args.synchronous}'
+    )
+    modes = ('коммит на сообщение', 'write-behind, send', 'write-behind, submit')
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, mode in enumerate(modes):
+            db_service = DatabaseService(f'sqlite:///{Path(tmp) / f"{i}.db"}', profile)
+            user_ids = prepare(db_service, users=100, messages=0)
+            message_service = MessageService(db_service)
+
+            extra = ''
+            with contextlib.redirect_stdout(io.StringIO()):
+                if i == 0:
+                    rate = produce(
+                        message_service.create_message, args.producers, args.messages, user_ids
+                    )
+                else:
+                    with WriteBehindQueue(message_service) as writer:
+                        # send ждет коммита, submit сразу отдает Future
+                        send = writer.send if i == 1 else writer.submit
+                        rate = produce(
+                            send, args.producers, args.messages, user_ids, writer.flush
+                        )
+                    extra = f'  (в среднем {writer.stats()["avg_batch"]:.1f} в пачке)'
+            print(f'  {mode:<22} {rate:10.0f} сообщений/с{extra}')
+            db_service.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
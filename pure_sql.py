@@ -1,11 +1,15 @@
 import sqlite3
 
 
-def create_database():
-    """Создание базы данных и таблиц"""
+def create_database(database='messenger.db', metrics=None):
+    """Создание базы данных и таблиц
+
+    С metrics (pydantic_sqlalchemy.metrics.Metrics) все запросы соединения
+    попадают в его счетчики и журнал медленных запросов.
+    """
 
     # Подключаемся к базе (создается автоматически если не существует)
-    conn = sqlite3.connect('messenger.db')
+    conn = metrics.connect(database) if metrics else sqlite3.connect(database)
     cursor = conn.cursor()
 
     # Создаем таблицу Users
@@ -29,17 +33,115 @@ def create_database():
     )
     """)
 
-    # Создаем индекс для ускорения поиска по user_id
+    # Составной индекс: поиск по user_id и выборка последних сообщений пользователя.
+    # Он покрывает и старый idx_messages_user_id, поэтому тот больше не нужен
     cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_messages_user_id 
-    ON Messages (user_id)
+    CREATE INDEX IF NOT EXISTS idx_messages_user_created
+    ON Messages (user_id, created_at)
+    """)
+    cursor.execute('DROP INDEX IF EXISTS idx_messages_user_id')
+
+    # Счетчики сообщений по пользователям, чтобы не делать GROUP BY по всей Messages
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'UserMessageStats'")
+    stats_existed = cursor.fetchone() is not None
+    cursor.executescript("""
+    CREATE TABLE IF NOT EXISTS UserMessageStats (
+        user_id INTEGER PRIMARY KEY,
+        message_count INTEGER NOT NULL DEFAULT 0,
+        last_message_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_messages_stats_insert AFTER INSERT ON Messages
+    BEGIN
+        INSERT INTO UserMessageStats (user_id, message_count, last_message_at)
+        VALUES (NEW.user_id, 1, NEW.created_at)
+        ON CONFLICT (user_id) DO UPDATE SET
+            message_count = message_count + 1,
+            last_message_at = CASE
+                WHEN last_message_at IS NULL OR excluded.last_message_at > last_message_at
+                THEN excluded.last_message_at
+                ELSE last_message_at
+            END;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_messages_stats_delete AFTER DELETE ON Messages
+    BEGIN
+        UPDATE UserMessageStats SET
+            message_count = message_count - 1,
+            last_message_at = CASE
+                WHEN OLD.created_at < last_message_at THEN last_message_at
+                ELSE (SELECT MAX(created_at) FROM Messages WHERE user_id = OLD.user_id)
+            END
+        WHERE user_id = OLD.user_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_messages_stats_update
+    AFTER UPDATE OF user_id, created_at ON Messages
+    BEGIN
+        UPDATE UserMessageStats SET
+            message_count = message_count - 1,
+            last_message_at = (SELECT MAX(created_at) FROM Messages WHERE user_id = OLD.user_id)
+        WHERE user_id = OLD.user_id;
+        INSERT INTO UserMessageStats (user_id, message_count, last_message_at)
+        VALUES (NEW.user_id, 1, NEW.created_at)
+        ON CONFLICT (user_id) DO UPDATE SET
+            message_count = message_count + 1,
+            last_message_at = (SELECT MAX(created_at) FROM Messages WHERE user_id = NEW.user_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON Users
+    BEGIN
+        DELETE FROM UserMessageStats WHERE user_id = OLD.id;
+    END;
     """)
+    if not stats_existed:
+        rebuild_user_message_stats(cursor)
+
+    # Полнотекстовый индекс FTS5 по тексту сообщений, синхронизируется триггерами
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'MessagesFts'")
+    fts_existed = cursor.fetchone() is not None
+    cursor.executescript("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS MessagesFts
+    USING fts5(message_text, content='Messages', content_rowid='id');
+
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert AFTER INSERT ON Messages
+    BEGIN
+        INSERT INTO MessagesFts (rowid, message_text) VALUES (NEW.id, NEW.message_text);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete AFTER DELETE ON Messages
+    BEGIN
+        INSERT INTO MessagesFts (MessagesFts, rowid, message_text)
+        VALUES ('delete', OLD.id, OLD.message_text);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update
+    AFTER UPDATE OF id, message_text ON Messages
+    BEGIN
+        INSERT INTO MessagesFts (MessagesFts, rowid, message_text)
+        VALUES ('delete', OLD.id, OLD.message_text);
+        INSERT INTO MessagesFts (rowid, message_text) VALUES (NEW.id, NEW.message_text);
+    END;
+    """)
+    if not fts_existed:
+        cursor.execute("INSERT INTO MessagesFts (MessagesFts) VALUES ('rebuild')")
 
     conn.commit()
     print('✅ База данных и таблицы созданы успешно!')
     return conn, cursor
 
 
+def rebuild_user_message_stats(cursor):
+    """Пересчитываем UserMessageStats целиком по таблице Messages"""
+
+    cursor.execute('DELETE FROM UserMessageStats')
+    cursor.execute("""
+    INSERT INTO UserMessageStats (user_id, message_count, last_message_at)
+    SELECT user_id, COUNT(*), MAX(created_at) FROM Messages GROUP BY user_id
+    """)
+
+
 def add_users(cursor):
     """Добавляем пользователей в базу"""
 
@@ -130,10 +232,9 @@ def demonstrate_relationships(cursor):
     # Сколько сообщений у каждого пользователя
     print('\n📈 СТАТИСТИКА ПОЛЬЗОВАТЕЛЕЙ:')
     cursor.execute("""
-    SELECT u.username, COUNT(m.id) as message_count
+    SELECT u.username, COALESCE(s.message_count, 0) as message_count
     FROM Users u
-    LEFT JOIN Messages m ON u.id = m.user_id
-    GROUP BY u.id
+    LEFT JOIN UserMessageStats s ON u.id = s.user_id
     ORDER BY message_count DESC
     """)
 
@@ -156,6 +257,50 @@ def demonstrate_relationships(cursor):
         print(f'{i}. {text} ({time})')
 
 
+LATEST_MESSAGES_PER_USER_SQL = """
+SELECT u.username, m.message_text, m.created_at
+FROM Users u
+JOIN Messages m ON m.id IN (
+    SELECT id FROM Messages
+    WHERE user_id = u.id
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+)
+ORDER BY u.id, m.created_at DESC, m.id DESC
+"""
+
+
+def latest_messages_per_user(cursor, limit=1):
+    """Последние limit сообщений каждого пользователя через индекс (user_id, created_at)"""
+
+    cursor.execute(LATEST_MESSAGES_PER_USER_SQL, (limit,))
+    return cursor.fetchall()
+
+
+def search_messages(cursor, query, limit=20):
+    """Полнотекстовый поиск: (username, текст, фрагмент с подсветкой, ранг bm25)"""
+
+    # Каждое слово берем в кавычки, чтобы ввод не разбирался как операторы FTS5
+    match = ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+    if not match:
+        return []
+
+    cursor.execute(
+        """
+    SELECT u.username, m.message_text,
+           snippet(MessagesFts, 0, '[', ']', '…', 10), bm25(MessagesFts) AS rank
+    FROM MessagesFts
+    JOIN Messages m ON m.id = MessagesFts.rowid
+    JOIN Users u ON u.id = m.user_id
+    WHERE MessagesFts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+    """,
+        (match, limit),
+    )
+    return cursor.fetchall()
+
+
 def advanced_queries(cursor):
     """Продвинутые запросы для демонстрации возможностей"""
 
@@ -165,21 +310,15 @@ def advanced_queries(cursor):
 
     # Последнее сообщение каждого пользователя
     print('\n🕒 ПОСЛЕДНИЕ СООБЩЕНИЯ:')
-    cursor.execute("""
-    SELECT u.username, m.message_text, m.created_at
-    FROM Messages m
-    JOIN Users u ON m.user_id = u.id
-    WHERE m.created_at = (
-        SELECT MAX(created_at) 
-        FROM Messages 
-        WHERE user_id = u.id
-    )
-    """)
-
-    last_messages = cursor.fetchall()
+    last_messages = latest_messages_per_user(cursor)
     for username, text, time in last_messages:
         print(f"👤 {username}: '{text}' ({time})")
 
+    # Полнотекстовый поиск
+    print('\n🔍 ПОИСК "пиццу":')
+    for username, _text, snippet, rank in search_messages(cursor, 'пиццу'):
+        print(f'👤 {username}: {snippet} (ранг {rank:.2f})')
+
 
 def main():
     """Основная функция"""
@@ -50,8 +50,7 @@ def main():
             MessageCreate(user_id=alice.id, message_text='Отлично! Заказываем!'),
         ]
 
-        for msg_data in messages_data:
-            message_service.create_message(msg_data)
+        message_service.create_messages(messages_data)
 
     except Exception as e:
         print(f'❌ Ошибка при создании сообщений: {e}')
@@ -1,4 +1,20 @@
-from pydantic_sqlalchemy.schemas import MessageCreate, UserCreate
-from pydantic_sqlalchemy.services import DatabaseService, MessageService, UserService
+from pydantic_sqlalchemy.database import EngineProfile
+from pydantic_sqlalchemy.schemas import MessageCreate, RoomCreate, RoomMessageCreate, UserCreate
+from pydantic_sqlalchemy.services import (
+    DatabaseService,
+    MessageService,
+    RoomService,
+    UserService,
+)
 
-__all__ = ['MessageCreate', 'UserCreate', 'DatabaseService', 'MessageService', 'UserService']
+__all__ = [
+    'EngineProfile',
+    'MessageCreate',
+    'RoomCreate',
+    'RoomMessageCreate',
+    'UserCreate',
+    'DatabaseService',
+    'MessageService',
+    'RoomService',
+    'UserService',
+]
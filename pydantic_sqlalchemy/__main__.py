@@ -0,0 +1,81 @@
+"""Служебные команды: python -m pydantic_sqlalchemy <команда> [--database-url URL]"""
+
+import argparse
+import contextlib
+import sys
+from datetime import datetime
+
+from pydantic_sqlalchemy.database import DatabaseService
+from pydantic_sqlalchemy.export import export_messages
+from pydantic_sqlalchemy.partitions import MessageArchive
+from pydantic_sqlalchemy.services import MessageService
+
+
+def rebuild_stats(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    MessageService(db_service, archive=MessageArchive(db_service)).rebuild_conversation_stats()
+
+
+def archive(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    MessageArchive(db_service, args.directory).archive(datetime.fromisoformat(args.before))
+
+
+def export(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    options = dict(format=args.format, compression=args.compression, since=args.since)
+    if args.output == '-':
+        result = export_messages(db_service, sys.stdout.buffer, **options)
+    else:
+        with open(args.output, 'wb') as fp:
+            result = export_messages(db_service, fp, **options)
+    # stdout может быть занят самой выгрузкой, поэтому итог пишем в stderr
+    print(f'✅ Выгружено сообщений: {result.rows}', file=sys.stderr)
+    print(f'🔖 Водяной знак для --since: {result.watermark}', file=sys.stderr)
+
+
+def snapshot(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    # pyarrow нужен только этой команде
+    from pydantic_sqlalchemy.snapshot import write_snapshot
+
+    for name, path in write_snapshot(db_service, args.directory, format=args.format).items():
+        print(f'✅ {name}: {path}', file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pydantic_sqlalchemy', description=__doc__)
+    parser.add_argument('--database-url', default='sqlite:///messenger2.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser(
+        'rebuild-stats', help='пересчитать user_message_stats по таблице messages'
+    ).set_defaults(handler=rebuild_stats)
+
+    archive_parser = commands.add_parser(
+        'archive', help='вынести месяцы раньше --before в файлы только для чтения'
+    )
+    archive_parser.add_argument('--before', required=True, help='дата ISO, например 2024-06-01')
+    archive_parser.add_argument('--directory', required=True, help='каталог файлов архива')
+    archive_parser.set_defaults(handler=archive)
+
+    export_parser = commands.add_parser('export', help='потоковая выгрузка сообщений')
+    export_parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    export_parser.add_argument('--compression', choices=['gzip', 'zstd'])
+    export_parser.add_argument('--since', help='водяной знак прошлой выгрузки')
+    export_parser.add_argument('--output', default='-', help='файл или - для stdout')
+    export_parser.set_defaults(handler=export)
+
+    snapshot_parser = commands.add_parser(
+        'snapshot', help='колоночный снимок users/messages для аналитики (pyarrow)'
+    )
+    snapshot_parser.add_argument('directory')
+    snapshot_parser.add_argument('--format', choices=['arrow', 'parquet'], default='arrow')
+    snapshot_parser.set_defaults(handler=snapshot)
+
+    args = parser.parse_args(argv)
+    db_service = DatabaseService(args.database_url)
+    # Служебный вывод - в stderr, stdout остается под данные (export --output -)
+    with contextlib.redirect_stdout(sys.stderr):
+        db_service.create_tables()
+    args.handler(db_service, args)
+
+
+if __name__ == '__main__':
+    main()
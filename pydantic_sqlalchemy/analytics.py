@@ -0,0 +1,198 @@
+"""Параллельная аналитика по messages: диапазоны ключей в отдельных процессах
+
+Работа делится на непересекающиеся диапазоны: счетчики по пользователям - по
+диапазонам user_id (покрывающий индекс ix_messages_user_id_created_at отдает
+строки уже сгруппированными), гистограмма по дням - по диапазонам id (это
+rowid, поиск по первичному ключу). Каждый процесс открывает свое соединение
+только для чтения, а частичные результаты складываются в основном процессе:
+счетчики суммируются, максимумы времени сравниваются, топ болтунов считается
+по уже сложенным счетчикам.
+
+Диапазоны читаются в разных транзакциях, поэтому при параллельной записи
+результат не единый снимок: сообщения, добавленные во время подсчета, могут
+учесться в одной части и не учесться в другой.
+"""
+
+import heapq
+import os
+import sqlite3
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from pydantic_sqlalchemy.database import DatabaseService
+
+StatsRow = Tuple[str, int, Optional[datetime]]
+
+
+@dataclass
+class PartialStats:
+    """Агрегаты одного диапазона или их сумма"""
+
+    counts: Dict[int, int] = field(default_factory=dict)  # user_id -> сообщений
+    last: Dict[int, str] = field(default_factory=dict)  # user_id -> MAX(created_at) строкой
+    days: Dict[str, int] = field(default_factory=dict)  # 'YYYY-MM-DD' -> сообщений
+
+    def merge(self, other: 'PartialStats') -> 'PartialStats':
+        for user_id, count in other.counts.items():
+            self.counts[user_id] = self.counts.get(user_id, 0) + count
+        for user_id, last in other.last.items():
+            # Время хранится строкой ISO, поэтому строки сравниваются как даты
+            if last > self.last.get(user_id, ''):
+                self.last[user_id] = last
+        for day, count in other.days.items():
+            self.days[day] = self.days.get(day, 0) + count
+        return self
+
+
+def aggregate_users(uri: str, pragmas: dict, low: int, high: int) -> PartialStats:
+    """Счетчики и последние сообщения пользователей с user_id в [low, high]"""
+    partial = PartialStats()
+    for user_id, count, last in _query(
+        uri,
+        pragmas,
+        'SELECT user_id, COUNT(*), MAX(created_at) FROM messages '
+        'WHERE user_id BETWEEN ? AND ? GROUP BY user_id',
+        low,
+        high,
+    ):
+        partial.counts[user_id] = count
+        partial.last[user_id] = last
+    return partial
+
+
+def aggregate_days(uri: str, pragmas: dict, low: int, high: int) -> PartialStats:
+    """Сообщения по дням среди сообщений с id в [low, high]"""
+    return PartialStats(
+        days=dict(
+            _query(
+                uri,
+                pragmas,
+                'SELECT substr(created_at, 1, 10), COUNT(*) FROM messages '
+                'WHERE id BETWEEN ? AND ? GROUP BY 1',
+                low,
+                high,
+            )
+        )
+    )
+
+
+def _query(uri: str, pragmas: dict, sql: str, low: int, high: int) -> list:
+    # Выполняется в процессе-работнике: соединение свое на каждый диапазон
+    with closing(sqlite3.connect(uri, uri=True)) as conn:
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn.execute(sql, (low, high)).fetchall()
+
+
+def key_ranges(low: int, high: int, parts: int) -> List[Tuple[int, int]]:
+    """Делит [low, high] на до parts непересекающихся диапазонов почти равной длины"""
+    total = high - low + 1
+    parts = max(1, min(parts, total))
+    bounds = [low + total * i // parts for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(parts)]
+
+
+class ParallelAnalytics:
+    """Статистика сообщений, посчитанная пулом процессов
+
+    Используйте как контекстный менеджер, чтобы пул процессов закрылся. Свой
+    Executor можно передать в executor, тогда закрывать его - дело вызывающего.
+    """
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        workers: Optional[int] = None,
+        parts: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ):
+        database = make_url(str(db_service.engine.url)).database
+        if database in (None, '', ':memory:'):
+            raise ValueError('Параллельной аналитике нужен файл базы, не база в памяти')
+        self.db_service = db_service
+        self.uri = f'file:{os.path.abspath(database)}?mode=ro'
+        self.workers = workers or os.cpu_count() or 1
+        # Диапазонов больше, чем процессов: медленный диапазон не держит остальные
+        self.parts = parts or self.workers * 4
+        self._own_executor = executor is None
+        self.executor = executor or ProcessPoolExecutor(self.workers)
+
+    def __enter__(self) -> 'ParallelAnalytics':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        if self._own_executor:
+            self.executor.shutdown()
+
+    def aggregate(self) -> PartialStats:
+        """Все агрегаты за один проход пула по таблице"""
+        with closing(sqlite3.connect(self.uri, uri=True)) as conn:
+            # Отдельные подзапросы: MIN/MAX по одному столбцу берутся из края индекса
+            low_id, high_id, low_user, high_user = conn.execute(
+                'SELECT (SELECT MIN(id) FROM messages), (SELECT MAX(id) FROM messages), '
+                '(SELECT MIN(user_id) FROM messages), (SELECT MAX(user_id) FROM messages)'
+            ).fetchone()
+        total = PartialStats()
+        if low_id is None:
+            return total
+
+        pragmas = self.db_service.profile.pragmas(readonly=True)
+        futures = [
+            self.executor.submit(aggregate_users, self.uri, pragmas, start, end)
+            for start, end in key_ranges(low_user, high_user, self.parts)
+        ] + [
+            self.executor.submit(aggregate_days, self.uri, pragmas, start, end)
+            for start, end in key_ranges(low_id, high_id, self.parts)
+        ]
+        for future in futures:
+            total.merge(future.result())
+        return total
+
+    def conversation_stats(self, partial: Optional[PartialStats] = None) -> List[StatsRow]:
+        """(username, message_count, last_message) в порядке get_conversation_stats"""
+        if partial is None:
+            partial = self.aggregate()
+        stats = [
+            (
+                user_id,
+                username,
+                partial.counts.get(user_id, 0),
+                _parse(partial.last.get(user_id)),
+            )
+            for user_id, username in self._users()
+        ]
+        stats.sort(key=lambda row: (-row[2], row[0]))
+        return [(username, count, last) for _, username, count, last in stats]
+
+    def daily_histogram(self, partial: Optional[PartialStats] = None) -> List[Tuple[str, int]]:
+        """[(день 'YYYY-MM-DD', сообщений)] по возрастанию дня"""
+        if partial is None:
+            partial = self.aggregate()
+        return sorted(partial.days.items())
+
+    def top_talkers(self, n: int = 10, partial: Optional[PartialStats] = None) -> List[StatsRow]:
+        """n самых активных пользователей: (username, message_count, last_message)"""
+        if partial is None:
+            partial = self.aggregate()
+        usernames = dict(self._users())
+        top = heapq.nlargest(n, partial.counts.items(), key=lambda item: (item[1], -item[0]))
+        return [
+            (usernames.get(user_id, str(user_id)), count, _parse(partial.last[user_id]))
+            for user_id, count in top
+        ]
+
+    def _users(self) -> List[Tuple[int, str]]:
+        with closing(sqlite3.connect(self.uri, uri=True)) as conn:
+            return conn.execute('SELECT id, username FROM users').fetchall()
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
@@ -0,0 +1,231 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from pydantic_sqlalchemy.database import Base, EngineProfile
+from pydantic_sqlalchemy.models import Message, User
+from pydantic_sqlalchemy.repositories import (
+    conversation_stats_select,
+    keyset_select,
+    select_messages_with_user,
+)
+from pydantic_sqlalchemy.schemas import (
+    MessageCreate,
+    MessagePage,
+    MessageResponse,
+    UserCreate,
+    UserImportResult,
+    UserResponse,
+)
+from pydantic_sqlalchemy.services import (
+    DUPLICATE_USER_ERROR,
+    batches,
+    build_page,
+    check_batch_users,
+    decode_cursor,
+    filter_new_users,
+    import_results,
+    message_responses,
+    messages_insert,
+    taken_users_select,
+    users_insert,
+)
+
+
+class AsyncDatabaseService:
+    """Асинхронный аналог DatabaseService поверх AsyncEngine и aiosqlite"""
+
+    def __init__(
+        self,
+        database_url: str = 'sqlite+aiosqlite:///messenger2.db',
+        profile: Optional[EngineProfile] = None,
+    ):
+        self.profile = profile or EngineProfile()
+        self.engine = create_async_engine(database_url, **self.profile.pool_options(database_url))
+        event.listen(self.engine.sync_engine, 'connect', self.profile.apply_pragmas)
+        # Без expire_on_commit: ленивые перечитывания в асинхронном коде недоступны
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def create_tables(self):
+        """Создает все таблицы в базе данных"""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        print('✅ Таблицы созданы успешно!')
+
+    def get_session(self) -> AsyncSession:
+        """Возвращает асинхронную сессию для работы с БД"""
+        return self.session_factory()
+
+    async def dispose(self):
+        """Закрывает все соединения пула"""
+        await self.engine.dispose()
+
+
+class AsyncUserService:
+    def __init__(self, db_service: AsyncDatabaseService):
+        self.db_service = db_service
+
+    async def create_user(self, user_data: UserCreate) -> UserResponse:
+        """Создает нового пользователя"""
+        async with self.db_service.get_session() as session:
+            existing_user = (
+                await session.execute(
+                    select(User.id).where(
+                        (User.username == user_data.username) | (User.email == user_data.email)
+                    )
+                )
+            ).first()
+            if existing_user:
+                raise ValueError(DUPLICATE_USER_ERROR)
+
+            user = User(**user_data.model_dump())
+            session.add(user)
+            await session.commit()
+
+            print(f'✅ Создан пользователь: {user.username}')
+            return UserResponse.from_db(user)
+
+    async def create_users(
+        self,
+        users_data: Iterable[UserCreate],
+        batch_size: int = 1000,
+        on_conflict_do_nothing: bool = False,
+    ) -> List[UserImportResult]:
+        """Импортирует пользователей пачками, см. UserService.create_users"""
+        if batch_size < 1:
+            raise ValueError('batch_size должен быть положительным')
+
+        results = []
+        async with self.db_service.get_session() as session:
+            for batch in batches(enumerate(users_data), batch_size):
+                taken = (await session.execute(taken_users_select(batch))).all()
+                new_users = filter_new_users(batch, taken)
+
+                rows = []
+                if new_users:
+                    rows = (
+                        await session.execute(
+                            users_insert(on_conflict_do_nothing),
+                            [user_data.model_dump() for user_data in new_users.values()],
+                        )
+                    ).all()
+                    await session.commit()
+                results.extend(import_results(batch, new_users, rows))
+
+        created = sum(result.created for result in results)
+        print(f'✅ Импортировано пользователей: {created}, дубликатов: {len(results) - created}')
+        return results
+
+    async def get_all_users(self) -> List[UserResponse]:
+        """Возвращает всех пользователей"""
+        async with self.db_service.get_session() as session:
+            users = (await session.execute(select(User))).scalars().all()
+            return [UserResponse.from_db(user) for user in users]
+
+    async def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
+        """Находит пользователя по ID"""
+        async with self.db_service.get_session() as session:
+            user = await session.get(User, user_id)
+            return UserResponse.from_db(user) if user else None
+
+
+class AsyncMessageService:
+    def __init__(self, db_service: AsyncDatabaseService):
+        self.db_service = db_service
+
+    async def create_message(self, message_data: MessageCreate) -> MessageResponse:
+        """Создает новое сообщение"""
+        async with self.db_service.get_session() as session:
+            user = await session.get(User, message_data.user_id)
+            if not user:
+                raise ValueError(f'Пользователь с ID {message_data.user_id} не найден')
+
+            message = Message(**message_data.model_dump())
+            session.add(message)
+            await session.commit()
+
+            print(f'✅ Создано сообщение от {user.username}')
+            return MessageResponse.from_db(message, UserResponse.from_db(user))
+
+    async def create_messages(
+        self,
+        messages_data: Iterable[MessageCreate],
+        batch_size: int = 1000,
+        return_ids: bool = False,
+    ) -> List[MessageResponse] | List[int]:
+        """Создает сообщения пачками, см. MessageService.create_messages"""
+        if batch_size < 1:
+            raise ValueError('batch_size должен быть положительным')
+
+        results = []
+        async with self.db_service.get_session() as session:
+            for batch in batches(messages_data, batch_size):
+                users = {
+                    user.id: user
+                    for user in (
+                        await session.execute(
+                            select(User).where(User.id.in_({msg.user_id for msg in batch}))
+                        )
+                    ).scalars()
+                }
+                check_batch_users(batch, users)
+
+                rows = (
+                    await session.execute(messages_insert(), [msg.model_dump() for msg in batch])
+                ).all()
+                await session.commit()
+
+                if return_ids:
+                    results.extend(row.id for row in rows)
+                    continue
+
+                user_responses = {
+                    user_id: UserResponse.from_db(user) for user_id, user in users.items()
+                }
+                results.extend(message_responses(batch, rows, user_responses))
+
+        print(f'✅ Создано сообщений: {len(results)}')
+        return results
+
+    async def get_all_messages(self) -> List[MessageResponse]:
+        """Возвращает все сообщения с информацией о пользователях"""
+        async with self.db_service.get_session() as session:
+            messages = (
+                await session.execute(
+                    select_messages_with_user().order_by(Message.created_at, Message.id)
+                )
+            ).scalars()
+            return [MessageResponse.from_db(msg) for msg in messages]
+
+    async def get_user_messages(self, user_id: int) -> List[MessageResponse]:
+        """Возвращает сообщения конкретного пользователя"""
+        async with self.db_service.get_session() as session:
+            messages = (
+                await session.execute(
+                    select_messages_with_user()
+                    .where(Message.user_id == user_id)
+                    .order_by(Message.created_at, Message.id)
+                )
+            ).scalars()
+            return [MessageResponse.from_db(msg) for msg in messages]
+
+    async def get_messages_page(
+        self, limit: int = 50, cursor: Optional[str] = None, user_id: Optional[int] = None
+    ) -> MessagePage:
+        """Возвращает одну страницу сообщений и курсор на следующую"""
+        if limit < 1:
+            raise ValueError('limit должен быть положительным')
+
+        after = decode_cursor(cursor) if cursor else None
+        async with self.db_service.get_session() as session:
+            messages = (
+                await session.execute(keyset_select(user_id, after, limit + 1))
+            ).scalars()
+            items = [MessageResponse.from_db(msg) for msg in messages]
+            return build_page(items, limit)
+
+    async def get_conversation_stats(self):
+        """Статистика по сообщениям пользователей"""
+        async with self.db_service.get_session() as session:
+            return (await session.execute(conversation_stats_select())).all()
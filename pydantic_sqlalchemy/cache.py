@@ -0,0 +1,122 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from pydantic_sqlalchemy.schemas import UserResponse
+
+
+class CacheBackend(ABC):
+    """Хранилище ключ-значение для кэша; локальное или внешнее (Redis и т.п.)"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Возвращает значение или None, если ключа нет или он устарел"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class LRUCache(CacheBackend):
+    """Потокобезопасный LRU-кэш в памяти процесса с ограниченным размером и TTL"""
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: Optional[float] = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size < 1:
+            raise ValueError('max_size должен быть положительным')
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[Optional[float], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class UserCache:
+    """Read-through кэш UserResponse по id и username со счетчиками попаданий"""
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend or LRUCache()
+        self.hits = 0
+        self.misses = 0
+
+    def get_by_id(self, user_id: int) -> Optional[UserResponse]:
+        return self._get(f'user:id:{user_id}')
+
+    def get_by_username(self, username: str) -> Optional[UserResponse]:
+        return self._get(f'user:username:{username}')
+
+    def put(self, user: UserResponse) -> None:
+        self.backend.set(f'user:id:{user.id}', user)
+        self.backend.set(f'user:username:{user.username}', user)
+
+    def invalidate(self, user_id: int, username: Optional[str] = None) -> None:
+        """Убирает пользователя из кэша; вызывать при любом изменении строки users"""
+        user = self.backend.get(f'user:id:{user_id}')
+        self.backend.delete(f'user:id:{user_id}')
+        usernames = {username} if username else set()
+        if user is not None:
+            usernames.add(user.username)
+        for name in usernames:
+            self.backend.delete(f'user:username:{name}')
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def _get(self, key: str) -> Optional[UserResponse]:
+        user = self.backend.get(key)
+        # Счетчики без блокировки: при гонке теряется разве что единица статистики
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
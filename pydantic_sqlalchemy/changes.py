@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from typing import Optional, Set, Tuple
+
+
+class ChangeNotifier:
+    """Версия, которая растет после каждого коммита новых сообщений в этом процессе
+
+    Ожидающие потоки и корутины просыпаются в notify(). Записи из других
+    процессов сюда не попадают: их ожидающий заметит только по таймауту.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._async_waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+        self.version = 0
+
+    def notify(self) -> None:
+        """Вызывается писателем после коммита"""
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # Цикл событий уже закрыт, ждать там некому
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> bool:
+        """Ждет, пока версия уйдет от version; False - истек таймаут"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != version, timeout)
+
+    async def wait_async(self, version: int, timeout: Optional[float] = None) -> bool:
+        """То же для корутин: поток цикла событий не блокируется"""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._condition:
+            if self.version != version:
+                return True
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
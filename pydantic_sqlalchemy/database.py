@@ -1,21 +1,184 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, Session
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import Engine, TextClause, UpdateBase, create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+
+from pydantic_sqlalchemy.changes import ChangeNotifier
 
 
 class Base(DeclarativeBase):
     pass
 
 
+@dataclass(frozen=True)
+class EngineProfile:
+    """Настройки пула соединений и PRAGMA, применяемые к каждому соединению SQLite
+
+    None в любой PRAGMA означает "оставить значение SQLite по умолчанию".
+    """
+
+    pool_size: int = 5
+    max_overflow: int = 5
+    pool_timeout: float = 30.0
+    journal_mode: Optional[str] = 'WAL'
+    synchronous: Optional[str] = 'NORMAL'
+    mmap_size: Optional[int] = 256 * 1024 * 1024  # байт
+    cache_size: Optional[int] = -64000  # отрицательное значение - в КиБ, т.е. ~64 МБ
+    busy_timeout: Optional[int] = 5000  # мс
+
+    @classmethod
+    def for_workers(cls, workers: int, **overrides) -> 'EngineProfile':
+        """Профиль с пулом на одно соединение для каждого рабочего потока"""
+        return cls(pool_size=workers, max_overflow=0, **overrides)
+
+    @classmethod
+    def untuned(cls) -> 'EngineProfile':
+        """Профиль без PRAGMA - поведение SQLite по умолчанию"""
+        return cls(
+            journal_mode=None, synchronous=None, mmap_size=None, cache_size=None, busy_timeout=None
+        )
+
+    def pragmas(self, readonly: bool = False) -> dict:
+        # Режим журнала выбирает писатель; соединение только для чтения его не меняет
+        return {
+            name: value
+            for name, value in (
+                ('journal_mode', None if readonly else self.journal_mode),
+                ('synchronous', self.synchronous),
+                ('mmap_size', self.mmap_size),
+                ('cache_size', self.cache_size),
+                ('busy_timeout', self.busy_timeout),
+            )
+            if value is not None
+        }
+
+    def pool_options(self, database_url: str) -> dict:
+        """Параметры пула для create_engine"""
+        # База в памяти живет в одном соединении, пул для нее не настраивается
+        if make_url(database_url).database in (None, '', ':memory:'):
+            return {}
+        return {
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow,
+            'pool_timeout': self.pool_timeout,
+        }
+
+    def apply_pragmas(self, dbapi_connection, connection_record):
+        """Обработчик события connect: выставляет PRAGMA новому соединению"""
+        self._execute_pragmas(dbapi_connection, self.pragmas())
+
+    def apply_read_pragmas(self, dbapi_connection, connection_record):
+        """То же для соединений только для чтения"""
+        self._execute_pragmas(dbapi_connection, self.pragmas(readonly=True))
+
+    @staticmethod
+    def _execute_pragmas(dbapi_connection, pragmas: dict):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def readonly_url(database_url: str) -> URL:
+    """URL того же файла SQLite, открываемого через URI с mode=ro"""
+    url = make_url(database_url)
+    if url.database in (None, '', ':memory:'):
+        raise ValueError('Разделение чтения и записи невозможно для базы в памяти')
+    return url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'})
+
+
+class RoutingSession(Session):
+    """Сессия, которая отправляет запись в движок писателя, а чтение - в пул читателей
+
+    После первой записи вся транзакция до commit/rollback идет через писателя,
+    чтобы сессия видела свои еще не закоммиченные изменения.
+    """
+
+    def __init__(self, *args, writer: Engine, reader: Engine, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        self.reader = reader
+        self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        # Текстовый SQL может менять данные, поэтому тоже уходит писателю
+        if self._writing or self._flushing or isinstance(clause, (UpdateBase, TextClause)):
+            self._writing = True
+            return self.writer
+        return self.reader
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._writing = False
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._writing = False
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._writing = False
+
+
 class DatabaseService:
-    def __init__(self, database_url: str = 'sqlite:///messenger2.db'):
-        self.engine = create_engine(database_url)
-        self.session_factory = Session.bind = self.engine
+    """Движки и фабрика сессий для базы SQLite
+
+    С split_reads=True запись идет через единственное соединение писателя
+    (пул из одного соединения: потоки ждут своей очереди в пуле, а не ловят
+    "database is locked"), а чтение - через пул соединений только для чтения
+    поверх WAL. get_session() сама выбирает движок для каждого запроса.
+    """
+
+    def __init__(
+        self,
+        database_url: str = 'sqlite:///messenger2.db',
+        profile: Optional[EngineProfile] = None,
+        split_reads: bool = False,
+    ):
+        self.profile = profile or EngineProfile()
+        self.split_reads = split_reads
+        # Писатели сообщений дергают его после коммита, подписчики ленты его ждут
+        self.changes = ChangeNotifier()
+        if not split_reads:
+            self.engine = create_engine(database_url, **self.profile.pool_options(database_url))
+            event.listen(self.engine, 'connect', self.profile.apply_pragmas)
+            self.read_engine = self.engine
+            self.session_factory = sessionmaker(bind=self.engine)
+            return
+
+        read_url = readonly_url(database_url)
+        self.engine = create_engine(
+            database_url, pool_size=1, max_overflow=0, pool_timeout=self.profile.pool_timeout
+        )
+        event.listen(self.engine, 'connect', self.profile.apply_pragmas)
+        # Соединение писателя включает WAL до того, как откроется первый читатель
+        with self.engine.connect():
+            pass
+        self.read_engine = create_engine(read_url, **self.profile.pool_options(database_url))
+        event.listen(self.read_engine, 'connect', self.profile.apply_read_pragmas)
+        self.session_factory = sessionmaker(
+            class_=RoutingSession, writer=self.engine, reader=self.read_engine
+        )
 
     def create_tables(self):
         """Создает все таблицы в базе данных"""
         Base.metadata.create_all(self.engine)
         print('✅ Таблицы созданы успешно!')
 
-    def get_session(self):
+    def get_session(self) -> Session:
         """Возвращает сессию для работы с БД"""
-        return Session(self.engine)
+        return self.session_factory()
+
+    def dispose(self):
+        """Закрывает соединения обоих пулов"""
+        self.engine.dispose()
+        if self.read_engine is not self.engine:
+            self.read_engine.dispose()
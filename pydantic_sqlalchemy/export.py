@@ -0,0 +1,126 @@
+import csv
+import gzip
+import io
+from contextlib import nullcontext
+from typing import BinaryIO, Literal, Optional
+
+from pydantic_core import to_json
+from sqlalchemy import String, select, type_coerce
+
+from pydantic_sqlalchemy.database import DatabaseService
+from pydantic_sqlalchemy.models import Message, MessageFeedEntry, User
+from pydantic_sqlalchemy.schemas import MessageExportResult
+
+ExportFormat = Literal['ndjson', 'csv']
+Compression = Literal['gzip', 'zstd']
+
+# Та же форма, что печатает pure_sql.display_data
+EXPORT_FIELDS = ('id', 'username', 'message_text', 'created_at')
+
+
+def export_messages(
+    db_service: DatabaseService,
+    fp: BinaryIO,
+    format: ExportFormat = 'ndjson',
+    compression: Optional[Compression] = None,
+    since: Optional[str] = None,
+    batch_size: int = 1000,
+) -> MessageExportResult:
+    """Потоково пишет сообщения в fp, память не зависит от размера выгрузки
+
+    Сообщения идут в порядке коммита (seq ленты message_feed). since - водяной
+    знак прошлой выгрузки: выгружаются только закоммиченные после нее, в том
+    числе с более ранним created_at от параллельных писателей и WriteBehindQueue.
+    Новый водяной знак возвращается в результате.
+    fp не закрывается, так что подойдет и файл, и socket.makefile('wb').
+    """
+    if batch_size < 1:
+        raise ValueError('batch_size должен быть положительным')
+    if format not in ('ndjson', 'csv'):
+        raise ValueError(f'Неизвестный формат: {format}')
+
+    after_seq = _decode_watermark(since) if since else 0
+    rows = 0
+
+    # Один запрос на всю выгрузку: снимок базы на момент начала, строки читаются порциями
+    with db_service.read_engine.connect() as connection, _compressed(fp, compression) as out:
+        result = connection.execution_options(yield_per=batch_size).execute(
+            _export_select(after_seq)
+        )
+        write = _ndjson_writer(out) if format == 'ndjson' else _csv_writer(out)
+        for batch in result.partitions():
+            write(batch)
+            rows += len(batch)
+            after_seq = batch[-1].seq
+        if format == 'csv' and rows == 0:
+            write([])  # Заголовок CSV пишется и для пустой выгрузки
+
+    watermark = str(after_seq) if rows else since
+    return MessageExportResult(rows=rows, watermark=watermark)
+
+
+def _decode_watermark(since: str) -> int:
+    try:
+        return int(since)
+    except ValueError as e:
+        raise ValueError(f'Некорректный водяной знак: {since!r}') from e
+
+
+def _export_select(after_seq: int):
+    # Первый столбец - seq для водяного знака, в выгрузку он не попадает.
+    # created_at берется строкой как есть: без разбора в datetime и обратно
+    return (
+        select(
+            MessageFeedEntry.seq,
+            Message.id,
+            User.username,
+            Message.message_text,
+            type_coerce(Message.created_at, String).label('created_at'),
+        )
+        .join(Message, Message.id == MessageFeedEntry.message_id)
+        .join(Message.user)
+        .where(MessageFeedEntry.seq > after_seq)
+        .order_by(MessageFeedEntry.seq)
+    )
+
+
+def _compressed(fp: BinaryIO, compression: Optional[Compression]):
+    if compression is None:
+        return nullcontext(fp)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fp, mode='wb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise ImportError('Для сжатия zstd установите пакет zstandard') from exc
+        return zstandard.ZstdCompressor().stream_writer(fp, closefd=False)
+    raise ValueError(f'Неизвестное сжатие: {compression}')
+
+
+def _ndjson_writer(out: BinaryIO):
+    def write(batch):
+        out.write(
+            b''.join(
+                to_json(dict(zip(EXPORT_FIELDS, row[1:], strict=True))) + b'\n' for row in batch
+            )
+        )
+
+    return write
+
+
+def _csv_writer(out: BinaryIO):
+    header_written = False
+
+    def write(batch):
+        nonlocal header_written
+        # csv пишет только в текстовые потоки; обертку отцепляем, чтобы не закрыть out
+        text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+        writer = csv.writer(text)
+        if not header_written:
+            writer.writerow(EXPORT_FIELDS)
+            header_written = True
+        writer.writerows(row[1:] for row in batch)
+        text.detach()
+
+    return write
@@ -0,0 +1,271 @@
+"""Горячий слой: последние сообщения пользователей в памяти процесса
+
+Для каждого пользователя хранится кольцо из последних per_user сообщений:
+id и время - в массивах array (8 байт на значение вместо объектов int и
+datetime), текст - строкой. Кольцо заполняется из базы при первом чтении
+(read-through) и дальше пополняется записями MessageService, поэтому
+отвечает на запрос, только если точно знает все последние сообщения.
+
+Записи в обход сервисов с этим слоем (другие процессы, голый SQL) кольца не
+видят: после них вызывайте invalidate(user_id) или clear().
+"""
+
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from pydantic_sqlalchemy.schemas import MessageResponse, UserResponse
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(moment: datetime) -> int:
+    return (moment - EPOCH) // MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+class UserRing:
+    """Кольцевой буфер последних сообщений одного пользователя
+
+    Пока буфер не заполнен, массивы растут; после этого новое сообщение
+    записывается на место самого старого (позиция start).
+    """
+
+    __slots__ = ('user', 'capacity', 'ids', 'times', 'texts', 'start', 'complete', 'text_bytes')
+
+    def __init__(self, user: UserResponse, capacity: int, complete: bool):
+        self.user = user
+        self.capacity = capacity
+        self.ids = array('q')
+        self.times = array('q')  # created_at в микросекундах от EPOCH
+        self.texts: List[str] = []
+        self.start = 0  # Индекс самого старого сообщения
+        # True - в кольце все сообщения пользователя, а не только последние
+        self.complete = complete
+        self.text_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Память кольца: сам объект, массивы, список и строки текстов"""
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.ids)
+            + sys.getsizeof(self.times)
+            + sys.getsizeof(self.texts)
+            + self.text_bytes
+        )
+
+    def append(self, message_id: int, created_at: int, text: str) -> None:
+        """Добавляет сообщение; порядок (created_at, id) сохраняется
+
+        Сообщение, которое уже есть в кольце (прочитано из базы раньше, чем
+        писатель сообщил о коммите), пропускается.
+        """
+        for offset in range(len(self.ids) - 1, -1, -1):
+            i = self._position(offset)
+            if self.times[i] < created_at:
+                break
+            if self.ids[i] == message_id:
+                return
+        if len(self.ids) == self.capacity and (created_at, message_id) < (
+            self.times[self.start],
+            self.ids[self.start],
+        ):
+            # Поздний коммит старше всего кольца: в последние capacity он не входит
+            self.complete = False
+            return
+        if len(self.ids) < self.capacity:
+            self.ids.append(message_id)
+            self.times.append(created_at)
+            self.texts.append(text)
+        else:
+            self.complete = False  # Самое старое сообщение вытесняется
+            self.text_bytes -= sys.getsizeof(self.texts[self.start])
+            self.ids[self.start] = message_id
+            self.times[self.start] = created_at
+            self.texts[self.start] = text
+            self.start = (self.start + 1) % self.capacity
+        self.text_bytes += sys.getsizeof(text)
+
+        newest = self._position(len(self.ids) - 1)
+        previous = self._position(len(self.ids) - 2) if len(self.ids) > 1 else None
+        # Параллельные писатели могут сообщить о коммитах не по порядку - это редкость,
+        # поэтому кольцо просто пересобирается отсортированным
+        if previous is not None and (
+            (self.times[previous], self.ids[previous]) > (self.times[newest], self.ids[newest])
+        ):
+            self._resort()
+
+    def latest(self, limit: int) -> Iterable[tuple]:
+        """(id, created_at, text) последних limit сообщений, от старых к новым"""
+        size = len(self.ids)
+        for offset in range(max(0, size - limit), size):
+            i = self._position(offset)
+            yield self.ids[i], self.times[i], self.texts[i]
+
+    def _position(self, offset: int) -> int:
+        return (self.start + offset) % len(self.ids)
+
+    def _resort(self) -> None:
+        rows = sorted(zip(self.times, self.ids, self.texts, strict=True))
+        self.times = array('q', (row[0] for row in rows))
+        self.ids = array('q', (row[1] for row in rows))
+        self.texts = [row[2] for row in rows]
+        self.start = 0
+
+
+class HotMessageTier:
+    """Последние per_user сообщений пользователей, не больше max_bytes на все кольца
+
+    При превышении max_bytes вытесняются кольца пользователей, которых дольше
+    всех не читали. Потокобезопасен.
+    """
+
+    def __init__(self, per_user: int = 50, max_bytes: int = 64 * 1024 * 1024):
+        if per_user < 1 or max_bytes < 1:
+            raise ValueError('per_user и max_bytes должны быть положительными')
+        self.per_user = per_user
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._rings: OrderedDict[int, UserRing] = OrderedDict()
+        # Токены begin_load растут монотонно. Для пользователей, чье кольцо сейчас
+        # читается из базы, _changed хранит токен последней записи, _loading - число чтений
+        self._clock = 0
+        self._cleared = 0
+        self._changed: Dict[int, int] = {}
+        self._loading: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def recent(
+        self, user_id: int, limit: Optional[int] = None
+    ) -> Optional[List[MessageResponse]]:
+        """Последние limit (None - все) сообщений пользователя; None, если слой их не знает"""
+        with self._lock:
+            ring = self._rings.get(user_id)
+            if ring is None or not (ring.complete or (limit is not None and limit <= len(ring))):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._rings.move_to_end(user_id)
+            rows = list(ring.latest(len(ring) if limit is None else limit))
+            user = ring.user
+        return [
+            MessageResponse.model_construct(
+                message_text=text,
+                id=message_id,
+                user_id=user_id,
+                created_at=from_micros(created_at),
+                user=user,
+            )
+            for message_id, created_at, text in rows
+        ]
+
+    def has(self, user_id: int) -> bool:
+        """Есть ли кольцо пользователя, даже если оно не отвечает на запрос"""
+        with self._lock:
+            return user_id in self._rings
+
+    def begin_load(self, user_id: int) -> int:
+        """Вызывается перед чтением сообщений из базы; токен передается в load()"""
+        with self._lock:
+            self._clock += 1
+            self._loading[user_id] = self._loading.get(user_id, 0) + 1
+            return self._clock
+
+    def load(self, user_id: int, messages: List[MessageResponse], token: int) -> None:
+        """Заполняет кольцо последними сообщениями из базы (от старых к новым)
+
+        messages - последние не меньше per_user сообщений или вся история.
+        Если после begin_load пришла запись этого пользователя, прочитанное уже
+        могло устареть, и кольцо не создается.
+        """
+        with self._lock:
+            stale = self._changed.get(user_id, 0) > token or self._cleared > token
+            self._finish_load(user_id)
+            if stale or not messages:
+                # Без сообщений нет и UserResponse; пустые кольца не храним
+                return
+            ring = UserRing(messages[-1].user, self.per_user, len(messages) < self.per_user)
+            for message in messages[-self.per_user :]:
+                ring.append(message.id, to_micros(message.created_at), message.message_text)
+            self._replace(user_id, ring)
+
+    def add(self, message: MessageResponse) -> None:
+        """Дописывает закоммиченное сообщение в кольцо автора, если оно есть"""
+        with self._lock:
+            self._mark_changed(message.user_id)
+            ring = self._rings.get(message.user_id)
+            if ring is None:
+                return
+            before = ring.nbytes
+            ring.append(message.id, to_micros(message.created_at), message.message_text)
+            self.nbytes += ring.nbytes - before
+            self._evict()
+
+    def invalidate(self, user_id: int) -> None:
+        """Забывает кольцо пользователя; вызывать после изменений в обход слоя"""
+        with self._lock:
+            self._mark_changed(user_id)
+            ring = self._rings.pop(user_id, None)
+            if ring is not None:
+                self.nbytes -= ring.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rings.clear()
+            self._clock += 1
+            self._cleared = self._clock
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'users': len(self._rings),
+                'messages': sum(len(ring) for ring in self._rings.values()),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def _mark_changed(self, user_id: int) -> None:
+        if user_id in self._loading:
+            self._clock += 1
+            self._changed[user_id] = self._clock
+
+    def _finish_load(self, user_id: int) -> None:
+        left = self._loading.pop(user_id, 0) - 1
+        if left > 0:
+            self._loading[user_id] = left
+        else:
+            self._changed.pop(user_id, None)
+
+    def _replace(self, user_id: int, ring: UserRing) -> None:
+        old = self._rings.pop(user_id, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self._rings[user_id] = ring
+        self.nbytes += ring.nbytes
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and self._rings:
+            _, ring = self._rings.popitem(last=False)
+            self.nbytes -= ring.nbytes
+            self.evictions += 1
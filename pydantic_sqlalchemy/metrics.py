@@ -0,0 +1,352 @@
+"""Метрики запросов: счетчики, время и строки по каждому SQL, журнал медленных запросов
+
+Инструментирование включается явно (instrument, instrument_service или
+Metrics.connect для pure_sql.py); без него код работает на обычных
+соединениях sqlite3 и ничего не платит.
+"""
+
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, Optional, Tuple
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import make_url
+
+from pydantic_sqlalchemy.database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+MAX_STATEMENT_LABEL = 200
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+
+
+class Histogram:
+    """Гистограмма задержек в формате Prometheus: корзины, сумма и количество"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """[(граница, наблюдений не больше нее)], последняя граница - +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, float('inf')), self.counts, strict=True):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(statement: str) -> str:
+    """SQL в одну строку и не длиннее MAX_STATEMENT_LABEL - ключ метрик"""
+    label = ' '.join(statement.split())
+    if len(label) > MAX_STATEMENT_LABEL:
+        label = label[: MAX_STATEMENT_LABEL - 3] + '...'
+    return label
+
+
+class Metrics:
+    """Накопитель метрик; один объект можно подключить к нескольким движкам и сервисам"""
+
+    def __init__(
+        self,
+        slow_threshold: Optional[float] = 0.1,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        slow_log_size: int = 100,
+    ):
+        # Запросы дольше slow_threshold секунд пишутся в журнал; None - журнал выключен
+        self.slow_threshold = slow_threshold
+        self.buckets = buckets
+        self.statements: Dict[str, StatementStats] = {}
+        self.methods: Dict[str, Histogram] = {}
+        self.slow_queries: Deque[Tuple[float, str]] = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self.connection_class = _connection_class(self)
+
+    def connect(self, database: str, **kwargs) -> sqlite3.Connection:
+        """sqlite3.connect с инструментированными курсорами, для pure_sql.py"""
+        return sqlite3.connect(database, factory=self.connection_class, **kwargs)
+
+    def record_statement(self, statement: str, seconds: float, rows: int) -> None:
+        label = statement_label(statement)
+        with self._lock:
+            stats = self.statements.get(label)
+            if stats is None:
+                stats = self.statements[label] = StatementStats()
+            stats.count += 1
+            stats.seconds += seconds
+            stats.rows += rows
+            slow = self.slow_threshold is not None and seconds >= self.slow_threshold
+            if slow:
+                self.slow_queries.append((seconds, label))
+        if slow:
+            logger.warning('Медленный запрос (%.1f мс, строк %d): %s', seconds * 1000, rows, label)
+
+    def observe_method(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.methods.get(name)
+            if histogram is None:
+                histogram = self.methods[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.statements.clear()
+            self.methods.clear()
+            self.slow_queries.clear()
+
+    def snapshot(self) -> dict:
+        """Копия текущих значений, которую можно сравнивать и сериализовать"""
+        with self._lock:
+            return {
+                'statements': {
+                    label: {'count': s.count, 'seconds': s.seconds, 'rows': s.rows}
+                    for label, s in self.statements.items()
+                },
+                'methods': {
+                    name: {
+                        'count': h.count,
+                        'sum': h.sum,
+                        'buckets': h.cumulative(),
+                    }
+                    for name, h in self.methods.items()
+                },
+                'slow_queries': list(self.slow_queries),
+            }
+
+    def to_prometheus(self) -> str:
+        """Снимок метрик в текстовом формате Prometheus"""
+        snapshot = self.snapshot()
+        statements = snapshot['statements']
+        lines = []
+        for metric, field, kind, help_text in (
+            ('sql_statements_total', 'count', 'counter', 'Выполнено SQL-запросов'),
+            ('sql_statement_seconds_total', 'seconds', 'counter', 'Время выполнения, с'),
+            ('sql_statement_rows_total', 'rows', 'counter', 'Прочитано или изменено строк'),
+        ):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+            lines += [
+                f'{metric}{{statement="{_escape(label)}"}} {values[field]}'
+                for label, values in statements.items()
+            ]
+
+        metric = 'sql_slow_statements'
+        lines += [
+            f'# HELP {metric} Запросов в журнале медленных',
+            f'# TYPE {metric} gauge',
+            f'{metric} {len(snapshot["slow_queries"])}',
+        ]
+
+        metric = 'service_method_seconds'
+        lines += [f'# HELP {metric} Время методов сервисов, с', f'# TYPE {metric} histogram']
+        for name, histogram in snapshot['methods'].items():
+            method = f'method="{_escape(name)}"'
+            for bound, count in histogram['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{{method},le="{le}"}} {count}')
+            lines.append(f'{metric}_sum{{{method}}} {histogram["sum"]}')
+            lines.append(f'{metric}_count{{{method}}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path) -> Path:
+        """Атомарно записывает снимок в файл, например для textfile collector node_exporter"""
+        path = Path(path)
+        tmp = path.with_name(f'.{path.name}.tmp')
+        tmp.write_text(self.to_prometheus(), encoding='utf-8')
+        os.replace(tmp, path)
+        return path
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _connection_class(metrics: Metrics) -> type:
+    """Подкласс sqlite3.Connection, чьи курсоры отчитываются в metrics"""
+
+    class InstrumentedCursor(sqlite3.Cursor):
+        # Время запроса в SQLite набегает и в execute, и в fetch*: execute лишь
+        # выполняет первый шаг. Поэтому запрос закрывается, когда строки кончились,
+        # курсор закрыт или на нем выполняется следующий запрос
+        _statement = None
+        _seconds = 0.0
+        _rows = 0
+
+        def execute(self, sql, parameters=()):
+            self._finish()
+            start = time.perf_counter()
+            try:
+                return super().execute(sql, parameters)
+            finally:
+                self._begin(sql, time.perf_counter() - start)
+
+        def executemany(self, sql, seq_of_parameters):
+            self._finish()
+            start = time.perf_counter()
+            try:
+                return super().executemany(sql, seq_of_parameters)
+            finally:
+                self._begin(sql, time.perf_counter() - start)
+
+        def fetchone(self):
+            start = time.perf_counter()
+            row = super().fetchone()
+            self._fetched(start, 0 if row is None else 1, row is None)
+            return row
+
+        def fetchmany(self, size=None):
+            size = self.arraysize if size is None else size
+            start = time.perf_counter()
+            rows = super().fetchmany(size)
+            self._fetched(start, len(rows), len(rows) < size)
+            return rows
+
+        def fetchall(self):
+            start = time.perf_counter()
+            rows = super().fetchall()
+            self._fetched(start, len(rows), True)
+            return rows
+
+        def __next__(self):
+            start = time.perf_counter()
+            try:
+                row = super().__next__()
+            except StopIteration:
+                self._fetched(start, 0, True)
+                raise
+            self._fetched(start, 1, False)
+            return row
+
+        def close(self):
+            self._finish()
+            super().close()
+
+        def _begin(self, sql, seconds):
+            self._statement = sql
+            self._seconds = seconds
+            # Для SELECT rowcount равен -1, строки считаются при чтении
+            self._rows = max(self.rowcount, 0)
+
+        def _fetched(self, start, rows, exhausted):
+            self._seconds += time.perf_counter() - start
+            self._rows += rows
+            if exhausted:
+                self._finish()
+
+        def _finish(self):
+            if self._statement is not None:
+                metrics.record_statement(self._statement, self._seconds, self._rows)
+                self._statement = None
+
+    class InstrumentedConnection(sqlite3.Connection):
+        def cursor(self, factory=InstrumentedCursor):
+            return super().cursor(factory)
+
+        def execute(self, sql, parameters=()):
+            return self.cursor().execute(sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self.cursor().executemany(sql, seq_of_parameters)
+
+    return InstrumentedConnection
+
+
+def instrument_engine(engine: Engine, metrics: Metrics) -> None:
+    """Новые соединения движка создаются с курсорами, отчитывающимися в metrics
+
+    Соединения, уже лежащие в пуле, закрываются, чтобы их заменили
+    инструментированные; для базы в памяти пул не трогаем - с ним пропали бы данные.
+    """
+
+    def use_instrumented_connection(dialect, conn_rec, cargs, cparams):
+        cparams['factory'] = metrics.connection_class
+
+    event.listen(engine, 'do_connect', use_instrumented_connection)
+    if make_url(str(engine.url)).database not in (None, '', ':memory:'):
+        engine.dispose()
+
+
+def instrument(db_service: DatabaseService, metrics: Metrics) -> Metrics:
+    """Подключает metrics к движкам записи и чтения DatabaseService"""
+    instrument_engine(db_service.engine, metrics)
+    if db_service.read_engine is not db_service.engine:
+        instrument_engine(db_service.read_engine, metrics)
+    return metrics
+
+
+def instrument_service(service, metrics: Metrics) -> None:
+    """Оборачивает публичные методы объекта сервиса замером времени
+
+    Гистограммы называются по классу и методу, например MessageService.create_message.
+    Для генераторов (iter_*, create_users) время меряется до исчерпания,
+    для корутин (subscribe_async) - до завершения await.
+    """
+    cls_name = type(service).__name__
+    for name, method in inspect.getmembers(service, inspect.ismethod):
+        if name.startswith('_'):
+            continue
+        setattr(service, name, _timed(method, f'{cls_name}.{name}', metrics))
+
+
+def _timed(method, name: str, metrics: Metrics):
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except BaseException:
+            metrics.observe_method(name, time.perf_counter() - start)
+            raise
+        # Генератор возвращают и генераторные функции, и обычные методы вроде
+        # iter_all_messages: время считается до его исчерпания
+        if inspect.isgenerator(result):
+            return _timed_generator(result, start, name, metrics)
+        # Корутина только создана: время считается до завершения await
+        if inspect.isawaitable(result):
+            return _timed_awaitable(result, start, name, metrics)
+        metrics.observe_method(name, time.perf_counter() - start)
+        return result
+
+    return timed
+
+
+def _timed_generator(generator, start: float, name: str, metrics: Metrics):
+    try:
+        yield from generator
+    finally:
+        metrics.observe_method(name, time.perf_counter() - start)
+
+
+async def _timed_awaitable(awaitable, start: float, name: str, metrics: Metrics):
+    try:
+        return await awaitable
+    finally:
+        metrics.observe_method(name, time.perf_counter() - start)
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from sqlalchemy import DateTime, ForeignKey, String, Text
+from sqlalchemy import Connection, DateTime, ForeignKey, Index, String, Text, event, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from pydantic_sqlalchemy.database import Base
@@ -26,9 +26,19 @@ class User(Base):
 
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Для постраничного чтения по курсору (created_at, id)
+        Index('ix_messages_created_at_id', 'created_at', 'id'),
+        # Для выборок "последние сообщения пользователя"; rowid (id) входит в индекс неявно
+        Index('ix_messages_user_id_created_at', 'user_id', 'created_at'),
+        # Лента комнаты: последние N, страница до курсора и непрочитанные - диапазон индекса
+        Index('ix_messages_room_id_created_at_id', 'room_id', 'created_at', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    # None - сообщение из общей ленты, вне комнат
+    room_id: Mapped[Optional[int]] = mapped_column(ForeignKey('rooms.id'))
     message_text: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -37,3 +47,252 @@ class Message(Base):
 
     def __repr__(self):
         return f'Message(id={self.id}, user_id={self.user_id}, text={self.message_text[:20]}...)'
+
+
+class Room(Base):
+    __tablename__ = 'rooms'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'Room(id={self.id}, name={self.name})'
+
+
+class RoomMember(Base):
+    """Участник комнаты и его отметка прочтения"""
+
+    __tablename__ = 'room_members'
+    __table_args__ = (
+        # Для выборок "комнаты пользователя"
+        Index('ix_room_members_user_id', 'user_id'),
+    )
+
+    room_id: Mapped[int] = mapped_column(ForeignKey('rooms.id'), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    joined_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Последнее прочитанное сообщение как позиция (created_at, id); None - ничего не прочитано
+    last_read_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    last_read_message_id: Mapped[Optional[int]] = mapped_column()
+
+    def __repr__(self):
+        return f'RoomMember(room_id={self.room_id}, user_id={self.user_id})'
+
+
+class UserMessageStats(Base):
+    """Счетчики сообщений пользователя, их поддерживают триггеры на messages"""
+
+    __tablename__ = 'user_message_stats'
+
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    message_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    last_message_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    def __repr__(self):
+        return f'UserMessageStats(user_id={self.user_id}, count={self.message_count})'
+
+
+class MessageFeedEntry(Base):
+    """Позиция сообщения в ленте изменений; строки добавляют триггеры на messages"""
+
+    __tablename__ = 'message_feed'
+    __table_args__ = (
+        # Для триггера удаления: строка ленты уходит вместе с сообщением
+        Index('ix_message_feed_message_id', 'message_id'),
+        # AUTOINCREMENT: seq не переиспользуется даже после удаления последних строк
+        {'sqlite_autoincrement': True},
+    )
+
+    seq: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    message_id: Mapped[int] = mapped_column(nullable=False)
+
+    def __repr__(self):
+        return f'MessageFeedEntry(seq={self.seq}, message_id={self.message_id})'
+
+
+class MessagePartition(Base):
+    """Месяц сообщений, вынесенный из messages в отдельный файл SQLite"""
+
+    __tablename__ = 'message_partitions'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)  # messages_2024_01
+    path: Mapped[str] = mapped_column(Text, nullable=False)
+    # Полуинтервал [period_start, period_end) по created_at
+    period_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    period_end: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    row_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'MessagePartition(name={self.name}, rows={self.row_count})'
+
+
+# Триггеры держат user_message_stats в актуальном состоянии при любой записи в messages,
+# в том числе в обход ORM. last_message_at пересчитывается только при удалении
+# последнего сообщения пользователя.
+MESSAGE_STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_stats_insert AFTER INSERT ON messages
+    BEGIN
+        INSERT INTO user_message_stats (user_id, message_count, last_message_at)
+        VALUES (NEW.user_id, 1, NEW.created_at)
+        ON CONFLICT (user_id) DO UPDATE SET
+            message_count = message_count + 1,
+            last_message_at = CASE
+                WHEN last_message_at IS NULL OR excluded.last_message_at > last_message_at
+                THEN excluded.last_message_at
+                ELSE last_message_at
+            END;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_stats_delete AFTER DELETE ON messages
+    BEGIN
+        UPDATE user_message_stats SET
+            message_count = message_count - 1,
+            last_message_at = CASE
+                WHEN OLD.created_at < last_message_at THEN last_message_at
+                ELSE (SELECT MAX(created_at) FROM messages WHERE user_id = OLD.user_id)
+            END
+        WHERE user_id = OLD.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_stats_update
+    AFTER UPDATE OF user_id, created_at ON messages
+    BEGIN
+        UPDATE user_message_stats SET
+            message_count = message_count - 1,
+            last_message_at = (SELECT MAX(created_at) FROM messages WHERE user_id = OLD.user_id)
+        WHERE user_id = OLD.user_id;
+        INSERT INTO user_message_stats (user_id, message_count, last_message_at)
+        VALUES (NEW.user_id, 1, NEW.created_at)
+        ON CONFLICT (user_id) DO UPDATE SET
+            message_count = message_count + 1,
+            last_message_at = (SELECT MAX(created_at) FROM messages WHERE user_id = NEW.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON users
+    BEGIN
+        DELETE FROM user_message_stats WHERE user_id = OLD.id;
+    END
+    """,
+]
+
+
+# Полнотекстовый индекс FTS5 по message_text. Таблица external content: текст
+# хранится только в messages, а индекс синхронизируют триггеры.
+MESSAGES_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+    USING fts5(message_text, content='messages', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert AFTER INSERT ON messages
+    BEGIN
+        INSERT INTO messages_fts (rowid, message_text) VALUES (NEW.id, NEW.message_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete AFTER DELETE ON messages
+    BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, message_text)
+        VALUES ('delete', OLD.id, OLD.message_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update
+    AFTER UPDATE OF id, message_text ON messages
+    BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, message_text)
+        VALUES ('delete', OLD.id, OLD.message_text);
+        INSERT INTO messages_fts (rowid, message_text) VALUES (NEW.id, NEW.message_text);
+    END
+    """,
+]
+
+
+# Лента изменений: seq выдается в порядке коммитов, потому что SQLite пишет
+# одной транзакцией за раз. Удаленные (и вынесенные в архив) сообщения
+# пропадают из ленты, иначе их переиспользованный id попал бы в нее дважды.
+MESSAGE_FEED_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_feed_insert AFTER INSERT ON messages
+    BEGIN
+        INSERT INTO message_feed (message_id) VALUES (NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_feed_delete AFTER DELETE ON messages
+    BEGIN
+        DELETE FROM message_feed WHERE message_id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_messages_feed_update AFTER UPDATE OF id ON messages
+    BEGIN
+        UPDATE message_feed SET message_id = NEW.id WHERE message_id = OLD.id;
+    END
+    """,
+]
+
+
+def rebuild_user_message_stats(connection: Connection) -> None:
+    """Пересчитывает user_message_stats целиком по таблице messages"""
+    connection.execute(text('DELETE FROM user_message_stats'))
+    connection.execute(
+        text(
+            """
+            INSERT INTO user_message_stats (user_id, message_count, last_message_at)
+            SELECT user_id, COUNT(*), MAX(created_at) FROM messages GROUP BY user_id
+            """
+        )
+    )
+
+
+def rebuild_messages_fts(connection: Connection) -> None:
+    """Перестраивает полнотекстовый индекс по таблице messages"""
+    connection.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"))
+
+
+def fill_message_feed(connection: Connection) -> None:
+    """Ставит в ленту уже существующие сообщения в порядке id"""
+    connection.execute(
+        text('INSERT INTO message_feed (message_id) SELECT id FROM messages ORDER BY id')
+    )
+
+
+def _add_messages_room_id(connection: Connection) -> None:
+    """Добавляет room_id и индекс ленты в messages, созданную до появления комнат"""
+    columns = {row.name for row in connection.execute(text('PRAGMA table_info(messages)'))}
+    if 'room_id' in columns:
+        return
+    connection.execute(
+        text('ALTER TABLE messages ADD COLUMN room_id INTEGER REFERENCES rooms (id)')
+    )
+    connection.execute(
+        text(
+            'CREATE INDEX IF NOT EXISTS ix_messages_room_id_created_at_id '
+            'ON messages (room_id, created_at, id)'
+        )
+    )
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def _create_triggers(target, connection: Connection, tables=(), **kw):
+    _add_messages_room_id(connection)
+    fts_existed = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'")
+    ).first()
+    for ddl in MESSAGE_STATS_TRIGGERS + MESSAGES_FTS_DDL + MESSAGE_FEED_TRIGGERS:
+        connection.execute(text(ddl))
+
+    # Производные таблицы появились в уже заполненной базе - заполняем их сразу
+    if UserMessageStats.__table__ in tables:
+        rebuild_user_message_stats(connection)
+    if not fts_existed:
+        rebuild_messages_fts(connection)
+    if MessageFeedEntry.__table__ in tables:
+        fill_message_feed(connection)
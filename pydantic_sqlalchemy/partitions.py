@@ -0,0 +1,345 @@
+"""Помесячный архив сообщений в отдельных файлах SQLite
+
+Новые сообщения всегда пишутся в messages ("горячая" партиция). archive()
+переносит закрытые месяцы в файлы messages_YYYY_MM.db и регистрирует их в
+message_partitions; чтение по диапазону времени подключает (ATTACH) только
+те файлы, чьи месяцы пересекаются с диапазоном, и только на чтение.
+"""
+
+import stat
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import (
+    Connection,
+    DateTime,
+    Integer,
+    Text,
+    bindparam,
+    case,
+    column,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    table,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from pydantic_sqlalchemy.database import DatabaseService
+from pydantic_sqlalchemy.models import Message, MessagePartition, User, UserMessageStats
+from pydantic_sqlalchemy.schemas import MessagePartitionResponse, MessageResponse, UserResponse
+
+ARCHIVE_SCHEMA = 'archive'
+
+# messages внутри подключенного файла архива
+archived_messages = table(
+    'messages',
+    column('id', Integer),
+    column('user_id', Integer),
+    column('room_id', Integer),
+    column('message_text', Text),
+    column('created_at', DateTime),
+    schema=ARCHIVE_SCHEMA,
+)
+
+ARCHIVE_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.messages (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER,
+        message_text TEXT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.ix_messages_user_id_created_at
+    ON messages (user_id, created_at)
+    """,
+]
+
+StatsRow = Tuple[str, int, Optional[datetime]]
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(start: datetime) -> datetime:
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+@contextmanager
+def attached(connection: Connection, path: str, readonly: bool = True) -> Iterator[None]:
+    """Подключает файл архива как схему archive; ATTACH нельзя делать внутри транзакции
+
+    Файл подключается по обычному пути: URI с mode=ro SQLite разбирает, только
+    если соединение открыто с uri=True. Только чтение обеспечивает PRAGMA
+    query_only, которая на время подключения запрещает запись всему соединению.
+    """
+    connection.exec_driver_sql(
+        f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (str(Path(path).resolve()),)
+    )
+    query_only = None
+    try:
+        if readonly:
+            query_only = connection.exec_driver_sql('PRAGMA query_only').scalar()
+            connection.exec_driver_sql('PRAGMA query_only = 1')
+        yield
+    except BaseException:
+        connection.rollback()  # DETACH невозможен посреди транзакции
+        raise
+    finally:
+        if query_only is not None:
+            connection.exec_driver_sql(f'PRAGMA query_only = {query_only}')
+        connection.exec_driver_sql(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+
+
+def in_range(created_at, since: Optional[datetime], until: Optional[datetime]) -> list:
+    conditions = []
+    if since is not None:
+        conditions.append(created_at >= since)
+    if until is not None:
+        conditions.append(created_at < until)
+    return conditions
+
+
+class MessageArchive:
+    """Архивные партиции сообщений и их перенос из messages
+
+    Архивные месяцы видят только MessageService.get_user_messages (с любыми
+    since/until) и get_conversation_stats - материализованные счетчики и
+    подсчет за диапазон. Все остальные чтения работают только с messages и
+    молча не видят архив: get_all_messages, get_messages_page(_json),
+    iter_all_messages, iter_user_messages, get_latest_messages_per_user,
+    search (FTS5), tail/subscribe, ленты комнат, export_messages,
+    write_snapshot и ParallelAnalytics.
+    """
+
+    def __init__(self, db_service: DatabaseService, directory: Optional[Path] = None):
+        self.db_service = db_service
+        self.directory = Path(directory) if directory else None
+
+    def partitions(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[MessagePartitionResponse]:
+        """Архивные партиции, пересекающиеся с [since, until), по возрастанию времени"""
+        stmt = select(MessagePartition).order_by(MessagePartition.period_start)
+        if since is not None:
+            stmt = stmt.where(MessagePartition.period_end > since)
+        if until is not None:
+            stmt = stmt.where(MessagePartition.period_start < until)
+        with self.db_service.get_session() as session:
+            return [
+                MessagePartitionResponse.model_validate(partition)
+                for partition in session.execute(stmt).scalars()
+            ]
+
+    def archive(self, before: datetime) -> List[MessagePartitionResponse]:
+        """Переносит все месяцы целиком раньше before в файлы архива
+
+        Месяц, в который попадает before, остается в messages. Файлы после
+        записи становятся доступны только на чтение.
+        """
+        if self.directory is None:
+            raise ValueError('Для архивации нужен directory')
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        cutoff = month_start(before)
+        month = func.strftime('%Y-%m', Message.created_at)
+        with self.db_service.engine.connect() as connection:
+            months = connection.execute(
+                select(month).where(Message.created_at < cutoff).group_by(month).order_by(month)
+            ).scalars().all()
+            for value in months:
+                start = datetime.strptime(value, '%Y-%m')
+                self._archive_month(connection, start, next_month(start))
+
+        archived = self.partitions(until=cutoff)
+        print(f'✅ Архивировано месяцев: {len(months)}')
+        return archived
+
+    def archived_stats(self) -> List[dict]:
+        """Счетчики по пользователям из всех файлов архива, для пересчета статистики"""
+        totals = {}
+        with self.db_service.read_engine.connect() as connection:
+            for partition in self.partitions():
+                with attached(connection, partition.path):
+                    for row in connection.execute(_aggregate_select(archived_messages)):
+                        _merge(totals, row)
+        return [
+            {'uid': user_id, 'n': count, 'last': last}
+            for user_id, (count, last) in totals.items()
+        ]
+
+    def _archive_month(self, connection: Connection, start: datetime, end: datetime) -> None:
+        name = f'messages_{start:%Y_%m}'
+        path = self.directory / f'{name}.db'
+        if path.exists():
+            path.chmod(path.stat().st_mode | stat.S_IWUSR)  # Дописываем поздние сообщения
+
+        in_month = in_range(Message.created_at, start, end)
+        with attached(connection, str(path), readonly=False):
+            for ddl in ARCHIVE_DDL:
+                connection.exec_driver_sql(ddl)
+            _add_archive_room_id(connection)
+
+            moved = connection.execute(
+                _aggregate_select(Message.__table__).where(*in_month)
+            ).all()
+            moved_count = sum(row.n for row in moved)
+            connection.execute(
+                insert(archived_messages)
+                .prefix_with('OR IGNORE')
+                .from_select(
+                    ['id', 'user_id', 'room_id', 'message_text', 'created_at'],
+                    select(
+                        Message.id,
+                        Message.user_id,
+                        Message.room_id,
+                        Message.message_text,
+                        Message.created_at,
+                    ).where(*in_month),
+                )
+            )
+            connection.execute(delete(Message).where(*in_month))
+            # Триггер удаления уменьшил счетчики; сообщения не удалены, а перенесены
+            add_archived_stats(
+                connection, [{'uid': row.user_id, 'n': row.n, 'last': row.last} for row in moved]
+            )
+            connection.execute(
+                sqlite_insert(MessagePartition)
+                .values(
+                    name=name,
+                    path=str(path),
+                    period_start=start,
+                    period_end=end,
+                    row_count=moved_count,
+                )
+                .on_conflict_do_update(
+                    index_elements=['name'],
+                    set_={'row_count': MessagePartition.row_count + moved_count},
+                )
+            )
+            connection.commit()
+        path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        print(f'📦 {name}: {moved_count} сообщений -> {path}')
+
+
+def _add_archive_room_id(connection: Connection) -> None:
+    # Файлы архива, созданные до появления комнат, получают колонку при дописывании
+    info = connection.exec_driver_sql(f'PRAGMA {ARCHIVE_SCHEMA}.table_info(messages)')
+    if 'room_id' not in {row[1] for row in info}:
+        connection.exec_driver_sql(
+            f'ALTER TABLE {ARCHIVE_SCHEMA}.messages ADD COLUMN room_id INTEGER'
+        )
+
+
+def add_archived_stats(connection: Connection, rows: List[dict]) -> None:
+    """Прибавляет архивные счетчики к user_message_stats"""
+    if not rows:
+        return
+    last = UserMessageStats.last_message_at
+    stmt = sqlite_insert(UserMessageStats).values(
+        user_id=bindparam('uid'), message_count=bindparam('n'), last_message_at=bindparam('last')
+    )
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={
+                'message_count': UserMessageStats.message_count + stmt.excluded.message_count,
+                'last_message_at': case(
+                    (
+                        or_(last.is_(None), last < stmt.excluded.last_message_at),
+                        stmt.excluded.last_message_at,
+                    ),
+                    else_=last,
+                ),
+            },
+        ),
+        rows,
+    )
+
+
+def partitioned_user_messages(
+    db_service: DatabaseService,
+    partitions: List[MessagePartitionResponse],
+    user_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[MessageResponse]:
+    """Сообщения пользователя из messages и перечисленных архивных партиций"""
+    with db_service.read_engine.connect() as connection:
+        user = connection.execute(
+            select(User.id, User.username, User.email, User.created_at).where(User.id == user_id)
+        ).first()
+        if user is None:
+            return []
+        user_response = UserResponse.from_db(user)
+
+        hot = Message.__table__
+        rows = list(connection.execute(_user_messages_select(hot, user_id, since, until)))
+        for partition in partitions:
+            with attached(connection, partition.path):
+                rows.extend(
+                    connection.execute(
+                        _user_messages_select(archived_messages, user_id, since, until)
+                    )
+                )
+
+    rows.sort(key=lambda row: (row.created_at, row.id))
+    return [MessageResponse.from_db(row, user_response) for row in rows]
+
+
+def partitioned_conversation_stats(
+    db_service: DatabaseService,
+    partitions: List[MessagePartitionResponse],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[StatsRow]:
+    """(username, message_count, last_message) за [since, until), как get_conversation_stats"""
+    totals = {}
+    with db_service.read_engine.connect() as connection:
+        hot = Message.__table__
+        for row in connection.execute(
+            _aggregate_select(hot).where(*in_range(hot.c.created_at, since, until))
+        ):
+            _merge(totals, row)
+        for partition in partitions:
+            with attached(connection, partition.path):
+                for row in connection.execute(
+                    _aggregate_select(archived_messages).where(
+                        *in_range(archived_messages.c.created_at, since, until)
+                    )
+                ):
+                    _merge(totals, row)
+        users = connection.execute(select(User.id, User.username)).all()
+
+    stats = [(user.id, user.username, *totals.get(user.id, (0, None))) for user in users]
+    stats.sort(key=lambda row: (-row[2], row[0]))
+    return [(username, count, last) for _, username, count, last in stats]
+
+
+def _user_messages_select(source, user_id: int, since, until):
+    return (
+        select(source.c.id, source.c.user_id, source.c.message_text, source.c.created_at)
+        .where(source.c.user_id == user_id, *in_range(source.c.created_at, since, until))
+        .order_by(source.c.created_at, source.c.id)
+    )
+
+
+def _aggregate_select(source):
+    return select(
+        source.c.user_id,
+        func.count().label('n'),
+        func.max(source.c.created_at).label('last'),
+    ).group_by(source.c.user_id)
+
+
+def _merge(totals: dict, row) -> None:
+    count, last = totals.get(row.user_id, (0, None))
+    totals[row.user_id] = (count + row.n, row.last if last is None else max(last, row.last))
@@ -0,0 +1,172 @@
+"""Удаление пользователей и старых сообщений без долгих блокировок записи
+
+Сообщения удаляются пачками: каждая пачка - своя короткая транзакция
+DELETE FROM messages WHERE id IN (SELECT id ... LIMIT n), где подзапрос идет
+по индексу, а между пачками поток спит pause секунд, и очередь писателей
+(или единственное соединение писателя при split_reads) успевает пройти.
+Статистику, полнотекстовый индекс и ленту изменений обновляют триггеры
+messages. Архивные партиции не трогаются: их файлы удаляются целиком.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import Select, delete, select
+
+from pydantic_sqlalchemy.cache import UserCache
+from pydantic_sqlalchemy.database import DatabaseService
+from pydantic_sqlalchemy.hot_tier import HotMessageTier
+from pydantic_sqlalchemy.metrics import Metrics
+from pydantic_sqlalchemy.models import Message, RoomMember, User
+from pydantic_sqlalchemy.schemas import PurgeResult
+
+INCREMENTAL = 2  # PRAGMA auto_vacuum
+
+
+class PurgeService:
+    """Удаление пачками с паузами, прогрессом и метриками
+
+    on_progress вызывается после каждой пачки с копией промежуточного PurgeResult;
+    с metrics время каждой пачки попадает в гистограмму PurgeService.chunk.
+    """
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        chunk_size: int = 1000,
+        pause: float = 0.01,
+        user_cache: Optional[UserCache] = None,
+        metrics: Optional[Metrics] = None,
+        on_progress: Optional[Callable[[PurgeResult], None]] = None,
+        hot_tier: Optional[HotMessageTier] = None,
+    ):
+        if chunk_size < 1:
+            raise ValueError('chunk_size должен быть положительным')
+        self.db_service = db_service
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.user_cache = user_cache
+        self.metrics = metrics
+        self.on_progress = on_progress
+        self.hot_tier = hot_tier
+
+    def purge_user(self, user_id: int) -> PurgeResult:
+        """Удаляет пользователя: его сообщения пачками, затем участие в комнатах и строку users
+
+        В отличие от session.delete(user) сообщения не загружаются в сессию.
+        Сообщения, записанные во время удаления, уходят в одной транзакции со
+        строкой users. Архивные партиции MessageArchive не трогаются: сообщения
+        пользователя в их файлах остаются.
+        """
+        with self.db_service.engine.connect() as connection:
+            username = connection.execute(
+                select(User.username).where(User.id == user_id)
+            ).scalar()
+        if username is None:
+            raise ValueError(f'Пользователь с ID {user_id} не найден')
+
+        # До удаления: новые сообщения должны проверять пользователя по базе
+        self._invalidate(user_id, username)
+        result = self._purge(
+            select(Message.id).where(Message.user_id == user_id).order_by(Message.created_at)
+        )
+        with self.db_service.engine.begin() as connection:
+            result.deleted_messages += connection.execute(
+                delete(Message).where(Message.user_id == user_id)
+            ).rowcount
+            connection.execute(delete(RoomMember).where(RoomMember.user_id == user_id))
+            result.deleted_users = connection.execute(
+                delete(User).where(User.id == user_id)
+            ).rowcount
+        # Пока шли пачки, пользователь мог снова попасть в кэш
+        self._invalidate(user_id, username)
+        print(f'🗑  Удален пользователь {username}: {result.deleted_messages} сообщений')
+        return result
+
+    def purge_messages_before(self, cutoff: datetime) -> PurgeResult:
+        """Удаляет сообщения с created_at < cutoff, от самых старых"""
+        result = self._purge(
+            select(Message.id)
+            .where(Message.created_at < cutoff)
+            .order_by(Message.created_at, Message.id)
+        )
+        if self.hot_tier and result.deleted_messages:
+            # Удаленное могло лежать в любых кольцах
+            self.hot_tier.clear()
+        print(f'🗑  Удалено сообщений старше {cutoff:%Y-%m-%d %H:%M}: {result.deleted_messages}')
+        return result
+
+    def apply_retention(self, max_age: timedelta, now: Optional[datetime] = None) -> PurgeResult:
+        """Политика хранения: удаляет сообщения старше max_age"""
+        return self.purge_messages_before((now or datetime.utcnow()) - max_age)
+
+    def enable_incremental_vacuum(self) -> None:
+        """Включает auto_vacuum = INCREMENTAL
+
+        Режим применяется только полным VACUUM, который перестраивает файл и
+        держит блокировку все это время, поэтому это разовая операция.
+        """
+        with self.db_service.engine.connect() as connection:
+            if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() == INCREMENTAL:
+                return
+            connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+            connection.exec_driver_sql('VACUUM')
+        print('✅ Включен инкрементальный VACUUM')
+
+    def incremental_vacuum(
+        self, pages_per_step: int = 1000, max_pages: Optional[int] = None
+    ) -> int:
+        """Возвращает свободные страницы файлу шагами по pages_per_step, с паузами
+
+        Возвращает число освобожденных страниц. В режиме WAL файл уменьшается
+        после ближайшего checkpoint.
+        """
+        freed = 0
+        while max_pages is None or freed < max_pages:
+            with self.db_service.engine.connect() as connection:
+                if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != INCREMENTAL:
+                    raise ValueError(
+                        'Инкрементальный VACUUM выключен: вызовите enable_incremental_vacuum()'
+                    )
+                free = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+                step = min(pages_per_step, free, (max_pages or free) - freed)
+                if step <= 0:
+                    break
+                # execute() делает один шаг запроса, то есть освобождает одну страницу;
+                # executescript выполняет PRAGMA до конца
+                connection.connection.driver_connection.executescript(
+                    f'PRAGMA incremental_vacuum({step})'
+                )
+                freed += free - connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+            time.sleep(self.pause)
+        return freed
+
+    def _invalidate(self, user_id: int, username: str) -> None:
+        if self.user_cache:
+            self.user_cache.invalidate(user_id, username)
+        if self.hot_tier:
+            self.hot_tier.invalidate(user_id)
+
+    def _purge(self, ids: Select) -> PurgeResult:
+        chunk = delete(Message).where(Message.id.in_(ids.limit(self.chunk_size)))
+        result = PurgeResult()
+        start = time.perf_counter()
+        while True:
+            chunk_start = time.perf_counter()
+            # Соединение берется на пачку и сразу возвращается в пул
+            with self.db_service.engine.begin() as connection:
+                deleted = connection.execute(chunk).rowcount
+            seconds = time.perf_counter() - chunk_start
+
+            if self.metrics:
+                self.metrics.observe_method('PurgeService.chunk', seconds)
+            result.chunks += 1
+            result.deleted_messages += deleted
+            result.max_chunk_seconds = max(result.max_chunk_seconds, seconds)
+            result.seconds = time.perf_counter() - start
+            if self.on_progress:
+                self.on_progress(result.model_copy())
+            if deleted < self.chunk_size:
+                return result
+            time.sleep(self.pause)
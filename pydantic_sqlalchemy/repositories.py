@@ -0,0 +1,313 @@
+from abc import ABC, abstractmethod
+from contextlib import closing
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Select, bindparam, func, select, tuple_
+from sqlalchemy.orm import aliased, contains_eager
+
+from pydantic_sqlalchemy.database import DatabaseService
+from pydantic_sqlalchemy.models import Message, MessageFeedEntry, User, UserMessageStats
+from pydantic_sqlalchemy.schemas import MessageResponse, UserResponse
+
+Keyset = Tuple[datetime, int]
+
+
+class MessageRepository(ABC):
+    """Чтение сообщений; все реализации возвращают одни и те же MessageResponse"""
+
+    @abstractmethod
+    def get_all(self) -> List[MessageResponse]:
+        """Все сообщения в порядке (created_at, id)"""
+
+    @abstractmethod
+    def get_by_user(self, user_id: int) -> List[MessageResponse]:
+        """Сообщения пользователя в порядке (created_at, id)"""
+
+    @abstractmethod
+    def get_recent_by_user(self, user_id: int, limit: int) -> List[MessageResponse]:
+        """Последние limit сообщений пользователя в порядке (created_at, id)"""
+
+    @abstractmethod
+    def get_latest_per_user(self, limit: int) -> List[MessageResponse]:
+        """Последние limit сообщений каждого пользователя, новые первыми"""
+
+    @abstractmethod
+    def iter_page(
+        self, user_id: Optional[int], after: Optional[Keyset], limit: int, yield_per: int
+    ) -> Iterator[MessageResponse]:
+        """До limit сообщений после позиции after, из базы читаются порциями по yield_per"""
+
+    def iter_page_dicts(
+        self, user_id: Optional[int], after: Optional[Keyset], limit: int, yield_per: int
+    ) -> Iterator[dict]:
+        """То же, что iter_page, но словарями в форме MessageResponse.model_dump()"""
+        for item in self.iter_page(user_id, after, limit, yield_per):
+            yield item.model_dump()
+
+
+# Запросы ORM-репозитория; асинхронные сервисы используют их же
+
+
+def select_messages_with_user() -> Select:
+    # Пользователь подгружается тем же JOIN, без отдельного SELECT на каждое сообщение
+    return select(Message).join(Message.user).options(contains_eager(Message.user))
+
+
+def keyset_select(user_id: Optional[int], after: Optional[Keyset], limit: int) -> Select:
+    stmt = select_messages_with_user().order_by(Message.created_at, Message.id).limit(limit)
+    if user_id is not None:
+        stmt = stmt.where(Message.user_id == user_id)
+    if after is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) > tuple_(*after))
+    return stmt
+
+
+def timeline_select(room_id: int, before: Optional[Keyset], limit: int) -> Select:
+    # Новые первыми: обратный проход по ix_messages_room_id_created_at_id, не дальше limit строк
+    stmt = (
+        select_messages_with_user()
+        .where(Message.room_id == room_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) < tuple_(*before))
+    return stmt
+
+
+def feed_select(since_seq: int, limit: int) -> Select:
+    # Диапазон первичного ключа message_feed, сообщения - по их первичному ключу
+    return (
+        select(MessageFeedEntry.seq, Message)
+        .join(Message, Message.id == MessageFeedEntry.message_id)
+        .join(Message.user)
+        .options(contains_eager(Message.user))
+        .where(MessageFeedEntry.seq > since_seq)
+        .order_by(MessageFeedEntry.seq)
+        .limit(limit)
+    )
+
+
+def recent_by_user_select(user_id: int, limit: int) -> Select:
+    # Обратный проход по ix_messages_user_id_created_at, не дальше limit строк
+    return (
+        select_messages_with_user()
+        .where(Message.user_id == user_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(limit)
+    )
+
+
+def conversation_stats_select() -> Select:
+    # Читаем готовые счетчики: O(пользователей) вместо GROUP BY по всем сообщениям
+    message_count = func.coalesce(UserMessageStats.message_count, 0)
+    return (
+        select(
+            User.username,
+            message_count.label('message_count'),
+            UserMessageStats.last_message_at.label('last_message'),
+        )
+        .outerjoin(UserMessageStats, UserMessageStats.user_id == User.id)
+        .order_by(message_count.desc(), User.id)
+    )
+
+
+def latest_per_user_select(limit: int) -> Select:
+    latest = aliased(Message)
+    latest_ids = (
+        select(latest.id)
+        .where(latest.user_id == User.id)
+        .order_by(latest.created_at.desc(), latest.id.desc())
+        .limit(limit)
+        .correlate(User)
+    )
+    # users идет внешним циклом, сообщения достаются по первичному ключу
+    return (
+        select(Message)
+        .select_from(User)
+        .join(Message, Message.id.in_(latest_ids))
+        .options(contains_eager(Message.user))
+        .order_by(User.id, Message.created_at.desc(), Message.id.desc())
+    )
+
+
+class OrmMessageRepository(MessageRepository):
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+
+    def get_all(self) -> List[MessageResponse]:
+        return self._fetch(select_messages_with_user().order_by(Message.created_at, Message.id))
+
+    def get_by_user(self, user_id: int) -> List[MessageResponse]:
+        return self._fetch(
+            select_messages_with_user()
+            .where(Message.user_id == user_id)
+            .order_by(Message.created_at, Message.id)
+        )
+
+    def get_recent_by_user(self, user_id: int, limit: int) -> List[MessageResponse]:
+        return self._fetch(recent_by_user_select(user_id, limit))[::-1]
+
+    def get_latest_per_user(self, limit: int) -> List[MessageResponse]:
+        return self._fetch(latest_per_user_select(limit))
+
+    def iter_page(
+        self, user_id: Optional[int], after: Optional[Keyset], limit: int, yield_per: int
+    ) -> Iterator[MessageResponse]:
+        with self.db_service.get_session() as session:
+            result = session.execute(
+                keyset_select(user_id, after, limit).execution_options(yield_per=yield_per)
+            ).scalars()
+            yield from self._responses(result)
+
+    def _fetch(self, stmt: Select) -> List[MessageResponse]:
+        with self.db_service.get_session() as session:
+            return list(self._responses(session.execute(stmt).scalars()))
+
+    @staticmethod
+    def _responses(messages: Iterable[Message]) -> Iterator[MessageResponse]:
+        users = {}  # Один UserResponse на пользователя в пределах запроса
+        for msg in messages:
+            user = users.get(msg.user_id)
+            if user is None:
+                user = users[msg.user_id] = UserResponse.from_db(msg.user)
+            yield MessageResponse.from_db(msg, user)
+
+
+class SQLiteMessageRepository(MessageRepository):
+    """Быстрый путь чтения: голый курсор sqlite3 без ORM
+
+    SQL собирается один раз из тех же таблиц, что описаны в models.py, и
+    выполняется на соединении из пула движка (с теми же PRAGMA).
+    """
+
+    messages = Message.__table__
+    users = User.__table__
+
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+        dialect = db_service.engine.dialect
+        created_at_type = self.messages.c.created_at.type.dialect_impl(dialect)
+        self._bind_datetime = created_at_type.bind_processor(dialect)
+        self._read_datetime = created_at_type.result_processor(dialect, None)
+
+        m, u = self.messages.c, self.users.c
+        columns = select(
+            m.id, m.user_id, m.message_text, m.created_at, u.username, u.email, u.created_at
+        )
+        joined = columns.select_from(self.messages.join(self.users, u.id == m.user_id))
+        ordered = joined.order_by(m.created_at, m.id)
+        after = tuple_(m.created_at, m.id) > tuple_(bindparam('after_at'), bindparam('after_id'))
+        by_user = m.user_id == bindparam('user_id')
+        limit = bindparam('limit')
+
+        latest = self.messages.alias('latest')
+        latest_ids = (
+            select(latest.c.id)
+            .where(latest.c.user_id == u.id)
+            .order_by(latest.c.created_at.desc(), latest.c.id.desc())
+            .limit(limit)
+            .correlate(self.users)
+        )
+
+        self._sql = {
+            name: self._compile(stmt, dialect)
+            for name, stmt in {
+                'all': ordered,
+                'user': ordered.where(by_user),
+                'user_recent': joined.where(by_user)
+                .order_by(m.created_at.desc(), m.id.desc())
+                .limit(limit),
+                'page': ordered.limit(limit),
+                'page_after': ordered.where(after).limit(limit),
+                'user_page': ordered.where(by_user).limit(limit),
+                'user_page_after': ordered.where(by_user, after).limit(limit),
+                'latest': columns.select_from(
+                    self.users.join(self.messages, m.id.in_(latest_ids))
+                ).order_by(u.id, m.created_at.desc(), m.id.desc()),
+            }.items()
+        }
+
+    def get_all(self) -> List[MessageResponse]:
+        return list(self._responses(self._execute('all')))
+
+    def get_by_user(self, user_id: int) -> List[MessageResponse]:
+        return list(self._responses(self._execute('user', user_id=user_id)))
+
+    def get_recent_by_user(self, user_id: int, limit: int) -> List[MessageResponse]:
+        rows = self._execute('user_recent', user_id=user_id, limit=limit)
+        return list(self._responses(rows))[::-1]
+
+    def get_latest_per_user(self, limit: int) -> List[MessageResponse]:
+        return list(self._responses(self._execute('latest', limit=limit)))
+
+    def iter_page(
+        self, user_id: Optional[int], after: Optional[Keyset], limit: int, yield_per: int
+    ) -> Iterator[MessageResponse]:
+        return self._responses(self._execute_page(user_id, after, limit, yield_per))
+
+    def iter_page_dicts(
+        self, user_id: Optional[int], after: Optional[Keyset], limit: int, yield_per: int
+    ) -> Iterator[dict]:
+        # Словари собираются прямо из кортежей курсора, минуя модели
+        read_datetime = self._read_datetime
+        users = {}
+        rows = self._execute_page(user_id, after, limit, yield_per)
+        for message_id, author_id, text, created_at, username, email, joined in rows:
+            user = users.get(author_id)
+            if user is None:
+                user = users[author_id] = {
+                    'username': username,
+                    'email': email,
+                    'id': author_id,
+                    'created_at': read_datetime(joined),
+                }
+            yield {
+                'message_text': text,
+                'id': message_id,
+                'user_id': author_id,
+                'created_at': read_datetime(created_at),
+                'user': user,
+            }
+
+    def _execute_page(
+        self, user_id: Optional[int], after: Optional[Keyset], limit: int, yield_per: int
+    ) -> Iterator[tuple]:
+        name = 'page' if user_id is None else 'user_page'
+        params = {'limit': limit, 'user_id': user_id}
+        if after is not None:
+            name += '_after'
+            params.update(after_at=self._bind_datetime(after[0]), after_id=after[1])
+        return self._execute(name, yield_per, **params)
+
+    @staticmethod
+    def _compile(stmt: Select, dialect) -> Tuple[str, dict, tuple]:
+        compiled = stmt.compile(dialect=dialect)
+        return str(compiled), dict(compiled.params), tuple(compiled.positiontup)
+
+    def _execute(self, name: str, yield_per: int = 1000, **params) -> Iterator[tuple]:
+        sql, defaults, positions = self._sql[name]
+        values = {**defaults, **params}
+        with closing(self.db_service.read_engine.raw_connection()) as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, [values[key] for key in positions])
+            while rows := cursor.fetchmany(yield_per):
+                yield from rows
+
+    def _responses(self, rows: Iterable[tuple]) -> Iterator[MessageResponse]:
+        read_datetime = self._read_datetime
+        users = {}  # Один UserResponse на пользователя в пределах запроса
+        for message_id, user_id, text, created_at, username, email, joined in rows:
+            user = users.get(user_id)
+            if user is None:
+                user = users[user_id] = UserResponse.model_construct(
+                    username=username, email=email, id=user_id, created_at=read_datetime(joined)
+                )
+            yield MessageResponse.model_construct(
+                message_text=text,
+                id=message_id,
+                user_id=user_id,
+                created_at=read_datetime(created_at),
+                user=user,
+            )
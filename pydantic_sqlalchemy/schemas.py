@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, EmailStr
 
@@ -18,14 +19,43 @@ class UserResponse(UserBase):
 
     model_config = ConfigDict(from_attributes=True)  # Для работы с ORM объектами
 
+    @classmethod
+    def from_db(cls, user) -> 'UserResponse':
+        """Собирает ответ без валидации: только для строк из нашей же базы"""
+        return cls.model_construct(
+            username=user.username, email=user.email, id=user.id, created_at=user.created_at
+        )
+
+
+class UserImportResult(BaseModel):
+    index: int  # Позиция записи во входных данных
+    user: Optional[UserResponse] = None
+    error: Optional[str] = None
+
+    @property
+    def created(self) -> bool:
+        return self.user is not None
+
 
 class MessageBase(BaseModel):
     message_text: str
 
 
 class MessageCreate(MessageBase):
+    """Сообщение в общую ленту, вне комнат"""
+
     user_id: int
 
+    # Лишнее поле, например room_id, - ошибка: в комнату пишут только через RoomMessageCreate
+    model_config = ConfigDict(extra='forbid')
+
+
+class RoomMessageCreate(MessageBase):
+    """Сообщение в комнату; его принимает только RoomService.post_message"""
+
+    user_id: int
+    room_id: int
+
 
 class MessageResponse(MessageBase):
     id: int
@@ -34,3 +64,64 @@ class MessageResponse(MessageBase):
     user: UserResponse  # Включаем информацию о пользователе
 
     model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def from_db(cls, message, user: Optional[UserResponse] = None) -> 'MessageResponse':
+        """Собирает ответ без валидации: только для строк из нашей же базы"""
+        return cls.model_construct(
+            message_text=message.message_text,
+            id=message.id,
+            user_id=message.user_id,
+            created_at=message.created_at,
+            user=user or UserResponse.from_db(message.user),
+        )
+
+
+class RoomCreate(BaseModel):
+    name: str
+
+
+class RoomResponse(RoomCreate):
+    id: int
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None  # None, если это последняя страница
+
+
+class MessageFeedPage(BaseModel):
+    items: List[MessageResponse]  # В порядке коммита
+    next_seq: int  # Передать как since_seq в следующий tail/subscribe
+
+
+class MessageSearchResult(BaseModel):
+    message: MessageResponse
+    rank: float  # bm25: чем меньше, тем релевантнее
+    snippet: str  # Фрагмент текста с подсвеченными совпадениями
+
+
+class MessageExportResult(BaseModel):
+    rows: int
+    watermark: Optional[str] = None  # Передать как since в следующую выгрузку
+
+
+class PurgeResult(BaseModel):
+    deleted_messages: int = 0
+    deleted_users: int = 0
+    chunks: int = 0  # Транзакций удаления, каждая держала блокировку записи
+    seconds: float = 0.0  # Всего, вместе с паузами между пачками
+    max_chunk_seconds: float = 0.0  # Самая долгая блокировка записи
+
+
+class MessagePartitionResponse(BaseModel):
+    name: str
+    path: str
+    period_start: datetime
+    period_end: datetime
+    row_count: int
+
+    model_config = ConfigDict(from_attributes=True)
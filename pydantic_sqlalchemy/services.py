@@ -1,20 +1,207 @@
-from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import json
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple, TypeVar
 
-from sqlalchemy import select
+from pydantic_core import to_json
+from sqlalchemy import (
+    Insert,
+    Row,
+    Select,
+    column,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    table,
+    tuple_,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, contains_eager
 
+from pydantic_sqlalchemy.cache import UserCache
 from pydantic_sqlalchemy.database import DatabaseService
-from pydantic_sqlalchemy.models import Message, User
+from pydantic_sqlalchemy.hot_tier import HotMessageTier
+from pydantic_sqlalchemy.models import (
+    Message,
+    Room,
+    RoomMember,
+    User,
+    rebuild_messages_fts,
+    rebuild_user_message_stats,
+)
+from pydantic_sqlalchemy.partitions import (
+    MessageArchive,
+    add_archived_stats,
+    partitioned_conversation_stats,
+    partitioned_user_messages,
+)
+from pydantic_sqlalchemy.purge import PurgeService
+from pydantic_sqlalchemy.repositories import (
+    MessageRepository,
+    OrmMessageRepository,
+    conversation_stats_select,
+    feed_select,
+    timeline_select,
+)
 from pydantic_sqlalchemy.schemas import (
     MessageCreate,
+    MessageFeedPage,
+    MessagePage,
+    MessagePartitionResponse,
     MessageResponse,
+    MessageSearchResult,
+    PurgeResult,
+    RoomCreate,
+    RoomMessageCreate,
+    RoomResponse,
     UserCreate,
+    UserImportResult,
     UserResponse,
 )
 
+DUPLICATE_USER_ERROR = "Пользователь с таким username или email уже существует"
+
+
+messages_fts = table('messages_fts', column('rowid'))
+
+
+def fts_query(query: str) -> str:
+    """Превращает пользовательский ввод в запрос FTS5: все слова, без операторов"""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    """Упаковывает позицию (created_at, id) в непрозрачный токен"""
+    raw = json.dumps([created_at.isoformat(), message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Распаковывает токен, выданный encode_cursor"""
+    try:
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor!r}") from e
+
+
+def build_page(items: List[MessageResponse], limit: int) -> MessagePage:
+    """Страница из limit + 1 прочитанных сообщений: лишнее означает, что есть следующая"""
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return MessagePage(items=items, next_cursor=next_cursor)
+
+
+T = TypeVar("T")
+
+
+def batches(items: Iterable[T], size: int) -> Iterator[Tuple[T, ...]]:
+    """Пачки по size элементов; последняя может быть короче
+
+    То же, что itertools.batched(items, size, strict=False), но параметра strict
+    нет в Python 3.12, на котором проект тоже работает.
+    """
+    iterator = iter(items)
+    while batch := tuple(islice(iterator, size)):
+        yield batch
+
+
+# Шаги пакетной вставки, общие для синхронных и асинхронных сервисов и WriteBehindQueue
+
+
+def taken_users_select(batch: Tuple[Tuple[int, UserCreate], ...]) -> Select:
+    usernames = {user_data.username for _, user_data in batch}
+    emails = {user_data.email for _, user_data in batch}
+    return select(User.username, User.email).where(
+        or_(User.username.in_(usernames), User.email.in_(emails))
+    )
+
+
+def filter_new_users(
+    batch: Tuple[Tuple[int, UserCreate], ...], taken: List[Row]
+) -> dict[int, UserCreate]:
+    """Отсекает занятые в базе и повторяющиеся внутри самой пачки записи"""
+    taken_usernames = {row.username for row in taken}
+    taken_emails = {row.email for row in taken}
+    new_users = {}
+    for index, user_data in batch:
+        if user_data.username in taken_usernames or user_data.email in taken_emails:
+            continue
+        taken_usernames.add(user_data.username)
+        taken_emails.add(user_data.email)
+        new_users[index] = user_data
+    return new_users
+
+
+def users_insert(on_conflict_do_nothing: bool) -> Insert:
+    stmt = sqlite_insert(User).on_conflict_do_nothing() if on_conflict_do_nothing else insert(User)
+    return stmt.returning(User.id, User.username, User.email, User.created_at)
+
+
+def import_results(
+    batch: Tuple[Tuple[int, UserCreate], ...], new_users: dict[int, UserCreate], rows: List[Row]
+) -> List[UserImportResult]:
+    inserted = {row.username: row for row in rows}
+    results = []
+    for index, user_data in batch:
+        row = inserted.get(user_data.username) if index in new_users else None
+        if row is not None:
+            results.append(UserImportResult(index=index, user=UserResponse.from_db(row)))
+        else:
+            results.append(UserImportResult(index=index, error=DUPLICATE_USER_ERROR))
+    return results
+
+
+def check_batch_users(batch: Tuple[MessageCreate, ...], users: dict[int, object]) -> None:
+    missing = sorted({msg.user_id for msg in batch} - users.keys())
+    if missing:
+        raise ValueError(f"Пользователи с ID {missing} не найдены")
+
+
+def messages_insert() -> Insert:
+    return insert(Message).returning(Message.id, Message.created_at, sort_by_parameter_order=True)
+
+
+def message_responses(
+    batch: Tuple[MessageCreate, ...], rows: List[Row], user_responses: dict[int, UserResponse]
+) -> List[MessageResponse]:
+    # Вход уже проверен MessageCreate, id и created_at пришли из базы
+    return [
+        MessageResponse.model_construct(
+            id=row.id,
+            user_id=msg.user_id,
+            message_text=msg.message_text,
+            created_at=row.created_at,
+            user=user_responses[msg.user_id],
+        )
+        for msg, row in zip(batch, rows, strict=True)
+    ]
+
+
+def _wait_time(deadline: Optional[float], poll_interval: float) -> float:
+    if deadline is None:
+        return poll_interval
+    return min(poll_interval, deadline - time.monotonic())
+
 
 class UserService:
-    def __init__(self, db_service: DatabaseService):
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        cache: Optional[UserCache] = None,
+        hot_tier: Optional[HotMessageTier] = None,
+    ):
         self.db_service = db_service
+        self.cache = cache
+        self.hot_tier = hot_tier  # Только для delete_user: кольца удаленных пользователей
 
     def create_user(self, user_data: UserCreate) -> UserResponse:
         """Создает нового пользователя"""
@@ -28,9 +215,7 @@ class UserService:
             ).scalar_one_or_none()
 
             if existing_user:
-                raise ValueError(
-                    "Пользователь с таким username или email уже существует"
-                )
+                raise ValueError(DUPLICATE_USER_ERROR)
 
             # Создаем пользователя
             user = User(**user_data.model_dump())
@@ -39,83 +224,597 @@ class UserService:
             session.refresh(user)
 
             print(f"✅ Создан пользователь: {user.username}")
-            return UserResponse.model_validate(user)
+            user_response = UserResponse.from_db(user)
+            if self.cache:
+                self.cache.put(user_response)
+            return user_response
+
+    def create_users(
+        self,
+        users_data: Iterable[UserCreate],
+        batch_size: int = 1000,
+        on_conflict_do_nothing: bool = False,
+    ) -> Iterator[UserImportResult]:
+        """Импортирует пользователей пачками и отдает результат по каждой записи
+
+        Уникальность проверяется одним запросом на пачку. С on_conflict_do_nothing
+        вставка идет через INSERT ... ON CONFLICT DO NOTHING, и строки, которые успел
+        занять параллельный писатель, тоже попадают в дубликаты, а не роняют пачку.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size должен быть положительным")
+
+        created = duplicates = 0
+        with self.db_service.get_session() as session:
+            for batch in batches(enumerate(users_data), batch_size):
+                # Уникальность всей пачки проверяем одним запросом
+                taken = session.execute(taken_users_select(batch)).all()
+                new_users = filter_new_users(batch, taken)
+
+                rows = []
+                if new_users:
+                    rows = session.execute(
+                        users_insert(on_conflict_do_nothing),
+                        [user_data.model_dump() for user_data in new_users.values()],
+                    ).all()
+                    session.commit()
+
+                for result in import_results(batch, new_users, rows):
+                    if result.created:
+                        created += 1
+                        if self.cache:
+                            self.cache.put(result.user)
+                    else:
+                        duplicates += 1
+                    yield result
+
+        print(f"✅ Импортировано пользователей: {created}, дубликатов: {duplicates}")
 
     def get_all_users(self) -> List[UserResponse]:
         """Возвращает всех пользователей"""
         with self.db_service.get_session() as session:
             users = session.execute(select(User)).scalars().all()
-            return [UserResponse.model_validate(user) for user in users]
+            return [UserResponse.from_db(user) for user in users]
 
     def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
         """Находит пользователя по ID"""
+        if self.cache and (cached := self.cache.get_by_id(user_id)):
+            return cached
+
         with self.db_service.get_session() as session:
             user = session.get(User, user_id)
-            return UserResponse.model_validate(user) if user else None
+            return self._remember(user)
+
+    def get_user_by_username(self, username: str) -> Optional[UserResponse]:
+        """Находит пользователя по username"""
+        if self.cache and (cached := self.cache.get_by_username(username)):
+            return cached
+
+        with self.db_service.get_session() as session:
+            user = session.execute(
+                select(User).where(User.username == username)
+            ).scalar_one_or_none()
+            return self._remember(user)
+
+    def delete_user(self, user_id: int, chunk_size: int = 1000) -> PurgeResult:
+        """Удаляет пользователя и его сообщения пачками, не загружая их в сессию
+
+        Сообщения в архивных партициях MessageArchive не удаляются.
+        """
+        purge = PurgeService(
+            self.db_service, chunk_size, user_cache=self.cache, hot_tier=self.hot_tier
+        )
+        return purge.purge_user(user_id)
+
+    def _remember(self, user: Optional[User]) -> Optional[UserResponse]:
+        if user is None:
+            return None
+        user_response = UserResponse.from_db(user)
+        if self.cache:
+            self.cache.put(user_response)
+        return user_response
 
 
 class MessageService:
-    def __init__(self, db_service: DatabaseService):
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        user_cache: Optional[UserCache] = None,
+        repository: Optional[MessageRepository] = None,
+        archive: Optional[MessageArchive] = None,
+        hot_tier: Optional[HotMessageTier] = None,
+    ):
         self.db_service = db_service
+        self.user_cache = user_cache
+        # Последние сообщения пользователей в памяти; с архивом не используется
+        self.hot_tier = hot_tier
+        # С архивом get_user_messages и статистика подключают еще и файлы вынесенных
+        # месяцев; остальные чтения видят только messages, см. MessageArchive
+        self.archive = archive
+        # Чтение идет через репозиторий: ORM по умолчанию или SQLiteMessageRepository
+        self.repository = repository or OrmMessageRepository(db_service)
 
     def create_message(self, message_data: MessageCreate) -> MessageResponse:
         """Создает новое сообщение"""
         with self.db_service.get_session() as session:
-            # Проверяем что пользователь существует
-            user = session.get(User, message_data.user_id)
-            if not user:
-                raise ValueError(f"Пользователь с ID {message_data.user_id} не найден")
+            # Проверяем что пользователь существует: сначала в кэше, затем в базе
+            user_response = self.user_cache and self.user_cache.get_by_id(message_data.user_id)
+            if not user_response:
+                user = session.get(User, message_data.user_id)
+                if not user:
+                    raise ValueError(f"Пользователь с ID {message_data.user_id} не найден")
+
+                # Снимаем данные пользователя до коммита, чтобы не перечитывать его
+                user_response = UserResponse.from_db(user)
+                if self.user_cache:
+                    self.user_cache.put(user_response)
 
-            # Создаем сообщение
+            # Создаем сообщение; id и created_at известны после flush, refresh не нужен
             message = Message(**message_data.model_dump())
             session.add(message)
+            session.flush()
+            message_response = MessageResponse.from_db(message, user_response)
             session.commit()
-            session.refresh(message)
+            self.db_service.changes.notify()
+            if self.hot_tier:
+                self.hot_tier.add(message_response)
 
-            print(f"✅ Создано сообщение от {user.username}")
-            return MessageResponse.model_validate(message)
+            print(f"✅ Создано сообщение от {user_response.username}")
+            return message_response
 
-    def get_all_messages(self) -> List[MessageResponse]:
-        """Возвращает все сообщения с информацией о пользователях"""
+    def create_messages(
+        self,
+        messages_data: Iterable[MessageCreate],
+        batch_size: int = 1000,
+        return_ids: bool = False,
+    ) -> List[MessageResponse] | List[int]:
+        """Создает сообщения пачками: одна проверка пользователей и один коммит на пачку
+
+        Пачки, записанные до ошибки, остаются в базе.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size должен быть положительным")
+
+        results = []
+        total = 0
         with self.db_service.get_session() as session:
-            messages = (
-                session.execute(select(Message).join(User).order_by(Message.created_at))
-                .scalars()
-                .all()
+            for batch in batches(messages_data, batch_size):
+                # Проверяем всех пользователей пачки одним IN-запросом
+                user_responses = self.load_users(session, {msg.user_id for msg in batch})
+                check_batch_users(batch, user_responses)
+
+                # Вставляем всю пачку через executemany с RETURNING
+                rows = session.execute(
+                    messages_insert(), [msg.model_dump() for msg in batch]
+                ).all()
+                session.commit()
+                self.db_service.changes.notify()
+                total += len(rows)
+
+                if return_ids:
+                    results.extend(row.id for row in rows)
+                    if not self.hot_tier:
+                        continue
+
+                # Ответы нужны вызывающему или горячему слою
+                responses = message_responses(batch, rows, user_responses)
+                if self.hot_tier:
+                    for response in responses:
+                        self.hot_tier.add(response)
+                if not return_ids:
+                    results.extend(responses)
+
+        print(f"✅ Создано сообщений: {total}")
+        return results
+
+    def load_users(self, session: Session, user_ids: set[int]) -> dict[int, UserResponse]:
+        """Берет пользователей из кэша, недостающих - одним IN-запросом из базы"""
+        found = {}
+        if self.user_cache:
+            for user_id in user_ids:
+                if cached := self.user_cache.get_by_id(user_id):
+                    found[user_id] = cached
+
+        missing = user_ids - found.keys()
+        if missing:
+            for user in session.execute(select(User).where(User.id.in_(missing))).scalars():
+                found[user.id] = UserResponse.from_db(user)
+                if self.user_cache:
+                    self.user_cache.put(found[user.id])
+        return found
+
+    def get_all_messages(self) -> List[MessageResponse]:
+        """Возвращает все сообщения с информацией о пользователях, кроме архивных"""
+        return self.repository.get_all()
+
+    def get_user_messages(
+        self,
+        user_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[MessageResponse]:
+        """Возвращает сообщения пользователя, при необходимости за [since, until)
+
+        С limit - только последние limit из них, в том же порядке по времени.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limit должен быть положительным")
+
+        if self.archive is None and since is None and until is None:
+            if self.hot_tier:
+                return self._hot_user_messages(user_id, limit)
+            if limit is None:
+                return self.repository.get_by_user(user_id)
+            return self.repository.get_recent_by_user(user_id, limit)
+        messages = partitioned_user_messages(
+            self.db_service, self._partitions(since, until), user_id, since, until
+        )
+        return messages if limit is None else messages[-limit:]
+
+    def _hot_user_messages(self, user_id: int, limit: Optional[int]) -> List[MessageResponse]:
+        cached = self.hot_tier.recent(user_id, limit)
+        if cached is not None:
+            return cached
+
+        if self.hot_tier.has(user_id):
+            # Кольцо есть, но запрос длиннее него: перезаполнять нечего
+            if limit is None:
+                return self.repository.get_by_user(user_id)
+            return self.repository.get_recent_by_user(user_id, limit)
+
+        # Кольца нет: одно чтение отвечает на запрос и заполняет кольцо
+        token = self.hot_tier.begin_load(user_id)
+        if limit is None:
+            messages = self.repository.get_by_user(user_id)
+        else:
+            messages = self.repository.get_recent_by_user(
+                user_id, max(limit, self.hot_tier.per_user)
             )
+        self.hot_tier.load(user_id, messages, token)
+        return messages if limit is None else messages[-limit:]
+
+    def _partitions(
+        self, since: Optional[datetime], until: Optional[datetime]
+    ) -> List[MessagePartitionResponse]:
+        return self.archive.partitions(since, until) if self.archive else []
+
+    def get_latest_messages_per_user(self, limit: int = 1) -> List[MessageResponse]:
+        """Последние limit сообщений каждого пользователя, новые первыми
+
+        Для каждого пользователя берется срез индекса (user_id, created_at),
+        поэтому таблица messages целиком не просматривается. Архивные месяцы
+        не учитываются: пользователь, писавший только в них, не попадет в ответ.
+        """
+        if limit < 1:
+            raise ValueError("limit должен быть положительным")
 
-            return [MessageResponse.model_validate(msg) for msg in messages]
+        return self.repository.get_latest_per_user(limit)
+
+    def search(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        limit: int = 20,
+        highlight: Tuple[str, str] = ("[", "]"),
+    ) -> List[MessageSearchResult]:
+        """Полнотекстовый поиск по сообщениям (FTS5), самые релевантные первыми"""
+        match = fts_query(query)
+        if not match:
+            return []
 
-    def get_user_messages(self, user_id: int) -> List[MessageResponse]:
-        """Возвращает сообщения конкретного пользователя"""
         with self.db_service.get_session() as session:
-            messages = (
-                session.execute(
-                    select(Message)
-                    .join(User)
-                    .where(Message.user_id == user_id)
-                    .order_by(Message.created_at)
+            rows = session.execute(
+                self._search_select(match, user_id, limit, highlight)
+            ).all()
+            return [
+                MessageSearchResult(
+                    message=MessageResponse.from_db(row.Message),
+                    rank=row.rank,
+                    snippet=row.snippet,
                 )
-                .scalars()
-                .all()
+                for row in rows
+            ]
+
+    def rebuild_search_index(self) -> None:
+        """Перестраивает полнотекстовый индекс с нуля"""
+        with self.db_service.engine.begin() as connection:
+            rebuild_messages_fts(connection)
+        print("✅ Поисковый индекс перестроен")
+
+    @staticmethod
+    def _search_select(
+        match: str, user_id: Optional[int], limit: int, highlight: Tuple[str, str]
+    ) -> Select:
+        fts = literal_column("messages_fts")
+        rank = func.bm25(fts)
+        stmt = (
+            select(
+                Message,
+                rank.label("rank"),
+                func.snippet(fts, 0, highlight[0], highlight[1], "…", 10).label("snippet"),
+            )
+            .select_from(messages_fts)
+            .join(Message, Message.id == messages_fts.c.rowid)
+            .join(Message.user)
+            .options(contains_eager(Message.user))
+            .where(fts.op("MATCH")(match))
+            .order_by(rank)
+            .limit(limit)
+        )
+        if user_id is not None:
+            stmt = stmt.where(Message.user_id == user_id)
+        return stmt
+
+    def iter_all_messages(
+        self, page_size: int = 1000, yield_per: int = 100, cursor: Optional[str] = None
+    ) -> Iterator[MessageResponse]:
+        """Потоково отдает все сообщения, читая базу страницами по курсору"""
+        return self._iter_messages(None, page_size, yield_per, cursor)
+
+    def iter_user_messages(
+        self,
+        user_id: int,
+        page_size: int = 1000,
+        yield_per: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Iterator[MessageResponse]:
+        """Потоково отдает сообщения пользователя, читая базу страницами по курсору"""
+        return self._iter_messages(user_id, page_size, yield_per, cursor)
+
+    def get_messages_page(
+        self, limit: int = 50, cursor: Optional[str] = None, user_id: Optional[int] = None
+    ) -> MessagePage:
+        """Возвращает одну страницу сообщений и курсор на следующую"""
+        if limit < 1:
+            raise ValueError("limit должен быть положительным")
+
+        after = decode_cursor(cursor) if cursor else None
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        items = list(self.repository.iter_page(user_id, after, limit + 1, limit + 1))
+        return build_page(items, limit)
+
+    def get_messages_page_json(
+        self, limit: int = 50, cursor: Optional[str] = None, user_id: Optional[int] = None
+    ) -> bytes:
+        """Страница сразу в JSON: те же байты, что get_messages_page().model_dump_json()"""
+        if limit < 1:
+            raise ValueError("limit должен быть положительным")
+
+        after = decode_cursor(cursor) if cursor else None
+        items = list(self.repository.iter_page_dicts(user_id, after, limit + 1, limit + 1))
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
+        return to_json({"items": items, "next_cursor": next_cursor})
+
+    def _iter_messages(
+        self, user_id: Optional[int], page_size: int, yield_per: int, cursor: Optional[str]
+    ) -> Iterator[MessageResponse]:
+        if page_size < 1 or yield_per < 1:
+            raise ValueError("page_size и yield_per должны быть положительными")
+
+        after = decode_cursor(cursor) if cursor else None
+        while True:
+            # Каждая страница читается отдельным запросом, поэтому память не растет
+            fetched = 0
+            for item in self.repository.iter_page(user_id, after, page_size, yield_per):
+                fetched += 1
+                after = (item.created_at, item.id)
+                yield item
+
+            if fetched < page_size:
+                return
+
+    def tail(self, since_seq: int = 0, limit: int = 100) -> MessageFeedPage:
+        """До limit сообщений, закоммиченных после позиции since_seq, в порядке коммита
+
+        Читается диапазон первичного ключа ленты, а не вся таблица. Начните с 0
+        и передавайте next_seq ответа в следующий вызов.
+        """
+        if limit < 1:
+            raise ValueError("limit должен быть положительным")
+
+        with self.db_service.get_session() as session:
+            rows = session.execute(feed_select(since_seq, limit)).all()
+            items = [MessageResponse.from_db(row.Message) for row in rows]
+        return MessageFeedPage(items=items, next_seq=rows[-1].seq if rows else since_seq)
+
+    def subscribe(
+        self,
+        since_seq: int = 0,
+        limit: int = 100,
+        timeout: Optional[float] = None,
+        poll_interval: float = 1.0,
+    ) -> MessageFeedPage:
+        """Как tail, но если новых сообщений нет - ждет их не дольше timeout секунд
+
+        Коммит сообщения в этом процессе будит ожидание сразу; записи других
+        процессов замечаются повторным чтением раз в poll_interval секунд.
+        По истечении timeout возвращает пустую страницу.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Версию берем до чтения: коммит между чтением и ожиданием не потеряется
+            version = self.db_service.changes.version
+            page = self.tail(since_seq, limit)
+            wait = _wait_time(deadline, poll_interval)
+            if page.items or wait <= 0:
+                return page
+            self.db_service.changes.wait(version, wait)
+
+    async def subscribe_async(
+        self,
+        since_seq: int = 0,
+        limit: int = 100,
+        timeout: Optional[float] = None,
+        poll_interval: float = 1.0,
+    ) -> MessageFeedPage:
+        """subscribe для asyncio: чтение в пуле потоков, ожидание не блокирует цикл событий"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            version = self.db_service.changes.version
+            page = await asyncio.to_thread(self.tail, since_seq, limit)
+            wait = _wait_time(deadline, poll_interval)
+            if page.items or wait <= 0:
+                return page
+            await self.db_service.changes.wait_async(version, wait)
+
+    def get_conversation_stats(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ):
+        """Статистика по сообщениям пользователей, целиком или за [since, until)"""
+        if since is None and until is None:
+            # Материализованные счетчики уже учитывают архивные партиции
+            with self.db_service.get_session() as session:
+                return session.execute(conversation_stats_select()).all()
+        return partitioned_conversation_stats(
+            self.db_service, self._partitions(since, until), since, until
+        )
+
+    def rebuild_conversation_stats(self) -> None:
+        """Пересчитывает материализованную статистику с нуля"""
+        archived = self.archive.archived_stats() if self.archive else []
+        with self.db_service.engine.begin() as connection:
+            rebuild_user_message_stats(connection)
+            add_archived_stats(connection, archived)
+        print("✅ Статистика сообщений пересчитана")
+
+
+class RoomService:
+    """Комнаты и их ленты; все чтения ленты - диапазон индекса (room_id, created_at, id)"""
+
+    def __init__(self, db_service: DatabaseService, hot_tier: Optional[HotMessageTier] = None):
+        self.db_service = db_service
+        # Тот же слой, что у MessageService: сообщения комнат - тоже сообщения пользователя
+        self.hot_tier = hot_tier
+
+    def create_room(self, room_data: RoomCreate) -> RoomResponse:
+        """Создает комнату"""
+        with self.db_service.get_session() as session:
+            existing = session.execute(
+                select(Room.id).where(Room.name == room_data.name)
+            ).first()
+            if existing:
+                raise ValueError("Комната с таким названием уже существует")
+
+            room = Room(**room_data.model_dump())
+            session.add(room)
+            session.flush()
+            room_response = RoomResponse.model_validate(room)
+            session.commit()
+
+            print(f"✅ Создана комната: {room.name}")
+            return room_response
+
+    def join_room(self, room_id: int, user_id: int) -> None:
+        """Добавляет пользователя в комнату; повторное добавление ничего не меняет"""
+        with self.db_service.get_session() as session:
+            if session.get(Room, room_id) is None:
+                raise ValueError(f"Комната с ID {room_id} не найдена")
+            if session.get(User, user_id) is None:
+                raise ValueError(f"Пользователь с ID {user_id} не найден")
+            session.execute(
+                sqlite_insert(RoomMember)
+                .values(room_id=room_id, user_id=user_id)
+                .on_conflict_do_nothing()
             )
+            session.commit()
+
+    def post_message(self, message_data: RoomMessageCreate) -> MessageResponse:
+        """Пишет сообщение в комнату message_data.room_id от ее участника
 
-            return [MessageResponse.model_validate(msg) for msg in messages]
+        Отметка прочтения автора сдвигается на его сообщение: свои сообщения
+        не считаются непрочитанными.
+        """
+        with self.db_service.get_session() as session:
+            row = session.execute(
+                select(User, RoomMember)
+                .join(RoomMember, RoomMember.user_id == User.id)
+                .where(
+                    RoomMember.room_id == message_data.room_id,
+                    RoomMember.user_id == message_data.user_id,
+                )
+            ).first()
+            if row is None:
+                raise ValueError(
+                    f"Пользователь с ID {message_data.user_id} не участник "
+                    f"комнаты {message_data.room_id}"
+                )
+            user_response = UserResponse.from_db(row.User)
+
+            message = Message(**message_data.model_dump())
+            session.add(message)
+            session.flush()
+            row.RoomMember.last_read_at = message.created_at
+            row.RoomMember.last_read_message_id = message.id
+            message_response = MessageResponse.from_db(message, user_response)
+            session.commit()
+            self.db_service.changes.notify()
+            if self.hot_tier:
+                self.hot_tier.add(message_response)
+            return message_response
 
-    def get_conversation_stats(self):
-        """Статистика по сообщениям пользователей"""
+    def get_timeline(
+        self, room_id: int, limit: int = 50, before: Optional[str] = None
+    ) -> MessagePage:
+        """Последние limit сообщений комнаты (новые первыми) или limit сообщений до курсора
+
+        next_cursor указывает на самое старое сообщение страницы: передайте его
+        как before, чтобы получить более ранние.
+        """
+        if limit < 1:
+            raise ValueError("limit должен быть положительным")
+        position = decode_cursor(before) if before else None
         with self.db_service.get_session() as session:
-            from sqlalchemy import func
+            messages = session.execute(timeline_select(room_id, position, limit + 1)).scalars()
+            items = [MessageResponse.from_db(message) for message in messages]
+        return build_page(items, limit)
 
-            stats = session.execute(
-                select(
-                    User.username,
-                    func.count(Message.id).label("message_count"),
-                    func.max(Message.created_at).label("last_message"),
+    def mark_read(self, room_id: int, user_id: int, message_id: int) -> None:
+        """Сдвигает отметку прочтения участника на сообщение message_id, только вперед"""
+        with self.db_service.get_session() as session:
+            member = self._member(session, room_id, user_id)
+            message = session.execute(
+                select(Message.created_at, Message.id).where(
+                    Message.id == message_id, Message.room_id == room_id
                 )
-                .join(Message, isouter=True)
-                .group_by(User.id)
-                .order_by(func.count(Message.id).desc())
-            ).all()
+            ).first()
+            if message is None:
+                raise ValueError(f"Сообщение с ID {message_id} не найдено в комнате {room_id}")
+
+            if member.last_read_at is None or (message.created_at, message.id) > (
+                member.last_read_at,
+                member.last_read_message_id,
+            ):
+                member.last_read_at = message.created_at
+                member.last_read_message_id = message.id
+                session.commit()
+
+    def unread_count(self, room_id: int, user_id: int, limit: int = 100) -> int:
+        """Число сообщений после отметки прочтения, не больше limit
+
+        Счет останавливается на limit (показывайте "99+"), поэтому запрос
+        читает не больше limit записей индекса, сколько бы ни накопилось.
+        """
+        if limit < 1:
+            raise ValueError("limit должен быть положительным")
+        with self.db_service.get_session() as session:
+            member = self._member(session, room_id, user_id)
+            unread = select(Message.id).where(Message.room_id == room_id)
+            if member.last_read_at is not None:
+                unread = unread.where(
+                    tuple_(Message.created_at, Message.id)
+                    > tuple_(member.last_read_at, member.last_read_message_id)
+                )
+            return session.execute(
+                select(func.count()).select_from(unread.limit(limit).subquery())
+            ).scalar_one()
 
-            return stats
+    @staticmethod
+    def _member(session: Session, room_id: int, user_id: int) -> RoomMember:
+        member = session.get(RoomMember, (room_id, user_id))
+        if member is None:
+            raise ValueError(f"Пользователь с ID {user_id} не участник комнаты {room_id}")
+        return member
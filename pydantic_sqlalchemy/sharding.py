@@ -0,0 +1,260 @@
+"""Шардирование по пользователям: K файлов SQLite, у каждого свой писатель
+
+Пользователь и все его сообщения живут в одном шарде. Глобальный ID
+кодирует шард: global_id = local_id * K + shard, поэтому шард владельца
+находится как user_id % K без справочника, а при K = 1 ID совпадают с
+локальными. Новый пользователь попадает в шард по crc32(username).
+
+Чтения по одному пользователю идут в его шард; общие чтения
+(get_all_messages, страницы, статистика) расходятся по всем шардам в пуле
+потоков и сливаются k-way слиянием по (created_at, id).
+"""
+
+import heapq
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter, itemgetter
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import select
+
+from pydantic_sqlalchemy.database import DatabaseService, EngineProfile
+from pydantic_sqlalchemy.models import User
+from pydantic_sqlalchemy.schemas import (
+    MessageCreate,
+    MessagePage,
+    MessageResponse,
+    UserCreate,
+    UserResponse,
+)
+from pydantic_sqlalchemy.services import (
+    DUPLICATE_USER_ERROR,
+    MessageService,
+    UserService,
+    build_page,
+    decode_cursor,
+)
+
+T = TypeVar('T')
+
+message_order = attrgetter('created_at', 'id')
+
+
+class ShardedDatabaseService:
+    """K экземпляров DatabaseService и пул потоков для запросов ко всем шардам сразу"""
+
+    def __init__(
+        self,
+        database_urls: Sequence[str],
+        profile: Optional[EngineProfile] = None,
+        split_reads: bool = False,
+    ):
+        if not database_urls:
+            raise ValueError('Нужен хотя бы один шард')
+        self.shards = [DatabaseService(url, profile, split_reads) for url in database_urls]
+        self._pool = ThreadPoolExecutor(len(self.shards), thread_name_prefix='shard')
+
+    @classmethod
+    def in_directory(
+        cls, directory: Path, shards: int, profile: Optional[EngineProfile] = None, **kwargs
+    ) -> 'ShardedDatabaseService':
+        """Шарды messenger_0.db ... messenger_{K-1}.db в каталоге directory"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        urls = [f'sqlite:///{directory / f"messenger_{i}.db"}' for i in range(shards)]
+        return cls(urls, profile, **kwargs)
+
+    @property
+    def count(self) -> int:
+        return len(self.shards)
+
+    def create_tables(self):
+        """Создает таблицы во всех шардах"""
+        for shard in self.shards:
+            shard.create_tables()
+
+    def dispose(self):
+        self._pool.shutdown()
+        for shard in self.shards:
+            shard.dispose()
+
+    def shard_for_username(self, username: str) -> int:
+        return zlib.crc32(username.encode()) % self.count
+
+    def global_id(self, shard: int, local_id: int) -> int:
+        return local_id * self.count + shard
+
+    def locate(self, global_id: int) -> Tuple[int, int]:
+        """(шард, локальный ID) для глобального ID"""
+        return global_id % self.count, global_id // self.count
+
+    def fan_out(self, fn: Callable[[int], T], shards: Optional[Iterable[int]] = None) -> List[T]:
+        """fn(shard) для каждого шарда параллельно, результаты в порядке шардов"""
+        shards = range(self.count) if shards is None else list(shards)
+        if len(shards) == 1:
+            return [fn(shards[0])]
+        return list(self._pool.map(fn, shards))
+
+
+class ShardedUserService:
+    """UserService поверх шардов; все ID в ответах глобальные"""
+
+    def __init__(self, sharded: ShardedDatabaseService):
+        self.sharded = sharded
+        self.services = [UserService(shard) for shard in sharded.shards]
+
+    def create_user(self, user_data: UserCreate) -> UserResponse:
+        """Создает пользователя в шарде, выбранном по username
+
+        username уникален внутри шарда по построению; email проверяется во всех
+        шардах, но без общей блокировки, поэтому это проверка, а не гарантия.
+        """
+        shard = self.sharded.shard_for_username(user_data.username)
+        taken = self.sharded.fan_out(
+            lambda i: self._email_taken(i, user_data.email),
+            (i for i in range(self.sharded.count) if i != shard),
+        )
+        if any(taken):
+            raise ValueError(DUPLICATE_USER_ERROR)
+        return self._user(shard, self.services[shard].create_user(user_data))
+
+    def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
+        shard, local_id = self.sharded.locate(user_id)
+        user = self.services[shard].get_user_by_id(local_id)
+        return user and self._user(shard, user)
+
+    def get_user_by_username(self, username: str) -> Optional[UserResponse]:
+        shard = self.sharded.shard_for_username(username)
+        user = self.services[shard].get_user_by_username(username)
+        return user and self._user(shard, user)
+
+    def get_all_users(self) -> List[UserResponse]:
+        """Все пользователи всех шардов в порядке глобального ID"""
+        per_shard = self.sharded.fan_out(
+            lambda i: [self._user(i, user) for user in self.services[i].get_all_users()]
+        )
+        return sorted((user for users in per_shard for user in users), key=attrgetter('id'))
+
+    def _email_taken(self, shard: int, email: str) -> bool:
+        with self.sharded.shards[shard].get_session() as session:
+            return session.execute(select(User.id).where(User.email == email)).first() is not None
+
+    def _user(self, shard: int, user: UserResponse) -> UserResponse:
+        if self.sharded.count == 1:
+            return user
+        return user.model_copy(update={'id': self.sharded.global_id(shard, user.id)})
+
+
+class ShardedMessageService:
+    """MessageService поверх шардов; сообщения хранятся в шарде автора"""
+
+    def __init__(self, sharded: ShardedDatabaseService):
+        self.sharded = sharded
+        self.services = [MessageService(shard) for shard in sharded.shards]
+
+    def create_message(self, message_data: MessageCreate) -> MessageResponse:
+        shard, local_data = self._localize(message_data)
+        return self._message(shard, self.services[shard].create_message(local_data))
+
+    def create_messages(
+        self, messages_data: Iterable[MessageCreate], batch_size: int = 1000
+    ) -> List[MessageResponse]:
+        """Раскладывает сообщения по шардам авторов и пишет шарды параллельно
+
+        Результат в порядке входных данных.
+        """
+        by_shard = {}
+        for position, message_data in enumerate(messages_data):
+            shard, local_data = self._localize(message_data)
+            by_shard.setdefault(shard, []).append((position, local_data))
+
+        def write(shard: int) -> List[Tuple[int, MessageResponse]]:
+            positions, batch = zip(*by_shard[shard], strict=True)
+            created = self.services[shard].create_messages(batch, batch_size)
+            return [(p, self._message(shard, m)) for p, m in zip(positions, created, strict=True)]
+
+        written = self.sharded.fan_out(write, by_shard)
+        ordered = sorted((item for part in written for item in part), key=itemgetter(0))
+        return [message for _, message in ordered]
+
+    def get_user_messages(self, user_id: int) -> List[MessageResponse]:
+        shard, local_id = self.sharded.locate(user_id)
+        return [
+            self._message(shard, message)
+            for message in self.services[shard].get_user_messages(local_id)
+        ]
+
+    def get_all_messages(self) -> List[MessageResponse]:
+        """Все сообщения в порядке (created_at, id): слияние отсортированных шардов"""
+        per_shard = self.sharded.fan_out(
+            lambda i: [self._message(i, m) for m in self.services[i].get_all_messages()]
+        )
+        return list(heapq.merge(*per_shard, key=message_order))
+
+    def get_messages_page(self, limit: int = 50, cursor: Optional[str] = None) -> MessagePage:
+        """Страница по курсору (created_at, глобальный id) поверх всех шардов
+
+        Каждый шард отдает не больше limit + 1 сообщений после своей позиции
+        курсора, слияние берет из них первые limit + 1.
+        """
+        if limit < 1:
+            raise ValueError('limit должен быть положительным')
+
+        after = decode_cursor(cursor) if cursor else None
+
+        def page(shard: int) -> List[MessageResponse]:
+            repository = self.services[shard].repository
+            return [
+                self._message(shard, message)
+                for message in repository.iter_page(
+                    None, self._local_after(shard, after), limit + 1, limit + 1
+                )
+            ]
+
+        merged = heapq.merge(*self.sharded.fan_out(page), key=message_order)
+        return build_page(list(islice(merged, limit + 1)), limit)
+
+    def get_conversation_stats(self) -> List[Tuple[str, int, Optional[datetime]]]:
+        """Статистика всех шардов; при равном числе сообщений - по username"""
+        per_shard = self.sharded.fan_out(lambda i: self.services[i].get_conversation_stats())
+        rows = [row for rows in per_shard for row in rows]
+        return sorted(rows, key=lambda row: (-row.message_count, row.username))
+
+    def get_latest_messages_per_user(self, limit: int = 1) -> List[MessageResponse]:
+        """Последние limit сообщений каждого пользователя, по глобальному ID пользователя"""
+        per_shard = self.sharded.fan_out(
+            lambda i: [
+                self._message(i, m) for m in self.services[i].get_latest_messages_per_user(limit)
+            ]
+        )
+        # Внутри пользователя шард уже отдал новые первыми, а sorted устойчив
+        messages = (message for messages in per_shard for message in messages)
+        return sorted(messages, key=attrgetter('user_id'))
+
+    def _localize(self, message_data: MessageCreate) -> Tuple[int, MessageCreate]:
+        shard, local_id = self.sharded.locate(message_data.user_id)
+        return shard, message_data.model_copy(update={'user_id': local_id})
+
+    def _local_after(
+        self, shard: int, after: Optional[Tuple[datetime, int]]
+    ) -> Optional[Tuple[datetime, int]]:
+        # local * K + shard > global  <=>  local > (global - shard) // K
+        if after is None:
+            return None
+        created_at, global_id = after
+        return created_at, (global_id - shard) // self.sharded.count
+
+    def _message(self, shard: int, message: MessageResponse) -> MessageResponse:
+        if self.sharded.count == 1:
+            return message  # Глобальные ID совпадают с локальными
+        to_global = self.sharded.global_id
+        return message.model_copy(
+            update={
+                'id': to_global(shard, message.id),
+                'user_id': to_global(shard, message.user_id),
+                'user': message.user.model_copy(update={'id': to_global(shard, message.user.id)}),
+            }
+        )
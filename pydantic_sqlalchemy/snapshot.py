@@ -0,0 +1,167 @@
+"""Колоночный снимок users/messages в Arrow/Parquet для аналитики
+
+Агрегаты считаются векторно по снимку, а не запросами к рабочей базе.
+Требует pyarrow (extra analytics).
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Literal, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from sqlalchemy import String, Table, select, type_coerce
+
+from pydantic_sqlalchemy.database import DatabaseService
+from pydantic_sqlalchemy.models import Message, User
+
+SnapshotFormat = Literal['arrow', 'parquet']
+
+SCHEMAS = {
+    'users': pa.schema(
+        [
+            ('id', pa.int64()),
+            ('username', pa.string()),
+            ('email', pa.string()),
+            ('created_at', pa.timestamp('us')),
+        ]
+    ),
+    'messages': pa.schema(
+        [
+            ('id', pa.int64()),
+            ('user_id', pa.int64()),
+            ('message_text', pa.string()),
+            ('created_at', pa.timestamp('us')),
+        ]
+    ),
+}
+SUFFIXES = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+
+def write_snapshot(
+    db_service: DatabaseService,
+    directory: Path,
+    format: SnapshotFormat = 'arrow',
+    batch_size: int = 65_536,
+) -> dict[str, Path]:
+    """Выгружает users и messages в directory пачками по batch_size строк
+
+    Обе таблицы читаются в одной транзакции, поэтому снимок согласован.
+    """
+    if batch_size < 1:
+        raise ValueError('batch_size должен быть положительным')
+    if format not in SUFFIXES:
+        raise ValueError(f'Неизвестный формат: {format}')
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    with db_service.read_engine.connect() as connection:
+        # pysqlite сам не открывает транзакцию для SELECT; без нее таблицы читались бы
+        # из разных версий базы. Закрывается откатом при выходе из connect()
+        connection.exec_driver_sql('BEGIN')
+        for name, table in (('users', User.__table__), ('messages', Message.__table__)):
+            path = directory / f'{name}{SUFFIXES[format]}'
+            result = connection.execution_options(yield_per=batch_size).execute(
+                _snapshot_select(table)
+            )
+            with _writer(path, SCHEMAS[name], format) as writer:
+                for batch in result.partitions():
+                    writer.write_batch(_record_batch(batch, SCHEMAS[name]))
+            paths[name] = path
+    return paths
+
+
+def _snapshot_select(table: Table):
+    # Время читаем строками, в timestamp его переводит Arrow одним векторным cast
+    columns = [
+        type_coerce(column, String).label(column.name) if column.name == 'created_at' else column
+        for column in table.c
+        if column.name in SCHEMAS[table.name].names
+    ]
+    return select(*columns).order_by(table.c.id)
+
+
+def _record_batch(rows, schema: pa.Schema) -> pa.RecordBatch:
+    columns = list(zip(*rows, strict=True))
+    arrays = [
+        pa.array(values, pa.string()).cast(field.type)
+        if pa.types.is_timestamp(field.type)
+        else pa.array(values, field.type)
+        for values, field in zip(columns, schema, strict=True)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _writer(path: Path, schema: pa.Schema, format: SnapshotFormat):
+    if format == 'parquet':
+        return pq.ParquetWriter(path, schema)
+    return ipc.new_file(str(path), schema)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Снимок, открытый для чтения; Arrow-файлы отображаются в память без копирования"""
+
+    users: pa.Table
+    messages: pa.Table
+
+    @classmethod
+    def open(cls, directory: Path) -> 'Snapshot':
+        directory = Path(directory)
+        tables = {}
+        for name in SCHEMAS:
+            arrow_path = directory / f'{name}.arrow'
+            if arrow_path.exists():
+                tables[name] = ipc.open_file(pa.memory_map(str(arrow_path))).read_all()
+            else:
+                tables[name] = pq.read_table(directory / f'{name}.parquet', memory_map=True)
+        return cls(**tables)
+
+    def conversation_stats(self) -> List[Tuple[str, int, Optional[datetime]]]:
+        """(username, message_count, last_message) как у MessageService.get_conversation_stats"""
+        per_user = self.messages.group_by('user_id').aggregate(
+            [('id', 'count'), ('created_at', 'max')]
+        )
+        stats = self.users.select(['id', 'username']).join(
+            per_user, keys='id', right_keys='user_id', join_type='left outer'
+        )
+        stats = stats.set_column(
+            stats.schema.get_field_index('id_count'),
+            'message_count',
+            pc.fill_null(stats['id_count'], 0),
+        ).sort_by([('message_count', 'descending'), ('id', 'ascending')])
+        return list(
+            zip(
+                stats['username'].to_pylist(),
+                stats['message_count'].to_pylist(),
+                stats['created_at_max'].to_pylist(),
+                strict=True,
+            )
+        )
+
+    def last_message_at(self) -> dict[int, datetime]:
+        """Время последнего сообщения каждого писавшего пользователя"""
+        per_user = self.messages.group_by('user_id').aggregate([('created_at', 'max')])
+        return dict(
+            zip(
+                per_user['user_id'].to_pylist(),
+                per_user['created_at_max'].to_pylist(),
+                strict=True,
+            )
+        )
+
+    def hourly_histogram(self, user_id: Optional[int] = None) -> List[int]:
+        """Число сообщений по часам суток (0-23), всего или для одного пользователя"""
+        created_at = self.messages['created_at']
+        if user_id is not None:
+            created_at = created_at.filter(pc.equal(self.messages['user_id'], user_id))
+        counts = pc.value_counts(pc.hour(created_at))
+        histogram = [0] * 24
+        hours, totals = counts.field('values').to_pylist(), counts.field('counts').to_pylist()
+        for hour, count in zip(hours, totals, strict=True):
+            histogram[hour] = count
+        return histogram
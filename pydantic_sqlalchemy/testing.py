@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import Engine, event
+
+
+class QueryCounter:
+    """Считает SQL-запросы, отправленные движком внутри блока with"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __enter__(self) -> 'QueryCounter':
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def assert_max_queries(engine: Engine, expected: int) -> Iterator[QueryCounter]:
+    """Падает, если внутри блока выполнено больше expected запросов"""
+    with QueryCounter(engine) as counter:
+        yield counter
+
+    if counter.count > expected:
+        statements = '\n'.join(f'  {i}. {sql}' for i, sql in enumerate(counter.statements, 1))
+        raise AssertionError(
+            f'Ожидалось не больше {expected} запросов, выполнено {counter.count}:\n{statements}'
+        )
+
+
+def explain_query_plan(engine: Engine, stmt) -> List[str]:
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса SQLAlchemy"""
+    compiled = stmt.compile(engine)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {compiled}', tuple(compiled.params.values())
+        ).all()
+    return [row[-1] for row in rows]
+
+
+def assert_no_full_scan(engine: Engine, stmt, table: str) -> List[str]:
+    """Падает, если план запроса целиком просматривает таблицу table"""
+    plan = explain_query_plan(engine, stmt)
+    scans = [step for step in plan if step.startswith(f'SCAN {table}')]
+    if scans:
+        raise AssertionError(f'Полный просмотр {table}:\n' + '\n'.join(plan))
+    return plan
@@ -0,0 +1,225 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Iterator, List, Literal, Optional, Tuple
+
+from sqlalchemy import Connection
+from sqlalchemy.orm import Session
+
+from pydantic_sqlalchemy.schemas import MessageCreate, MessageResponse
+from pydantic_sqlalchemy.services import (
+    MessageService,
+    check_batch_users,
+    message_responses,
+    messages_insert,
+)
+
+Synchronous = Literal['OFF', 'NORMAL', 'FULL', 'EXTRA']
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Метка конца очереди для потока записи
+
+
+class WriteBehindQueue:
+    """Отложенная запись сообщений: очередь в памяти и групповые коммиты в фоне
+
+    submit() сразу возвращает Future; фоновый поток копит сообщения до
+    max_batch штук или max_delay секунд и пишет их одной транзакцией, то есть
+    одним fsync на пачку вместо fsync на сообщение. Если в очереди уже
+    max_pending сообщений, submit() ждет (backpressure), а по истечении
+    put_timeout бросает queue.Full.
+
+    Сообщение надежно сохранено только когда его Future завершился; при падении
+    процесса все, что лежит в очереди, теряется.
+    """
+
+    def __init__(
+        self,
+        message_service: MessageService,
+        max_batch: int = 500,
+        max_delay: float = 0.01,
+        max_pending: int = 10_000,
+        put_timeout: Optional[float] = None,
+        synchronous: Optional[Synchronous] = None,
+    ):
+        if max_batch < 1 or max_pending < 1:
+            raise ValueError('max_batch и max_pending должны быть положительными')
+        self.message_service = message_service
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        # PRAGMA synchronous только для соединения потока записи, например FULL
+        # для fsync на каждый групповой коммит даже в режиме WAL
+        self.synchronous = synchronous
+        self.batches = 0
+        self.written = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self) -> 'WriteBehindQueue':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, message_data: MessageCreate) -> 'Future[MessageResponse]':
+        """Ставит сообщение в очередь; Future завершится после коммита его пачки"""
+        future: Future = Future()
+        # Под блокировкой, чтобы сообщение не оказалось в очереди после метки остановки
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Очередь записи уже закрыта')
+            self._queue.put((message_data, future), timeout=self.put_timeout)
+        return future
+
+    def send(self, message_data: MessageCreate, timeout: Optional[float] = None) -> int:
+        """Ставит сообщение в очередь и ждет коммита, возвращает ID сообщения"""
+        return self.submit(message_data).result(timeout).id
+
+    def flush(self) -> None:
+        """Ждет, пока все уже принятые сообщения будут записаны"""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Дописывает очередь и останавливает поток записи; повторный вызов ничего не делает"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        return {
+            'written': self.written,
+            'batches': self.batches,
+            'avg_batch': self.written / self.batches if self.batches else 0.0,
+        }
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            try:
+                if batch:
+                    with self._connection() as connection, Session(bind=connection) as session:
+                        self._write(session, batch)
+            except Exception as exc:
+                # Не удалось соединение или PRAGMA: пачка не записана, но поток живет
+                # дальше, иначе submit() и flush() повиснут навсегда
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+
+    @contextmanager
+    def _connection(self) -> Iterator[Connection]:
+        # Соединение берется на одну пачку: при split_reads у писателя оно единственное
+        # в пуле, и его нельзя держать между пачками
+        engine = self.message_service.db_service.engine
+        with engine.connect() as connection:
+            if not self.synchronous:
+                yield connection
+                return
+            previous = connection.exec_driver_sql('PRAGMA synchronous').scalar()
+            connection.exec_driver_sql(f'PRAGMA synchronous = {self.synchronous}')
+            connection.commit()  # Транзакцией пачки дальше управляет сессия
+            try:
+                yield connection
+            finally:
+                # Не возвращаем в пул соединение с нестандартной PRAGMA; менять ее
+                # можно только вне транзакции
+                try:
+                    connection.rollback()
+                    connection.exec_driver_sql(f'PRAGMA synchronous = {previous}')
+                except Exception:
+                    connection.invalidate()
+                    raise
+
+    def _next_batch(self) -> Tuple[List[Tuple[MessageCreate, Future]], bool]:
+        batch = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.max_delay
+        while item is not _STOP:
+            batch.append(item)
+            if len(batch) >= self.max_batch:
+                return batch, False
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _write(self, session: Session, batch: List[Tuple[MessageCreate, Future]]) -> None:
+        # Отмененные до записи сообщения пропускаем, остальные помечаем как выполняемые
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            responses = self._insert(session, [message_data for message_data, _ in batch])
+        except Exception as exc:
+            session.rollback()
+            if isinstance(exc, ValueError) and len(batch) > 1:
+                # Неизвестный пользователь не должен ронять чужие сообщения пачки
+                for item in batch:
+                    self._write_one(session, item)
+                return
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        self._committed(responses)
+        for (_, future), response in zip(batch, responses, strict=True):
+            future.set_result(response)
+
+    def _write_one(self, session: Session, item: Tuple[MessageCreate, Future]) -> None:
+        message_data, future = item
+        try:
+            response = self._insert(session, [message_data])[0]
+        except Exception as exc:
+            session.rollback()
+            future.set_exception(exc)
+        else:
+            self._committed([response])
+            future.set_result(response)
+
+    def _insert(self, session: Session, batch: List[MessageCreate]) -> List[MessageResponse]:
+        user_responses = self.message_service.load_users(
+            session, {message_data.user_id for message_data in batch}
+        )
+        check_batch_users(batch, user_responses)
+        rows = session.execute(
+            messages_insert(), [message_data.model_dump() for message_data in batch]
+        ).all()
+        responses = message_responses(batch, rows, user_responses)
+        session.commit()
+        self.batches += 1
+        self.written += len(rows)
+        return responses
+
+    def _committed(self, responses: List[MessageResponse]) -> None:
+        # После коммита, но до Future: получивший ID уже видит сообщение в горячем слое.
+        # Ошибка здесь не должна выдать записанное за сбой
+        try:
+            self.message_service.db_service.changes.notify()
+            if self.message_service.hot_tier:
+                for response in responses:
+                    self.message_service.hot_tier.add(response)
+        except Exception:
+            logger.exception('Не удалось оповестить о записанных сообщениях')
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from pydantic_sqlalchemy import DatabaseService, MessageService, UserCreate, UserService
+from pydantic_sqlalchemy.analytics import ParallelAnalytics, key_ranges
+from pydantic_sqlalchemy.models import Message
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing three users with 60 messages over three days."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    users = UserService(service)
+    for name in ('alice', 'bob', 'carol'):
+        users.create_user(UserCreate(username=name, email=f'{name}@example.com'))
+    with service.get_session() as session:
+        session.add_all(
+            # alice пишет чаще всех, carol - ни разу
+            Message(
+                user_id=1 if i % 3 else 2,
+                message_text=str(i),
+                created_at=datetime(2024, 1, 1 + i % 3, i % 24),
+            )
+            for i in range(60)
+        )
+        session.commit()
+    return service
+
+
+@pytest.fixture
+def analytics(db_service):
+    """Fixture providing analytics over a thread pool with more ranges than users."""
+    with ThreadPoolExecutor(2) as executor:
+        yield ParallelAnalytics(db_service, workers=2, parts=7, executor=executor)
+
+
+class TestParallelAnalytics:
+    """Test cases for range-partitioned aggregation."""
+
+    def test_stats_match_single_query(self, db_service, analytics):
+        """Test that merged partial stats equal the materialized stats."""
+        expected = [tuple(row) for row in MessageService(db_service).get_conversation_stats()]
+
+        assert analytics.conversation_stats() == expected
+        assert expected[-1] == ('carol', 0, None)
+
+    def test_daily_histogram(self, db_service, analytics):
+        """Test per-day counts summed across ranges."""
+        day = func.date(Message.created_at)
+        with db_service.get_session() as session:
+            expected = session.execute(select(day, func.count()).group_by(day).order_by(day)).all()
+
+        assert analytics.daily_histogram() == [tuple(row) for row in expected]
+
+    def test_top_talkers(self, analytics):
+        """Test that the top-N is taken from merged counts."""
+        partial = analytics.aggregate()
+
+        assert [(name, count) for name, count, _ in analytics.top_talkers(1, partial)] == [
+            ('alice', 40)
+        ]
+
+    def test_worker_processes(self, db_service):
+        """Test the default process pool end to end."""
+        with ParallelAnalytics(db_service, workers=2) as analytics:
+            stats = analytics.conversation_stats()
+
+        assert [count for _, count, _ in stats] == [40, 20, 0]
+
+    def test_empty_table(self, tmp_path):
+        """Test that an empty messages table gives zero counts."""
+        service = DatabaseService(f'sqlite:///{tmp_path / "empty.db"}')
+        service.create_tables()
+        with ThreadPoolExecutor(1) as executor:
+            analytics = ParallelAnalytics(service, executor=executor)
+            assert analytics.daily_histogram() == []
+            assert analytics.conversation_stats() == []
+
+    def test_in_memory_rejected(self):
+        """Test that worker processes need a database file."""
+        with pytest.raises(ValueError):
+            ParallelAnalytics(DatabaseService('sqlite:///:memory:'))
+
+
+def test_key_ranges_cover_interval():
+    """Test that ranges are contiguous, disjoint and never empty."""
+    assert key_ranges(1, 10, 3) == [(1, 3), (4, 6), (7, 10)]
+    assert key_ranges(5, 6, 8) == [(5, 5), (6, 6)]
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from pydantic_sqlalchemy import MessageCreate, UserCreate
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('greenlet')
+
+from pydantic_sqlalchemy.async_services import (  # noqa: E402
+    AsyncDatabaseService,
+    AsyncMessageService,
+    AsyncUserService,
+)
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f'sqlite+aiosqlite:///{tmp_path / "messenger.db"}'
+
+
+async def make_services(db_url):
+    db_service = AsyncDatabaseService(db_url)
+    await db_service.create_tables()
+    return db_service, AsyncUserService(db_service), AsyncMessageService(db_service)
+
+
+class TestAsyncServices:
+    """Test cases for the async service layer."""
+
+    def test_create_and_list(self, db_url):
+        """Test that users and messages round-trip through the async services."""
+
+        async def scenario():
+            db_service, users, messages = await make_services(db_url)
+            alice = await users.create_user(UserCreate(username='alice', email='alice@example.com'))
+            with pytest.raises(ValueError):
+                await users.create_user(UserCreate(username='alice', email='x@example.com'))
+
+            await messages.create_message(MessageCreate(user_id=alice.id, message_text='hi'))
+            await messages.create_messages(
+                MessageCreate(user_id=alice.id, message_text=f'm{i}') for i in range(5)
+            )
+
+            listed = await messages.get_all_messages()
+            page = await messages.get_messages_page(limit=4)
+            stats = await messages.get_conversation_stats()
+            await db_service.dispose()
+            return alice, listed, page, stats
+
+        alice, listed, page, stats = asyncio.run(scenario())
+
+        assert [m.message_text for m in listed] == ['hi', 'm0', 'm1', 'm2', 'm3', 'm4']
+        assert all(m.user.username == 'alice' for m in listed)
+        assert len(page.items) == 4 and page.next_cursor is not None
+        assert [tuple(row) for row in stats] == [('alice', 6, listed[-1].created_at)]
+
+    def test_concurrent_requests(self, db_url):
+        """Test that many concurrent coroutines share the async pool."""
+
+        async def scenario():
+            db_service, users, messages = await make_services(db_url)
+            results = await users.create_users(
+                UserCreate(username=f'user{i}', email=f'user{i}@example.com') for i in range(10)
+            )
+            ids = [result.user.id for result in results]
+            await asyncio.gather(
+                *(
+                    messages.create_message(MessageCreate(user_id=user_id, message_text='hey'))
+                    for user_id in ids
+                )
+            )
+            per_user = await asyncio.gather(*(messages.get_user_messages(i) for i in ids))
+            await db_service.dispose()
+            return per_user
+
+        assert [len(found) for found in asyncio.run(scenario())] == [1] * 10
@@ -0,0 +1,65 @@
+from collections import Counter
+
+import pytest
+
+from benchmarks.suite import compare, run_suite
+from benchmarks.workload import Workload
+
+
+class TestWorkload:
+    """Test cases for the synthetic workload generator."""
+
+    def test_is_deterministic(self):
+        """Test that the same seed produces the same messages."""
+        workload = Workload(users=50, messages=500)
+
+        assert list(workload.message_rows()) == list(workload.message_rows())
+
+    def test_messages_are_zipf_skewed(self):
+        """Test that the hot user writes far more than a median user."""
+        workload = Workload(users=100, messages=5000)
+        counts = Counter(user_id for user_id, _, _ in workload.message_rows(chunk=700))
+
+        assert sum(counts.values()) == 5000
+        assert counts.most_common(1)[0][0] == workload.hot_user_id()
+        assert counts[workload.hot_user_id()] > 10 * sorted(counts.values())[len(counts) // 2]
+
+
+class TestCompare:
+    """Test cases for baseline comparison."""
+
+    def test_flags_regressions_beyond_threshold(self):
+        """Test that only slowdowns past the threshold are regressions."""
+        baseline = {'results': {'a': {'median_ms': 10.0}, 'b': {'median_ms': 10.0}}}
+        report = {
+            'results': {
+                'a': {'median_ms': 5.0},
+                'b': {'median_ms': 12.0},
+                'new': {'median_ms': 1.0},
+            }
+        }
+
+        rows = compare(report, baseline, threshold=0.1)
+
+        assert [(row['scenario'], row['ratio'], row['regression']) for row in rows] == [
+            ('a', 2.0, False),
+            ('b', 10 / 12, True),
+        ]
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_run_suite_smoke(tmp_path):
+    """Smoke test running every scenario on a tiny workload."""
+    report = run_suite(Workload(users=20, messages=300), repeat=1, workdir=tmp_path)
+
+    assert report['meta']['workload']['messages'] == 300
+    assert {name.split('.')[1] for name in report['results']} == {
+        'insert',
+        'list',
+        'user_messages',
+        'latest_per_user',
+        'stats',
+        'search',
+    }
+    assert all(result['median_ms'] > 0 for result in report['results'].values())
@@ -0,0 +1,116 @@
+import pytest
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.cache import LRUCache, UserCache
+from pydantic_sqlalchemy.testing import assert_max_queries
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    """Test cases for the in-process LRU backend."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched key is evicted first."""
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert len(cache) == 2
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than ttl are treated as missing."""
+        clock = FakeClock()
+        cache = LRUCache(ttl=10, clock=clock)
+        cache.set('a', 1)
+
+        clock.now = 9.9
+        assert cache.get('a') == 1
+        clock.now = 10
+        assert cache.get('a') is None
+
+    def test_invalid_size(self):
+        """Test that a non-positive size is rejected."""
+        with pytest.raises(ValueError):
+            LRUCache(max_size=0)
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    return service
+
+
+@pytest.fixture
+def user_cache():
+    return UserCache()
+
+
+class TestUserCache:
+    """Test cases for read-through user caching in the services."""
+
+    def test_lookups_hit_cache_after_create(self, db_service, user_cache):
+        """Test that created users are served without touching the database."""
+        user_service = UserService(db_service, cache=user_cache)
+        alice = user_service.create_user(UserCreate(username='alice', email='alice@example.com'))
+
+        with assert_max_queries(db_service.engine, 0):
+            assert user_service.get_user_by_id(alice.id) == alice
+            assert user_service.get_user_by_username('alice') == alice
+
+        assert user_cache.stats()['hits'] == 2
+
+    def test_miss_reads_through(self, db_service, user_cache):
+        """Test that a miss loads from the database and fills the cache."""
+        alice = UserService(db_service).create_user(
+            UserCreate(username='alice', email='alice@example.com')
+        )
+        user_service = UserService(db_service, cache=user_cache)
+
+        assert user_service.get_user_by_id(alice.id) == alice
+        assert user_service.get_user_by_id(alice.id) == alice
+        assert user_service.get_user_by_id(999) is None
+        assert user_cache.stats() == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3}
+
+    def test_invalidate_drops_both_keys(self, db_service, user_cache):
+        """Test that invalidation removes the id and username entries."""
+        user_service = UserService(db_service, cache=user_cache)
+        alice = user_service.create_user(UserCreate(username='alice', email='alice@example.com'))
+
+        user_cache.invalidate(alice.id)
+
+        assert user_cache.get_by_id(alice.id) is None
+        assert user_cache.get_by_username('alice') is None
+
+    def test_message_creation_skips_user_lookup(self, db_service, user_cache):
+        """Test that message creation trusts a cached user."""
+        alice = UserService(db_service, cache=user_cache).create_user(
+            UserCreate(username='alice', email='alice@example.com')
+        )
+        message_service = MessageService(db_service, user_cache=user_cache)
+
+        with assert_max_queries(db_service.engine, 2) as counter:
+            message = message_service.create_message(
+                MessageCreate(user_id=alice.id, message_text='hi')
+            )
+            message_service.create_messages([MessageCreate(user_id=alice.id, message_text='yo')])
+
+        assert message.user == alice
+        assert not any('FROM users' in sql for sql in counter.statements)
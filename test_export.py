@@ -0,0 +1,157 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.__main__ import main
+from pydantic_sqlalchemy.export import EXPORT_FIELDS, export_messages
+from pydantic_sqlalchemy.models import Message
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing a database with two users and 25 messages."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    users = UserService(service)
+    alice = users.create_user(UserCreate(username='alice123', email='alice@example.com'))
+    bob = users.create_user(UserCreate(username='bob456', email='bob@example.com'))
+    MessageService(service).create_messages(
+        MessageCreate(user_id=(alice.id, bob.id)[i % 2], message_text=f'msg {i}, "q"')
+        for i in range(25)
+    )
+    return service
+
+
+def read_ndjson(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in data.splitlines()]
+
+
+class TestExportMessages:
+    """Test cases for streaming message export."""
+
+    def test_ndjson(self, db_service):
+        """Test that every message is written as one JSON line in order."""
+        fp = io.BytesIO()
+
+        result = export_messages(db_service, fp, batch_size=7)
+
+        rows = read_ndjson(fp.getvalue())
+        assert result.rows == len(rows) == 25
+        assert list(rows[0]) == list(EXPORT_FIELDS)
+        assert [r['message_text'] for r in rows[:2]] == ['msg 0, "q"', 'msg 1, "q"']
+        assert [r['username'] for r in rows[:2]] == ['alice123', 'bob456']
+
+    def test_csv(self, db_service):
+        """Test that CSV has a header and escapes commas and quotes."""
+        fp = io.BytesIO()
+
+        export_messages(db_service, fp, format='csv', batch_size=10)
+
+        rows = list(csv.reader(io.StringIO(fp.getvalue().decode())))
+        assert rows[0] == list(EXPORT_FIELDS)
+        assert len(rows) == 26
+        assert rows[1][1:3] == ['alice123', 'msg 0, "q"']
+
+    def test_gzip(self, db_service):
+        """Test that gzip output decompresses to the plain export."""
+        plain, packed = io.BytesIO(), io.BytesIO()
+
+        export_messages(db_service, plain)
+        export_messages(db_service, packed, compression='gzip')
+
+        assert gzip.decompress(packed.getvalue()) == plain.getvalue()
+        assert not packed.closed
+
+    def test_zstd(self, db_service):
+        """Test that zstd output decompresses to the plain export."""
+        zstandard = pytest.importorskip('zstandard')
+        plain, packed = io.BytesIO(), io.BytesIO()
+
+        export_messages(db_service, plain)
+        export_messages(db_service, packed, compression='zstd')
+
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(
+            packed.getvalue()
+        ) == plain.getvalue()
+
+    def test_incremental_since_watermark(self, db_service):
+        """Test that a watermark resumes after the last exported message."""
+        first = export_messages(db_service, io.BytesIO())
+        MessageService(db_service).create_messages(
+            [MessageCreate(user_id=1, message_text='new')]
+        )
+
+        fp = io.BytesIO()
+        second = export_messages(db_service, fp, since=first.watermark)
+
+        assert [r['message_text'] for r in read_ndjson(fp.getvalue())] == ['new']
+        assert second.rows == 1
+
+        empty = export_messages(db_service, io.BytesIO(), since=second.watermark)
+        assert empty.rows == 0
+        assert empty.watermark == second.watermark
+
+    def test_late_commit_with_earlier_time(self, db_service):
+        """Test that a message committed after the watermark is exported despite an older time."""
+        first = export_messages(db_service, io.BytesIO())
+        with db_service.get_session() as session:
+            session.add(
+                Message(user_id=1, message_text='late', created_at=datetime(2000, 1, 1))
+            )
+            session.commit()
+
+        fp = io.BytesIO()
+        export_messages(db_service, fp, since=first.watermark)
+
+        assert [r['message_text'] for r in read_ndjson(fp.getvalue())] == ['late']
+
+    def test_invalid_watermark(self, db_service):
+        """Test that a malformed watermark raises ValueError."""
+        with pytest.raises(ValueError):
+            export_messages(db_service, io.BytesIO(), since='not-a-watermark')
+
+    def test_empty_csv_has_header(self, db_service):
+        """Test that an empty CSV export still writes the header."""
+        last = export_messages(db_service, io.BytesIO())
+        fp = io.BytesIO()
+
+        export_messages(db_service, fp, format='csv', since=last.watermark)
+
+        assert fp.getvalue().decode().splitlines() == [','.join(EXPORT_FIELDS)]
+
+    def test_invalid_format(self, db_service):
+        """Test that unknown formats are rejected."""
+        with pytest.raises(ValueError):
+            export_messages(db_service, io.BytesIO(), format='xml')
+
+    def test_cli(self, db_service, tmp_path, capsys):
+        """Test that the export command writes a file and reports the watermark."""
+        output = tmp_path / 'messages.ndjson.gz'
+
+        main(
+            [
+                '--database-url',
+                str(db_service.engine.url),
+                'export',
+                '--compression',
+                'gzip',
+                '--output',
+                str(output),
+            ]
+        )
+
+        assert len(read_ndjson(gzip.decompress(output.read_bytes()))) == 25
+        captured = capsys.readouterr()
+        assert captured.out == ''
+        assert 'Водяной знак' in captured.err
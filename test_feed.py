@@ -0,0 +1,140 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.repositories import feed_select
+from pydantic_sqlalchemy.testing import assert_no_full_scan
+from pydantic_sqlalchemy.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing a database with one user."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    UserService(service).create_user(UserCreate(username='alice123', email='alice@example.com'))
+    return service
+
+
+@pytest.fixture
+def message_service(db_service):
+    return MessageService(db_service)
+
+
+def post(message_service, *texts):
+    return message_service.create_messages(
+        MessageCreate(user_id=1, message_text=text) for text in texts
+    )
+
+
+class TestTail:
+    """Test cases for reading the change feed."""
+
+    def test_tail_pages_in_commit_order(self, message_service):
+        """Test walking the feed with next_seq until it is exhausted."""
+        post(message_service, 'a', 'b', 'c')
+
+        first = message_service.tail(0, limit=2)
+        second = message_service.tail(first.next_seq, limit=2)
+        last = message_service.tail(second.next_seq)
+
+        assert [m.message_text for m in first.items + second.items] == ['a', 'b', 'c']
+        assert first.items[0].user.username == 'alice123'
+        assert last.items == [] and last.next_seq == second.next_seq
+
+    def test_seq_is_not_reused(self, db_service, message_service):
+        """Test that a deleted newest message does not hand its position to the next one."""
+        post(message_service, 'a', 'b')
+        seen = message_service.tail(0).next_seq
+        with db_service.engine.begin() as conn:
+            conn.execute(text("DELETE FROM messages WHERE message_text = 'b'"))
+        post(message_service, 'c')
+
+        page = message_service.tail(seen)
+
+        assert [m.message_text for m in page.items] == ['c']
+        assert page.next_seq > seen
+
+    def test_existing_messages_enter_feed(self, tmp_path):
+        """Test that create_tables queues messages written before the feed existed."""
+        path = tmp_path / 'old.db'
+        service = DatabaseService(f'sqlite:///{path}')
+        service.create_tables()
+        UserService(service).create_user(UserCreate(username='bob', email='bob@example.com'))
+        with sqlite3.connect(path) as conn:
+            # База до появления ленты: ни таблицы, ни ее триггеров
+            for name in ('insert', 'delete', 'update'):
+                conn.execute(f'DROP TRIGGER trg_messages_feed_{name}')
+            conn.execute('DROP TABLE message_feed')
+            conn.execute(
+                'INSERT INTO messages (user_id, message_text, created_at) '
+                "VALUES (1, 'old', '2024-01-01 00:00:00.000000')"
+            )
+
+        service.create_tables()
+
+        assert [m.message_text for m in MessageService(service).tail().items] == ['old']
+
+    def test_tail_uses_primary_key(self, db_service):
+        """Test that tail is a primary key range of the feed, not a scan."""
+        assert_no_full_scan(db_service.engine, feed_select(10, 100), 'message_feed')
+
+
+class TestSubscribe:
+    """Test cases for waiting on the change feed."""
+
+    def test_returns_immediately_when_behind(self, message_service):
+        """Test that subscribe does not wait when messages are already there."""
+        post(message_service, 'a')
+
+        assert [m.message_text for m in message_service.subscribe(0, timeout=5).items] == ['a']
+
+    def test_wakes_on_commit(self, message_service):
+        """Test that a commit in another thread wakes the waiter before the poll interval."""
+        timer = threading.Timer(0.1, post, (message_service, 'late'))
+        start = time.monotonic()
+        timer.start()
+
+        page = message_service.subscribe(0, timeout=5, poll_interval=30)
+
+        assert [m.message_text for m in page.items] == ['late']
+        assert time.monotonic() - start < 5
+
+    def test_timeout_returns_empty_page(self, message_service):
+        """Test that subscribe gives up after timeout with the position unchanged."""
+        page = message_service.subscribe(7, timeout=0.05)
+
+        assert page.items == [] and page.next_seq == 7
+
+    def test_write_behind_wakes_subscribers(self, message_service):
+        """Test that group commits of the write-behind queue notify subscribers."""
+        with WriteBehindQueue(message_service, max_delay=0) as writer:
+            message_data = MessageCreate(user_id=1, message_text='q')
+            threading.Timer(0.1, writer.submit, (message_data,)).start()
+            page = message_service.subscribe(0, timeout=5, poll_interval=30)
+
+        assert [m.message_text for m in page.items] == ['q']
+
+    def test_subscribe_async(self, message_service):
+        """Test that the async subscriber is woken without blocking the event loop."""
+
+        async def scenario():
+            waiter = asyncio.create_task(
+                message_service.subscribe_async(0, timeout=5, poll_interval=30)
+            )
+            await asyncio.sleep(0.1)
+            await asyncio.to_thread(post, message_service, 'async')
+            return await waiter
+
+        assert [m.message_text for m in asyncio.run(scenario()).items] == ['async']
@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.hot_tier import HotMessageTier
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.purge import PurgeService
+from pydantic_sqlalchemy.repositories import SQLiteMessageRepository
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing alice with five messages, one per day, and bob with none."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    users = UserService(service)
+    users.create_user(UserCreate(username='alice123', email='alice@example.com'))
+    users.create_user(UserCreate(username='bob456', email='bob@example.com'))
+    with service.get_session() as session:
+        session.add_all(
+            Message(user_id=1, message_text=f'm{i}', created_at=START + timedelta(i))
+            for i in range(5)
+        )
+        session.commit()
+    return service
+
+
+def texts(messages):
+    return [m.message_text for m in messages]
+
+
+class TestHotMessageTier:
+    """Test cases for serving recent user messages from memory."""
+
+    def test_second_read_is_a_hit(self, db_service):
+        """Test that the first read fills the ring and the next one skips the database."""
+        tier = HotMessageTier(per_user=10)
+        service = MessageService(db_service, hot_tier=tier)
+
+        first = service.get_user_messages(1, limit=3)
+        second = service.get_user_messages(1, limit=3)
+
+        assert texts(first) == texts(second) == ['m2', 'm3', 'm4']
+        assert second[0].user.username == 'alice123'
+        assert (tier.stats()['misses'], tier.stats()['hits']) == (1, 1)
+
+    @pytest.mark.parametrize('raw', [False, True])
+    def test_matches_database(self, db_service, raw):
+        """Test that tier answers equal repository answers for both repositories."""
+        repository = SQLiteMessageRepository(db_service) if raw else None
+        plain = MessageService(db_service, repository=repository)
+        hot = MessageService(db_service, repository=repository, hot_tier=HotMessageTier(3))
+        hot.get_user_messages(1, limit=2)
+
+        for limit in (None, 1, 3, 4, 10):
+            expected = plain.get_user_messages(1, limit=limit)
+            assert hot.get_user_messages(1, limit=limit) == expected
+
+    def test_create_message_appends(self, db_service):
+        """Test that new messages enter an existing ring and push out the oldest."""
+        tier = HotMessageTier(per_user=5)
+        service = MessageService(db_service, hot_tier=tier)
+        assert len(service.get_user_messages(1)) == 5
+
+        service.create_message(MessageCreate(user_id=1, message_text='new'))
+        service.create_messages([MessageCreate(user_id=1, message_text='newer')])
+
+        assert texts(service.get_user_messages(1, limit=5)) == ['m2', 'm3', 'm4', 'new', 'newer']
+        assert tier.stats()['hits'] == 1
+        # Кольцо больше не хранит всю историю: полный список идет из базы
+        assert len(service.get_user_messages(1)) == 7
+        assert tier.stats()['misses'] == 2
+
+    def test_no_ring_for_unread_user(self, db_service):
+        """Test that writes alone do not create rings."""
+        tier = HotMessageTier()
+        service = MessageService(db_service, hot_tier=tier)
+
+        service.create_message(MessageCreate(user_id=2, message_text='hi'))
+
+        assert tier.stats()['users'] == 0
+        assert texts(service.get_user_messages(2)) == ['hi']
+        assert texts(service.get_user_messages(2)) == ['hi']
+        assert tier.stats()['hits'] == 1
+
+    def test_load_racing_with_write_is_dropped(self, db_service):
+        """Test that a ring read before a concurrent write is not stored."""
+        tier = HotMessageTier()
+        service = MessageService(db_service)
+        token = tier.begin_load(1)
+        stale = service.get_user_messages(1)
+        MessageService(db_service, hot_tier=tier).create_message(
+            MessageCreate(user_id=1, message_text='late')
+        )
+
+        tier.load(1, stale, token)
+
+        assert tier.recent(1) is None
+
+    def test_second_reader_does_not_revive_stale_load(self, db_service):
+        """Test that a reader starting after a write keeps its ring and drops the older one."""
+        tier = HotMessageTier()
+        service = MessageService(db_service)
+        writer = MessageService(db_service, hot_tier=tier)
+        first = tier.begin_load(1)
+        stale = service.get_user_messages(1)
+        writer.create_message(MessageCreate(user_id=1, message_text='late'))
+        second = tier.begin_load(1)
+        fresh = service.get_user_messages(1)
+
+        tier.load(1, stale, first)
+        tier.load(1, fresh, second)
+
+        assert texts(tier.recent(1)) == ['m0', 'm1', 'm2', 'm3', 'm4', 'late']
+
+    def test_add_after_load_skips_duplicate(self, db_service):
+        """Test that a message already read into the ring is not appended again."""
+        tier = HotMessageTier()
+        service = MessageService(db_service)
+        message = service.create_message(MessageCreate(user_id=1, message_text='new'))
+        token = tier.begin_load(1)
+        tier.load(1, service.get_user_messages(1), token)
+
+        tier.add(message)
+
+        ids = [m.id for m in tier.recent(1)]
+        assert ids == [1, 2, 3, 4, 5, 6]
+
+    def test_late_commit_older_than_full_ring_is_dropped(self, db_service):
+        """Test that a write older than the whole full ring does not evict a newer message."""
+        tier = HotMessageTier(per_user=3)
+        messages = MessageService(db_service).get_user_messages(1)
+        tier.load(1, messages, tier.begin_load(1))
+        late = messages[0].model_copy(update={'id': 6, 'created_at': START + timedelta(1.5)})
+
+        tier.add(late)
+
+        assert [m.id for m in tier.recent(1, 3)] == [3, 4, 5]
+        assert tier.recent(1) is None
+
+    def test_evicts_least_recently_read(self, db_service):
+        """Test that rings over max_bytes are evicted oldest read first."""
+        service = MessageService(db_service)
+        service.create_message(MessageCreate(user_id=2, message_text='hi'))
+        probe = HotMessageTier()
+        probe.load(1, service.get_user_messages(1), probe.begin_load(1))
+        tier = HotMessageTier(max_bytes=probe.stats()['bytes'] + 1)
+
+        for user_id in (1, 2):
+            tier.load(user_id, service.get_user_messages(user_id), tier.begin_load(user_id))
+
+        stats = tier.stats()
+        assert (stats['users'], stats['evictions']) == (1, 1)
+        assert stats['bytes'] <= stats['max_bytes']
+        assert tier.recent(1) is None and texts(tier.recent(2)) == ['hi']
+
+    def test_purge_invalidates(self, db_service):
+        """Test that purged messages are not served from the tier."""
+        tier = HotMessageTier()
+        service = MessageService(db_service, hot_tier=tier)
+        service.get_user_messages(1)
+
+        PurgeService(db_service, pause=0, hot_tier=tier).purge_messages_before(START + timedelta(3))
+
+        assert texts(service.get_user_messages(1)) == ['m3', 'm4']
+
+    def test_delete_user_invalidates(self, db_service):
+        """Test that a deleted user's complete ring is not served."""
+        tier = HotMessageTier()
+        service = MessageService(db_service, hot_tier=tier)
+        service.get_user_messages(1)
+
+        UserService(db_service, hot_tier=tier).delete_user(1)
+
+        assert tier.recent(1) is None
+        assert service.get_user_messages(1) == []
+
+    def test_one_query_when_ring_cannot_answer(self, db_service):
+        """Test that reads longer than the ring go to the database once without reloading."""
+        tier = HotMessageTier(per_user=3)
+        service = MessageService(db_service, hot_tier=tier)
+        calls = []
+        repository = service.repository
+        for name in ('get_by_user', 'get_recent_by_user'):
+            method = getattr(repository, name)
+            setattr(
+                repository,
+                name,
+                lambda *args, name=name, method=method: calls.append(name) or method(*args),
+            )
+
+        assert len(service.get_user_messages(1)) == 5
+        assert len(service.get_user_messages(1)) == 5
+        assert len(service.get_user_messages(1, limit=4)) == 4
+        assert texts(service.get_user_messages(1, limit=3)) == ['m2', 'm3', 'm4']
+
+        assert calls == ['get_by_user', 'get_by_user', 'get_recent_by_user']
+        assert tier.stats()['hits'] == 1
+
+    def test_invalid_limit(self, db_service):
+        """Test that a non-positive limit is rejected."""
+        with pytest.raises(ValueError):
+            MessageService(db_service, hot_tier=HotMessageTier()).get_user_messages(1, limit=0)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import sqlite3
+
+import pytest
+
+import pure_sql
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.metrics import Histogram, Metrics, instrument, instrument_service
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(slow_threshold=None)
+
+
+@pytest.fixture
+def db_service(tmp_path, metrics):
+    """Fixture providing an instrumented database with two users."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    instrument(service, metrics)
+    users = UserService(service)
+    users.create_user(UserCreate(username='alice123', email='alice@example.com'))
+    users.create_user(UserCreate(username='bob456', email='bob@example.com'))
+    metrics.reset()
+    return service
+
+
+ALL_USERS_SQL = 'SELECT users.id, users.username, users.email, users.created_at FROM users'
+
+
+def statement(metrics: Metrics, prefix: str) -> dict:
+    statements = metrics.snapshot()['statements'].items()
+    [stats] = [stats for label, stats in statements if label.startswith(prefix)]
+    return stats
+
+
+class TestStatementMetrics:
+    """Test cases for per-statement counters collected from the engine."""
+
+    def test_counts_rows_returned(self, db_service, metrics):
+        """Test that selects report rows fetched and inserts rows written."""
+        UserService(db_service).get_all_users()
+        MessageService(db_service).create_messages(
+            MessageCreate(user_id=1, message_text=str(i)) for i in range(3)
+        )
+
+        users = metrics.snapshot()['statements'][ALL_USERS_SQL]
+        assert (users['count'], users['rows']) == (1, 2)
+        assert statement(metrics, 'INSERT INTO messages')['rows'] == 3
+        assert users['seconds'] > 0
+
+    def test_slow_query_log(self, db_service, metrics, caplog):
+        """Test that statements over the threshold are logged and kept."""
+        metrics.slow_threshold = 0.0
+
+        with caplog.at_level(logging.WARNING, logger='pydantic_sqlalchemy.metrics'):
+            UserService(db_service).get_all_users()
+
+        assert [label for _, label in metrics.slow_queries] == [ALL_USERS_SQL]
+        assert 'Медленный запрос' in caplog.text
+
+    def test_uninstrumented_engine_uses_plain_connections(self, tmp_path):
+        """Test that without instrumentation nothing wraps the driver."""
+        service = DatabaseService(f'sqlite:///{tmp_path / "plain.db"}')
+
+        with service.engine.connect() as conn:
+            assert type(conn.connection.dbapi_connection) is sqlite3.Connection
+
+    def test_pure_sql_connection(self, tmp_path, metrics):
+        """Test that pure_sql statements are counted through Metrics.connect."""
+        conn, cursor = pure_sql.create_database(str(tmp_path / 'pure.db'), metrics=metrics)
+        pure_sql.add_users(cursor)
+        cursor.execute('SELECT * FROM Users')
+        rows = cursor.fetchall()
+        conn.close()
+
+        assert statement(metrics, 'SELECT * FROM Users')['rows'] == len(rows) > 0
+
+
+class TestServiceMetrics:
+    """Test cases for per-method latency histograms."""
+
+    def test_method_histograms(self, db_service, metrics):
+        """Test that public methods are timed, generators until exhausted."""
+        user_service = UserService(db_service)
+        instrument_service(user_service, metrics)
+
+        user_service.get_all_users()
+        user_service.get_all_users()
+        list(user_service.create_users([UserCreate(username='carol', email='c@example.com')]))
+
+        methods = metrics.snapshot()['methods']
+        assert methods['UserService.get_all_users']['count'] == 2
+        assert methods['UserService.create_users']['count'] == 1
+        assert methods['UserService.get_all_users']['buckets'][-1] == (float('inf'), 2)
+
+    def test_returned_generator_timed_until_exhausted(self, db_service, metrics):
+        """Test that methods returning a generator, like iter_all_messages, time the iteration."""
+        message_service = MessageService(db_service)
+        message_service.create_message(MessageCreate(user_id=1, message_text='hi'))
+        instrument_service(message_service, metrics)
+
+        stream = message_service.iter_all_messages()
+        assert 'MessageService.iter_all_messages' not in metrics.snapshot()['methods']
+        assert [m.message_text for m in stream] == ['hi']
+
+        assert metrics.snapshot()['methods']['MessageService.iter_all_messages']['count'] == 1
+
+    def test_coroutine_timed_until_awaited(self, db_service, metrics):
+        """Test that coroutine methods, like subscribe_async, time the await, not the call."""
+        message_service = MessageService(db_service)
+        instrument_service(message_service, metrics)
+
+        waiting = message_service.subscribe_async(timeout=0.2, poll_interval=0.05)
+        assert 'MessageService.subscribe_async' not in metrics.snapshot()['methods']
+        assert asyncio.run(waiting).items == []
+
+        timing = metrics.snapshot()['methods']['MessageService.subscribe_async']
+        assert timing['count'] == 1
+        assert timing['sum'] >= 0.2
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test Prometheus-style cumulative buckets with inclusive bounds."""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        assert histogram.cumulative() == [(0.1, 2), (1.0, 3), (float('inf'), 4)]
+        assert histogram.sum == pytest.approx(3.65)
+
+
+class TestPrometheusExport:
+    """Test cases for the Prometheus text exposition."""
+
+    def test_text_format(self, db_service, metrics, tmp_path):
+        """Test that counters and histograms are written to a local file."""
+        user_service = UserService(db_service)
+        instrument_service(user_service, metrics)
+        user_service.get_user_by_id(1)
+
+        path = metrics.write_prometheus(tmp_path / 'messenger.prom')
+        text = path.read_text(encoding='utf-8')
+
+        assert '# TYPE sql_statements_total counter' in text
+        assert 'sql_statements_total{statement="SELECT users.id' in text
+        bucket = 'service_method_seconds_bucket{method="UserService.get_user_by_id",le="+Inf"} 1'
+        assert bucket in text
+        assert 'service_method_seconds_count{method="UserService.get_user_by_id"} 1' in text
+        assert not list(tmp_path.glob('.*.tmp'))
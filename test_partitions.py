@@ -0,0 +1,181 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from pydantic_sqlalchemy import DatabaseService, MessageService, UserCreate, UserService
+from pydantic_sqlalchemy.__main__ import main
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.partitions import MessageArchive, attached
+from pydantic_sqlalchemy.testing import QueryCounter
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing two users with messages from January to April 2024."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    users = UserService(service)
+    users.create_user(UserCreate(username='alice123', email='alice@example.com'))
+    users.create_user(UserCreate(username='bob456', email='bob@example.com'))
+    with service.get_session() as session:
+        for month in range(1, 5):
+            for day in range(1, 4):
+                session.add_all(
+                    Message(
+                        user_id=user_id,
+                        message_text=f'{month}/{day} from {user_id}',
+                        created_at=datetime(2024, month, day, user_id),
+                    )
+                    for user_id in (1, 2)
+                )
+        session.commit()
+    return service
+
+
+@pytest.fixture
+def archive(db_service, tmp_path):
+    return MessageArchive(db_service, tmp_path / 'archive')
+
+
+@pytest.fixture
+def message_service(db_service, archive):
+    return MessageService(db_service, archive=archive)
+
+
+def hot_count(db_service) -> int:
+    with db_service.engine.connect() as connection:
+        return connection.execute(text('SELECT COUNT(*) FROM messages')).scalar()
+
+
+class TestArchive:
+    """Test cases for moving closed months into read-only partition files."""
+
+    def test_moves_closed_months(self, db_service, archive):
+        """Test that whole months before the cutoff leave the hot table."""
+        partitions = archive.archive(before=datetime(2024, 3, 15))
+
+        assert [p.name for p in partitions] == ['messages_2024_01', 'messages_2024_02']
+        assert [p.row_count for p in partitions] == [6, 6]
+        assert hot_count(db_service) == 12
+
+    def test_partition_files_are_read_only(self, db_service, archive):
+        """Test that partitions are attached read-only for queries."""
+        partition = archive.archive(before=datetime(2024, 2, 1))[0]
+
+        with db_service.engine.connect() as connection:
+            with pytest.raises(OperationalError, match='readonly'):
+                with attached(connection, partition.path):
+                    connection.execute(text('DELETE FROM archive.messages'))
+
+    def test_connection_writable_after_read_only_attach(self, db_service, archive):
+        """Test that the read-only guard is lifted when the partition is detached."""
+        partition = archive.archive(before=datetime(2024, 2, 1))[0]
+
+        with db_service.engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                with attached(connection, partition.path):
+                    connection.execute(text('DELETE FROM messages'))
+            with attached(connection, partition.path):
+                pass
+
+            assert connection.exec_driver_sql('PRAGMA query_only').scalar() == 0
+            connection.execute(text('DELETE FROM messages'))
+            connection.commit()
+
+        assert hot_count(db_service) == 0
+
+    def test_late_messages_are_appended(self, db_service, archive):
+        """Test that re-archiving adds late rows to an existing partition."""
+        archive.archive(before=datetime(2024, 2, 1))
+        with db_service.get_session() as session:
+            session.add(Message(user_id=1, message_text='late', created_at=datetime(2024, 1, 20)))
+            session.commit()
+
+        partitions = archive.archive(before=datetime(2024, 2, 1))
+
+        assert partitions[0].row_count == 7
+        assert hot_count(db_service) == 18
+
+    def test_archive_requires_directory(self, db_service):
+        """Test that archiving without a directory is rejected."""
+        with pytest.raises(ValueError):
+            MessageArchive(db_service).archive(before=datetime(2024, 2, 1))
+
+
+class TestPartitionedReads:
+    """Test cases for reads spanning the hot table and archived partitions."""
+
+    def test_user_messages_span_partitions(self, message_service, archive):
+        """Test that archived messages are still returned, in order."""
+        before = message_service.get_user_messages(1)
+
+        archive.archive(before=datetime(2024, 3, 1))
+
+        assert message_service.get_user_messages(1) == before
+        assert len(before) == 12
+
+    def test_time_range_prunes_partitions(self, db_service, message_service, archive):
+        """Test that only partitions overlapping the range are attached."""
+        archive.archive(before=datetime(2024, 4, 1))
+
+        with QueryCounter(db_service.engine) as counter:
+            result = message_service.get_user_messages(
+                2, since=datetime(2024, 2, 2), until=datetime(2024, 3, 3)
+            )
+
+        attaches = [s for s in counter.statements if s.startswith('ATTACH')]
+        assert len(attaches) == 2
+        assert [m.message_text for m in result] == [
+            '2/2 from 2',
+            '2/3 from 2',
+            '3/1 from 2',
+            '3/2 from 2',
+        ]
+
+    def test_hot_range_without_archive(self, db_service):
+        """Test time-range reads on a service without an archive."""
+        result = MessageService(db_service).get_user_messages(1, since=datetime(2024, 4, 2))
+
+        assert [m.message_text for m in result] == ['4/2 from 1', '4/3 from 1']
+
+    def test_stats_survive_archive_and_rebuild(self, message_service, archive):
+        """Test that materialized stats keep counting archived messages."""
+        before = [tuple(row) for row in message_service.get_conversation_stats()]
+
+        archive.archive(before=datetime(2024, 4, 1))
+        assert [tuple(row) for row in message_service.get_conversation_stats()] == before
+
+        message_service.rebuild_conversation_stats()
+        assert [tuple(row) for row in message_service.get_conversation_stats()] == before
+
+    def test_stats_for_time_range(self, message_service, archive):
+        """Test ranged stats across the hot table and one partition."""
+        archive.archive(before=datetime(2024, 3, 1))
+
+        stats = message_service.get_conversation_stats(
+            since=datetime(2024, 2, 3), until=datetime(2024, 3, 2)
+        )
+
+        assert stats == [
+            ('alice123', 2, datetime(2024, 3, 1, 1)),
+            ('bob456', 2, datetime(2024, 3, 1, 2)),
+        ]
+
+    def test_cli(self, db_service, tmp_path):
+        """Test that the archive command moves months into the given directory."""
+        main(
+            [
+                '--database-url',
+                str(db_service.engine.url),
+                'archive',
+                '--before',
+                '2024-02-10',
+                '--directory',
+                str(tmp_path / 'cli'),
+            ]
+        )
+
+        assert (tmp_path / 'cli' / 'messages_2024_01.db').exists()
+        assert hot_count(db_service) == 18
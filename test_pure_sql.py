@@ -0,0 +1,148 @@
+import pytest
+
+import pure_sql
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Fixture providing a connection and cursor to a fresh pure_sql database."""
+    conn, cursor = pure_sql.create_database(str(tmp_path / 'messenger.db'))
+    yield conn, cursor
+    conn.close()
+
+
+@pytest.fixture
+def filled(db):
+    """Fixture providing the demo users and messages."""
+    conn, cursor = db
+    pure_sql.add_users(cursor)
+    pure_sql.add_messages(cursor)
+    conn.commit()
+    return conn, cursor
+
+
+class TestUserMessageStats:
+    """Test cases for trigger-maintained message statistics."""
+
+    def test_stats_follow_inserts_and_deletes(self, filled):
+        """Test that triggers keep counts in step with Messages."""
+        conn, cursor = filled
+        cursor.execute("DELETE FROM Messages WHERE message_text = 'Я за пиццу! 🍕'")
+
+        cursor.execute(
+            'SELECT u.username, s.message_count FROM UserMessageStats s '
+            'JOIN Users u ON u.id = s.user_id ORDER BY u.username'
+        )
+
+        assert cursor.fetchall() == [('alice123', 3), ('bob456', 1)]
+
+    def test_stats_follow_reassignment(self, filled):
+        """Test that moving a message to another user moves its count and last time."""
+        conn, cursor = filled
+        cursor.execute(
+            "UPDATE Messages SET user_id = 2, created_at = '2030-01-01 00:00:00' "
+            "WHERE message_text = 'Отлично! Заказываем!'"
+        )
+
+        cursor.execute(
+            'SELECT u.username, s.message_count, s.last_message_at FROM UserMessageStats s '
+            'JOIN Users u ON u.id = s.user_id ORDER BY u.username'
+        )
+        rows = cursor.fetchall()
+        cursor.execute(
+            'SELECT u.username, COUNT(*), MAX(m.created_at) FROM Messages m '
+            'JOIN Users u ON u.id = m.user_id GROUP BY u.username ORDER BY u.username'
+        )
+
+        assert rows == cursor.fetchall()
+        assert rows[1][1:] == (3, '2030-01-01 00:00:00')
+
+    def test_rebuild(self, filled):
+        """Test that a rebuild restores counts from Messages."""
+        conn, cursor = filled
+        cursor.execute('UPDATE UserMessageStats SET message_count = 0')
+
+        pure_sql.rebuild_user_message_stats(cursor)
+
+        cursor.execute('SELECT SUM(message_count) FROM UserMessageStats')
+        assert cursor.fetchone() == (5,)
+
+    def test_backfill_on_existing_database(self, tmp_path, filled):
+        """Test that reopening a database without the stats table backfills it."""
+        conn, cursor = filled
+        cursor.execute('DROP TABLE UserMessageStats')
+        conn.commit()
+
+        conn2, cursor2 = pure_sql.create_database(str(tmp_path / 'messenger.db'))
+        cursor2.execute('SELECT SUM(message_count) FROM UserMessageStats')
+
+        assert cursor2.fetchone() == (5,)
+        conn2.close()
+
+
+class TestLatestMessagesPerUser:
+    """Test cases for the indexed latest-messages-per-user query."""
+
+    def test_latest_message_per_user(self, filled):
+        """Test that exactly one latest message is returned per user despite equal timestamps."""
+        conn, cursor = filled
+
+        rows = pure_sql.latest_messages_per_user(cursor)
+
+        assert [(username, text) for username, text, _ in rows] == [
+            ('alice123', 'Отлично! Заказываем!'),
+            ('bob456', 'Я за пиццу! 🍕'),
+        ]
+
+    def test_latest_n_messages(self, filled):
+        """Test that up to N messages per user are returned newest first."""
+        conn, cursor = filled
+
+        rows = pure_sql.latest_messages_per_user(cursor, limit=2)
+
+        assert [text for _, text, _ in rows] == [
+            'Отлично! Заказываем!',
+            'Кто хочет пиццы? 🍕',
+            'Я за пиццу! 🍕',
+            'Привет, Элис! У меня все отлично!',
+        ]
+
+    def test_query_plan_avoids_full_scan(self, filled):
+        """Test that Messages is only searched through indexes."""
+        conn, cursor = filled
+
+        cursor.execute(f'EXPLAIN QUERY PLAN {pure_sql.LATEST_MESSAGES_PER_USER_SQL}', (1,))
+        plan = [row[-1] for row in cursor.fetchall()]
+
+        # Messages читается и под псевдонимом m, и без него - в подзапросе
+        scanned = {step.split()[1].lower() for step in plan if step.startswith('SCAN ')}
+        assert not scanned & {'m', 'messages'}, plan
+        assert any('idx_messages_user_created' in step for step in plan)
+
+
+class TestSearchMessages:
+    """Test cases for FTS5 search over the raw schema."""
+
+    def test_search_ranks_and_highlights(self, filled):
+        """Test that matches come back with highlighted snippets."""
+        conn, cursor = filled
+
+        rows = pure_sql.search_messages(cursor, 'пиццу')
+
+        assert [(username, snippet) for username, _, snippet, _ in rows] == [
+            ('bob456', 'Я за [пиццу]! 🍕')
+        ]
+
+    def test_index_follows_deletes(self, filled):
+        """Test that deleted messages disappear from the index."""
+        conn, cursor = filled
+        cursor.execute("DELETE FROM Messages WHERE message_text LIKE 'Я за%'")
+
+        assert pure_sql.search_messages(cursor, 'пиццу') == []
+
+    def test_operators_are_treated_as_text(self, filled):
+        """Test that FTS5 syntax in the query does not raise."""
+        conn, cursor = filled
+
+        assert pure_sql.search_messages(cursor, 'AND "OR (') == []
+        assert pure_sql.search_messages(cursor, '   ') == []
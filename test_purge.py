@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, text
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageService,
+    RoomService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.cache import UserCache
+from pydantic_sqlalchemy.metrics import Metrics
+from pydantic_sqlalchemy.models import Message, RoomMember, UserMessageStats
+from pydantic_sqlalchemy.purge import PurgeService
+from pydantic_sqlalchemy.schemas import RoomCreate
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing two users with ten messages each, one per day, alice in a room."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    users = UserService(service)
+    users.create_user(UserCreate(username='alice123', email='alice@example.com'))
+    users.create_user(UserCreate(username='bob456', email='bob@example.com'))
+    rooms = RoomService(service)
+    rooms.create_room(RoomCreate(name='general'))
+    rooms.join_room(1, 1)
+    with service.get_session() as session:
+        session.add_all(
+            Message(user_id=user_id, message_text=f'пицца {i}', created_at=START + timedelta(i))
+            for user_id in (1, 2)
+            for i in range(10)
+        )
+        session.commit()
+    return service
+
+
+def count(db_service, stmt) -> int:
+    with db_service.get_session() as session:
+        return session.execute(stmt).scalar_one()
+
+
+class TestPurgeUser:
+    """Test cases for deleting a user together with all of their messages."""
+
+    def test_deletes_in_chunks(self, db_service):
+        """Test that messages go in bounded chunks and derived data follows."""
+        progress = []
+        purge = PurgeService(db_service, chunk_size=3, pause=0, on_progress=progress.append)
+
+        result = purge.purge_user(1)
+
+        assert (result.deleted_messages, result.deleted_users, result.chunks) == (10, 1, 4)
+        assert [p.deleted_messages for p in progress] == [3, 6, 9, 10]
+        assert UserService(db_service).get_user_by_id(1) is None
+        assert count(db_service, select(func.count()).select_from(RoomMember)) == 0
+        assert count(db_service, select(func.count(UserMessageStats.user_id))) == 1
+        found = MessageService(db_service).search('пицца')
+        assert {r.message.user.username for r in found} == {'bob456'}
+        assert len(MessageService(db_service).tail(0).items) == 10
+
+    def test_message_written_during_purge(self, db_service):
+        """Test that a message arriving after the last chunk is deleted with the user."""
+        messages = MessageService(db_service)
+
+        def write_late(progress):
+            if progress.deleted_messages == 10:
+                with db_service.get_session() as session:
+                    session.add(Message(user_id=1, message_text='поздно', created_at=START))
+                    session.commit()
+
+        purge = PurgeService(db_service, chunk_size=3, pause=0, on_progress=write_late)
+
+        result = purge.purge_user(1)
+
+        assert result.deleted_messages == 11
+        assert messages.get_user_messages(1) == []
+        assert count(db_service, select(func.count(Message.id)).where(Message.user_id == 1)) == 0
+
+    def test_cache_invalidated_before_purge(self, db_service):
+        """Test that the cached user is dropped before the first chunk."""
+        cache = UserCache()
+        UserService(db_service, cache).get_user_by_id(1)
+        seen = []
+        purge = PurgeService(
+            db_service,
+            chunk_size=3,
+            pause=0,
+            user_cache=cache,
+            on_progress=lambda _: seen.append(cache.get_by_id(1)),
+        )
+
+        purge.purge_user(1)
+
+        assert seen == [None] * 4
+
+    def test_invalidates_cache(self, db_service):
+        """Test that a cached user is not served after deletion."""
+        cache = UserCache()
+        users = UserService(db_service, cache)
+        users.get_user_by_username('alice123')
+
+        users.delete_user(1)
+
+        assert users.get_user_by_id(1) is None
+        assert users.get_user_by_username('alice123') is None
+
+    def test_unknown_user(self, db_service):
+        """Test that deleting a missing user is an error."""
+        with pytest.raises(ValueError):
+            UserService(db_service).delete_user(99)
+
+
+class TestRetention:
+    """Test cases for deleting expired messages."""
+
+    def test_purge_before_cutoff(self, db_service):
+        """Test that only messages older than the cutoff are deleted, stats included."""
+        result = PurgeService(db_service, chunk_size=4, pause=0).purge_messages_before(
+            START + timedelta(3)
+        )
+
+        assert result.deleted_messages == 6
+        assert count(db_service, select(func.min(Message.created_at))) == START + timedelta(3)
+        stats = MessageService(db_service).get_conversation_stats()
+        assert [row.message_count for row in stats] == [7, 7]
+
+    def test_apply_retention_records_metrics(self, db_service):
+        """Test max_age relative to now and the per-chunk histogram."""
+        metrics = Metrics(slow_threshold=None)
+        purge = PurgeService(db_service, chunk_size=5, pause=0, metrics=metrics)
+
+        result = purge.apply_retention(timedelta(days=2), now=START + timedelta(10))
+
+        assert result.deleted_messages == 16
+        assert result.max_chunk_seconds <= result.seconds
+        assert metrics.snapshot()['methods']['PurgeService.chunk']['count'] == result.chunks
+
+
+class TestIncrementalVacuum:
+    """Test cases for returning freed pages to the file system."""
+
+    def test_requires_incremental_mode(self, db_service):
+        """Test that incremental vacuum refuses to silently do nothing."""
+        with pytest.raises(ValueError, match='enable_incremental_vacuum'):
+            PurgeService(db_service).incremental_vacuum()
+
+    def test_frees_pages_in_steps(self, db_service):
+        """Test that pages freed by a purge are released up to max_pages per call."""
+        purge = PurgeService(db_service, pause=0)
+        purge.enable_incremental_vacuum()
+        with db_service.engine.begin() as conn:
+            conn.execute(text('UPDATE messages SET message_text = :pad'), {'pad': 'x' * 4000})
+        purge.purge_messages_before(START + timedelta(100))
+
+        with db_service.engine.connect() as conn:
+            free = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+        assert free > 2
+
+        assert purge.incremental_vacuum(pages_per_step=1, max_pages=2) == 2
+        assert purge.incremental_vacuum() == free - 2
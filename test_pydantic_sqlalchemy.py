@@ -0,0 +1,508 @@
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    EngineProfile,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.repositories import (
+    SQLiteMessageRepository,
+    keyset_select,
+    latest_per_user_select,
+)
+from pydantic_sqlalchemy.schemas import MessagePage, MessageResponse
+from pydantic_sqlalchemy.testing import QueryCounter, assert_max_queries, assert_no_full_scan
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing a fresh database with created tables."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    return service
+
+
+@pytest.fixture
+def user_service(db_service):
+    return UserService(db_service)
+
+
+@pytest.fixture
+def message_service(db_service):
+    return MessageService(db_service)
+
+
+@pytest.fixture
+def users(user_service):
+    """Fixture providing two created users."""
+    return [
+        user_service.create_user(UserCreate(username='alice123', email='alice@example.com')),
+        user_service.create_user(UserCreate(username='bob456', email='bob@example.com')),
+    ]
+
+
+class TestCreateMessages:
+    """Test cases for bulk message ingestion."""
+
+    def test_returns_responses_in_input_order(self, message_service, users):
+        """Test that responses follow the input order and carry user info."""
+        alice, bob = users
+        data = [
+            MessageCreate(user_id=alice.id if i % 2 else bob.id, message_text=f'msg {i}')
+            for i in range(25)
+        ]
+
+        result = message_service.create_messages(data, batch_size=10)
+
+        assert [m.message_text for m in result] == [m.message_text for m in data]
+        assert [m.user.username for m in result[:2]] == ['bob456', 'alice123']
+        assert len({m.id for m in result}) == 25
+        assert len(message_service.get_all_messages()) == 25
+
+    def test_return_ids(self, message_service, users):
+        """Test that only IDs are returned when requested."""
+        data = [MessageCreate(user_id=users[0].id, message_text='hi')] * 3
+
+        ids = message_service.create_messages(data, return_ids=True)
+
+        assert ids == sorted(ids)
+        assert all(isinstance(i, int) for i in ids)
+
+    def test_unknown_user_rejects_batch(self, message_service, users):
+        """Test that a batch with a missing user is not written."""
+        data = [
+            MessageCreate(user_id=users[0].id, message_text='ok'),
+            MessageCreate(user_id=999, message_text='lost'),
+        ]
+
+        with pytest.raises(ValueError, match='999'):
+            message_service.create_messages(data, batch_size=1)
+
+        assert [m.message_text for m in message_service.get_all_messages()] == ['ok']
+
+    def test_invalid_batch_size(self, message_service):
+        """Test that a non-positive batch size is rejected."""
+        with pytest.raises(ValueError):
+            message_service.create_messages([], batch_size=0)
+
+
+class TestCreateUsers:
+    """Test cases for bulk user import."""
+
+    def test_reports_duplicates_per_row(self, user_service, users):
+        """Test that duplicates in the database and inside the input are reported."""
+        data = [
+            UserCreate(username='carol', email='carol@example.com'),
+            UserCreate(username='alice123', email='new@example.com'),
+            UserCreate(username='dave', email='bob@example.com'),
+            UserCreate(username='carol', email='carol@example.com'),
+            UserCreate(username='erin', email='erin@example.com'),
+        ]
+
+        results = list(user_service.create_users(data, batch_size=2))
+
+        assert [r.index for r in results] == [0, 1, 2, 3, 4]
+        assert [r.created for r in results] == [True, False, False, False, True]
+        assert results[1].error is not None
+        assert results[4].user.username == 'erin'
+        assert len(user_service.get_all_users()) == 4
+
+    @pytest.mark.parametrize('on_conflict_do_nothing', [False, True])
+    def test_streams_results(self, user_service, on_conflict_do_nothing):
+        """Test that results are yielded lazily batch by batch."""
+        data = (UserCreate(username=f'user{i}', email=f'user{i}@example.com') for i in range(5))
+
+        results = user_service.create_users(
+            data, batch_size=2, on_conflict_do_nothing=on_conflict_do_nothing
+        )
+
+        first = next(results)
+        assert first.created and first.user.username == 'user0'
+        assert len(user_service.get_all_users()) == 2
+        assert sum(r.created for r in results) == 4
+
+
+@pytest.fixture
+def messages(message_service, users):
+    """Fixture providing 30 messages alternating between two users."""
+    alice, bob = users
+    return message_service.create_messages(
+        MessageCreate(user_id=(alice.id, bob.id)[i % 2], message_text=f'msg {i}')
+        for i in range(30)
+    )
+
+
+class TestKeysetPagination:
+    """Test cases for streaming and cursor-paginated message reads."""
+
+    def test_iter_all_messages_matches_full_list(self, message_service, messages):
+        """Test that streaming across many pages yields every message once in order."""
+        streamed = list(message_service.iter_all_messages(page_size=7, yield_per=3))
+
+        assert streamed == message_service.get_all_messages()
+        assert [m.id for m in streamed] == [m.id for m in messages]
+
+    def test_iter_user_messages(self, message_service, users, messages):
+        """Test that per-user streaming only returns that user's messages."""
+        streamed = list(message_service.iter_user_messages(users[1].id, page_size=4))
+
+        assert streamed == message_service.get_user_messages(users[1].id)
+        assert len(streamed) == 15
+
+    def test_pages_chain_through_cursor(self, message_service, messages):
+        """Test that following next_cursor walks the table exactly once."""
+        seen, cursor = [], None
+        while True:
+            page = message_service.get_messages_page(limit=8, cursor=cursor)
+            seen.extend(m.id for m in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert seen == [m.id for m in messages]
+
+    def test_iter_resumes_from_cursor(self, message_service, messages):
+        """Test that a page cursor can resume a stream."""
+        page = message_service.get_messages_page(limit=10)
+
+        rest = list(message_service.iter_all_messages(cursor=page.next_cursor))
+
+        assert [m.id for m in rest] == [m.id for m in messages[10:]]
+
+    def test_invalid_cursor(self, message_service):
+        """Test that a malformed cursor raises ValueError."""
+        with pytest.raises(ValueError):
+            message_service.get_messages_page(cursor='not-a-cursor')
+
+    @pytest.mark.parametrize('limit', [0, -1])
+    def test_invalid_page_limit(self, message_service, messages, limit):
+        """Test that a non-positive page size raises ValueError."""
+        with pytest.raises(ValueError):
+            message_service.get_messages_page(limit=limit)
+
+
+class TestQueryCount:
+    """Test cases guarding message reads against N+1 user loads."""
+
+    def test_get_all_messages_single_query(self, db_service, message_service, messages):
+        """Test that listing messages loads users in the same query."""
+        with assert_max_queries(db_service.engine, 1):
+            result = message_service.get_all_messages()
+            assert {m.user.username for m in result} == {'alice123', 'bob456'}
+
+    def test_get_user_messages_single_query(self, db_service, message_service, users, messages):
+        """Test that per-user listing loads users in the same query."""
+        with assert_max_queries(db_service.engine, 1):
+            message_service.get_user_messages(users[0].id)
+
+    def test_iter_one_query_per_page(self, db_service, message_service, messages):
+        """Test that streaming issues one query per page."""
+        with assert_max_queries(db_service.engine, 4):
+            assert len(list(message_service.iter_all_messages(page_size=10))) == 30
+
+    def test_create_message_does_not_reload_user(self, db_service, message_service, users):
+        """Test that creating a message does not reload the user after commit."""
+        with assert_max_queries(db_service.engine, 2):
+            message_service.create_message(MessageCreate(user_id=users[0].id, message_text='hi'))
+
+    def test_assert_max_queries_reports_statements(self, db_service, user_service, users):
+        """Test that exceeding the limit fails with the executed statements."""
+        with pytest.raises(AssertionError, match='SELECT'):
+            with assert_max_queries(db_service.engine, 0):
+                user_service.get_all_users()
+
+
+class TestEngineProfile:
+    """Test cases for engine pool and pragma configuration."""
+
+    def test_default_profile_applies_pragmas(self, db_service):
+        """Test that every pooled connection gets the tuned pragmas."""
+        with db_service.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert conn.execute(text('PRAGMA cache_size')).scalar() == -64000
+
+    def test_untuned_profile_keeps_defaults(self, tmp_path):
+        """Test that the untuned profile leaves SQLite defaults alone."""
+        service = DatabaseService(f'sqlite:///{tmp_path / "plain.db"}', EngineProfile.untuned())
+
+        with service.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
+
+    def test_pool_sized_for_workers(self, tmp_path):
+        """Test that the pool is sized from the worker count."""
+        service = DatabaseService(
+            f'sqlite:///{tmp_path / "pool.db"}', EngineProfile.for_workers(3)
+        )
+
+        assert service.engine.pool.size() == 3
+
+
+class TestReadWriteSplit:
+    """Test cases for routing reads and writes to separate engines."""
+
+    @pytest.fixture
+    def split_service(self, tmp_path):
+        service = DatabaseService(f'sqlite:///{tmp_path / "split.db"}', split_reads=True)
+        service.create_tables()
+        yield service
+        service.dispose()
+
+    def test_single_writer_connection(self, split_service):
+        """Test that writes are serialized through a one-connection pool."""
+        assert split_service.engine.pool.size() == 1
+        assert split_service.read_engine is not split_service.engine
+
+    def test_read_connections_are_read_only(self, split_service):
+        """Test that the reader pool cannot modify the database."""
+        with split_service.read_engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            with pytest.raises(OperationalError, match='readonly'):
+                conn.execute(text("INSERT INTO users (username, email) VALUES ('x', 'x@x.io')"))
+
+    def test_session_routes_statements(self, split_service):
+        """Test that selects go to readers and writes go to the writer."""
+        user_service = UserService(split_service)
+        message_service = MessageService(split_service)
+        user = user_service.create_user(UserCreate(username='alice123', email='alice@example.com'))
+
+        with QueryCounter(split_service.engine) as writes:
+            with QueryCounter(split_service.read_engine) as reads:
+                message_service.create_message(MessageCreate(user_id=user.id, message_text='Hi'))
+                messages = message_service.get_user_messages(user.id)
+
+        assert [m.message_text for m in messages] == ['Hi']
+        assert all(s.startswith('INSERT') for s in writes.statements)
+        assert all(s.startswith('SELECT') for s in reads.statements)
+
+    def test_session_reads_own_writes(self, split_service):
+        """Test that reads after a flush see uncommitted rows via the writer."""
+        UserService(split_service).create_user(
+            UserCreate(username='alice123', email='alice@example.com')
+        )
+
+        with split_service.get_session() as session:
+            session.add(Message(user_id=1, message_text='draft'))
+            session.flush()
+            assert session.execute(select(func.count(Message.id))).scalar() == 1
+            session.rollback()
+            assert session.execute(select(func.count(Message.id))).scalar() == 0
+
+    def test_in_memory_database_rejected(self):
+        """Test that splitting a private in-memory database is refused."""
+        with pytest.raises(ValueError):
+            DatabaseService('sqlite:///:memory:', split_reads=True)
+
+
+class TestConversationStats:
+    """Test cases for the materialized per-user message statistics."""
+
+    def test_stats_follow_inserts(self, message_service, users, messages):
+        """Test that counts and last message time are kept by triggers."""
+        stats = message_service.get_conversation_stats()
+
+        assert [(row.username, row.message_count) for row in stats] == [
+            ('alice123', 15),
+            ('bob456', 15),
+        ]
+        assert stats[0].last_message == messages[-2].created_at
+        assert stats[1].last_message == messages[-1].created_at
+
+    def test_stats_follow_deletes(self, db_service, message_service, users, messages):
+        """Test that deleting the latest message rolls last_message back."""
+        with db_service.engine.begin() as conn:
+            conn.execute(text('DELETE FROM messages WHERE id = :id'), {'id': messages[-1].id})
+
+        stats = {row.username: row for row in message_service.get_conversation_stats()}
+
+        assert stats['bob456'].message_count == 14
+        assert stats['bob456'].last_message == messages[-3].created_at
+        assert stats['alice123'].message_count == 15
+
+    def test_user_without_messages(self, user_service, message_service, users):
+        """Test that users without messages are reported with zero count."""
+        stats = message_service.get_conversation_stats()
+
+        assert [(row.message_count, row.last_message) for row in stats] == [(0, None)] * 2
+
+    def test_rebuild_and_backfill(self, db_service, message_service, messages):
+        """Test that stats are rebuilt and backfilled for a freshly added table."""
+        expected = message_service.get_conversation_stats()
+        with db_service.engine.begin() as conn:
+            conn.execute(text('DROP TABLE user_message_stats'))
+
+        db_service.create_tables()
+        assert message_service.get_conversation_stats() == expected
+
+        with db_service.engine.begin() as conn:
+            conn.execute(text('UPDATE user_message_stats SET message_count = 0'))
+        message_service.rebuild_conversation_stats()
+        assert message_service.get_conversation_stats() == expected
+
+    def test_stats_read_skips_messages_table(self, db_service, message_service, messages):
+        """Test that the stats query does not touch the messages table."""
+        with assert_max_queries(db_service.engine, 1) as counter:
+            message_service.get_conversation_stats()
+
+        assert 'messages' not in counter.statements[0].replace('user_message_stats', '')
+
+
+class TestLatestMessagesPerUser:
+    """Test cases for the latest-N-messages-per-user query."""
+
+    def test_latest_n_per_user(self, message_service, users, messages):
+        """Test that each user gets their newest messages first."""
+        latest = message_service.get_latest_messages_per_user(limit=2)
+
+        assert [m.message_text for m in latest] == ['msg 28', 'msg 26', 'msg 29', 'msg 27']
+        assert [m.user.username for m in latest] == ['alice123'] * 2 + ['bob456'] * 2
+
+    def test_query_plan_avoids_full_scan(self, db_service):
+        """Test that messages are reached through the (user_id, created_at) index."""
+        plan = assert_no_full_scan(
+            db_service.engine, latest_per_user_select(5), 'messages'
+        )
+
+        assert any('ix_messages_user_id_created_at' in step for step in plan)
+
+    def test_user_page_uses_composite_index(self, db_service):
+        """Test that per-user keyset pages do not scan messages."""
+        assert_no_full_scan(
+            db_service.engine, keyset_select(1, None, 50), 'messages'
+        )
+
+    def test_invalid_limit(self, message_service):
+        """Test that a non-positive limit is rejected."""
+        with pytest.raises(ValueError):
+            message_service.get_latest_messages_per_user(limit=0)
+
+
+class TestSQLiteMessageRepository:
+    """Test cases for the raw sqlite3 read path."""
+
+    @pytest.fixture
+    def raw_service(self, db_service):
+        return MessageService(db_service, repository=SQLiteMessageRepository(db_service))
+
+    def test_reads_match_orm(self, message_service, raw_service, users, messages):
+        """Test that both repositories return identical responses."""
+        assert raw_service.get_all_messages() == message_service.get_all_messages()
+        assert raw_service.get_user_messages(users[1].id) == message_service.get_user_messages(
+            users[1].id
+        )
+        assert raw_service.get_latest_messages_per_user(
+            3
+        ) == message_service.get_latest_messages_per_user(3)
+
+    def test_pages_match_orm(self, message_service, raw_service, users, messages):
+        """Test that keyset pages and cursors are interchangeable between backends."""
+        orm_page = message_service.get_messages_page(limit=7, user_id=users[0].id)
+        raw_page = raw_service.get_messages_page(limit=7, user_id=users[0].id)
+        assert raw_page == orm_page
+
+        next_raw = raw_service.get_messages_page(limit=7, cursor=orm_page.next_cursor)
+        next_orm = message_service.get_messages_page(limit=7, cursor=orm_page.next_cursor)
+        assert next_raw == next_orm
+        assert list(raw_service.iter_all_messages(page_size=4, yield_per=3)) == (
+            message_service.get_all_messages()
+        )
+
+    @pytest.mark.parametrize('backend', ['orm', 'raw'])
+    def test_page_json_matches_models(self, message_service, raw_service, users, messages, backend):
+        """Test that JSON pages equal the serialized models, cursor included."""
+        service = raw_service if backend == 'raw' else message_service
+        page = message_service.get_messages_page(limit=7, user_id=users[1].id)
+
+        data = service.get_messages_page_json(limit=7, user_id=users[1].id)
+
+        assert data == page.model_dump_json().encode()
+        assert MessagePage.model_validate_json(data) == page
+
+    @pytest.mark.parametrize('limit', [0, -1])
+    def test_page_json_invalid_limit(self, raw_service, messages, limit):
+        """Test that a non-positive JSON page size raises ValueError."""
+        with pytest.raises(ValueError):
+            raw_service.get_messages_page_json(limit=limit)
+
+    def test_trusted_reads_equal_validated(self, db_service, message_service, messages):
+        """Test that trusted construction builds the same models as validation."""
+        with db_service.get_session() as session:
+            validated = [
+                MessageResponse.model_validate(msg)
+                for msg in session.execute(keyset_select(None, None, 100)).scalars()
+            ]
+
+        assert message_service.get_all_messages() == validated
+
+    def test_shares_user_response_per_query(self, raw_service, users, messages):
+        """Test that rows of one user reuse a single UserResponse."""
+        result = raw_service.get_user_messages(users[0].id)
+
+        assert len({id(m.user) for m in result}) == 1
+
+
+class TestSearch:
+    """Test cases for full-text message search."""
+
+    @pytest.fixture
+    def corpus(self, message_service, users):
+        alice, bob = users
+        return message_service.create_messages(
+            [
+                MessageCreate(user_id=alice.id, message_text='Кто хочет пиццы сегодня?'),
+                MessageCreate(user_id=bob.id, message_text='Пицца, пицца и еще раз пицца'),
+                MessageCreate(user_id=bob.id, message_text='Я за пиццу!'),
+                MessageCreate(user_id=alice.id, message_text='Заказываем пицца на вечер'),
+            ]
+        )
+
+    def test_ranked_by_bm25(self, message_service, corpus):
+        """Test that the most relevant message comes first with a snippet."""
+        results = message_service.search('пицца')
+
+        assert [r.message.id for r in results] == [corpus[1].id, corpus[3].id]
+        assert results[0].rank < results[1].rank
+        assert results[0].snippet == '[Пицца], [пицца] и еще раз [пицца]'
+        assert results[0].message.user.username == 'bob456'
+
+    def test_filter_by_user_and_limit(self, message_service, users, corpus):
+        """Test that user_id and limit narrow the results."""
+        assert [r.message.id for r in message_service.search('пицца', user_id=users[0].id)] == [
+            corpus[3].id
+        ]
+        assert len(message_service.search('пицца', limit=1)) == 1
+
+    def test_index_follows_writes(self, db_service, message_service, corpus):
+        """Test that deletes and updates are reflected in the index."""
+        with db_service.engine.begin() as conn:
+            conn.execute(text('DELETE FROM messages WHERE id = :id'), {'id': corpus[1].id})
+            conn.execute(
+                text("UPDATE messages SET message_text = 'суши' WHERE id = :id"),
+                {'id': corpus[3].id},
+            )
+
+        assert message_service.search('пицца') == []
+        assert [r.message.id for r in message_service.search('суши')] == [corpus[3].id]
+
+    def test_backfill_and_rebuild(self, db_service, message_service, corpus):
+        """Test that the index is backfilled for existing data and can be rebuilt."""
+        with db_service.engine.begin() as conn:
+            conn.execute(text('DROP TABLE messages_fts'))
+
+        db_service.create_tables()
+        assert len(message_service.search('пицца')) == 2
+
+        message_service.rebuild_search_index()
+        assert len(message_service.search('пицца')) == 2
+
+    def test_query_syntax_is_escaped(self, message_service, corpus):
+        """Test that FTS5 operators in user input are matched literally."""
+        assert message_service.search('"пицца OR') == []
+        assert message_service.search('') == []
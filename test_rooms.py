@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    RoomCreate,
+    RoomMessageCreate,
+    RoomService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.repositories import timeline_select
+from pydantic_sqlalchemy.services import decode_cursor
+from pydantic_sqlalchemy.testing import assert_no_full_scan
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing two users who both joined room 1."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    users = UserService(service)
+    users.create_user(UserCreate(username='alice123', email='alice@example.com'))
+    users.create_user(UserCreate(username='bob456', email='bob@example.com'))
+    rooms = RoomService(service)
+    rooms.create_room(RoomCreate(name='general'))
+    rooms.create_room(RoomCreate(name='random'))
+    for user_id in (1, 2):
+        rooms.join_room(1, user_id)
+    return service
+
+
+@pytest.fixture
+def room_service(db_service):
+    return RoomService(db_service)
+
+
+@pytest.fixture
+def messages(db_service):
+    """Fixture providing five messages in room 1 and one in room 2, a minute apart."""
+    start = datetime(2024, 1, 1)
+    with db_service.get_session() as session:
+        session.add_all(
+            Message(
+                user_id=1 + i % 2,
+                room_id=1 if i < 5 else 2,
+                message_text=f'm{i}',
+                created_at=start + timedelta(minutes=i),
+            )
+            for i in range(6)
+        )
+        session.commit()
+
+
+class TestRooms:
+    """Test cases for creating rooms and posting into them."""
+
+    def test_duplicate_room_name(self, room_service):
+        """Test that room names are unique."""
+        with pytest.raises(ValueError):
+            room_service.create_room(RoomCreate(name='general'))
+
+    def test_join_is_idempotent(self, room_service, messages):
+        """Test that joining twice keeps a single membership and read marker."""
+        room_service.mark_read(1, 1, message_id=3)
+        room_service.join_room(1, 1)
+
+        assert room_service.unread_count(1, 1) == 2
+
+    def test_only_members_can_post(self, room_service):
+        """Test that posting requires membership in the room."""
+        with pytest.raises(ValueError, match='не участник'):
+            room_service.post_message(RoomMessageCreate(user_id=1, room_id=2, message_text='hi'))
+        with pytest.raises(ValueError):
+            room_service.post_message(RoomMessageCreate(user_id=1, message_text='hi'))
+
+    def test_plain_messages_cannot_target_rooms(self, db_service, room_service):
+        """Test that room_id is only accepted by RoomService, not by the general writers."""
+        with pytest.raises(ValueError):
+            MessageCreate(user_id=2, room_id=1, message_text='hi')
+
+        MessageService(db_service).create_message(MessageCreate(user_id=2, message_text='hi'))
+
+        assert room_service.get_timeline(1).items == []
+
+    def test_posted_message_is_read_by_author(self, room_service):
+        """Test that authors do not see their own messages as unread."""
+        message = room_service.post_message(
+            RoomMessageCreate(user_id=1, room_id=1, message_text='hi')
+        )
+
+        assert message.user.username == 'alice123'
+        assert room_service.unread_count(1, 1) == 0
+        assert room_service.unread_count(1, 2) == 1
+
+    def test_room_messages_stay_in_global_stream(self, db_service, room_service):
+        """Test that room messages are still regular messages of the user."""
+        room_service.post_message(RoomMessageCreate(user_id=2, room_id=1, message_text='hi'))
+
+        assert [m.message_text for m in MessageService(db_service).get_user_messages(2)] == ['hi']
+
+
+class TestTimeline:
+    """Test cases for timeline pages, read markers and unread counts."""
+
+    def test_latest_messages_first(self, room_service, messages):
+        """Test that the first page holds the newest messages of the room only."""
+        page = room_service.get_timeline(1, limit=3)
+
+        assert [m.message_text for m in page.items] == ['m4', 'm3', 'm2']
+        assert decode_cursor(page.next_cursor)[1] == page.items[-1].id
+
+    def test_messages_before_cursor(self, room_service, messages):
+        """Test walking the timeline backwards until it runs out."""
+        first = room_service.get_timeline(1, limit=3)
+        second = room_service.get_timeline(1, limit=3, before=first.next_cursor)
+
+        assert [m.message_text for m in second.items] == ['m1', 'm0']
+        assert second.next_cursor is None
+
+    def test_unread_count_follows_marker(self, room_service, messages):
+        """Test counting messages after the read marker, capped at the limit."""
+        assert room_service.unread_count(1, 2) == 5
+        assert room_service.unread_count(1, 2, limit=2) == 2
+
+        room_service.mark_read(1, 2, message_id=4)
+        room_service.mark_read(1, 2, message_id=2)  # Отметка назад не двигается
+
+        assert room_service.unread_count(1, 2) == 1
+
+    def test_mark_read_checks_room(self, room_service, messages):
+        """Test that a message from another room cannot be a read marker."""
+        with pytest.raises(ValueError):
+            room_service.mark_read(1, 1, message_id=6)
+        with pytest.raises(ValueError):
+            room_service.unread_count(2, 1)
+
+    @pytest.mark.parametrize('limit', [0, -3])
+    def test_invalid_limit(self, room_service, messages, limit):
+        """Test that non-positive limits are rejected instead of lifting the cap."""
+        with pytest.raises(ValueError):
+            room_service.get_timeline(1, limit=limit)
+        with pytest.raises(ValueError):
+            room_service.unread_count(1, 2, limit=limit)
+
+    def test_timeline_uses_room_index(self, db_service):
+        """Test that timeline pages are an index range, not a scan."""
+        plan = assert_no_full_scan(
+            db_service.engine, timeline_select(1, (datetime(2024, 1, 1), 3), 50), 'messages'
+        )
+
+        assert any('ix_messages_room_id_created_at_id' in step for step in plan)
+
+
+def test_existing_database_gets_room_id(tmp_path):
+    """Test that create_tables adds room_id to a messages table created before rooms."""
+    path = tmp_path / 'old.db'
+    service = DatabaseService(f'sqlite:///{path}')
+    with service.engine.begin() as conn:
+        conn.execute(
+            text(
+                'CREATE TABLE messages (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, '
+                'message_text TEXT NOT NULL, created_at DATETIME)'
+            )
+        )
+        conn.execute(text("INSERT INTO messages (user_id, message_text) VALUES (1, 'old')"))
+
+    service.create_tables()
+
+    with service.engine.connect() as conn:
+        indexes = conn.execute(text('PRAGMA index_list(messages)')).all()
+        assert conn.execute(text('SELECT room_id FROM messages')).scalar() is None
+    assert 'ix_messages_room_id_created_at_id' in {row.name for row in indexes}
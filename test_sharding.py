@@ -0,0 +1,156 @@
+from datetime import datetime
+
+import pytest
+
+from pydantic_sqlalchemy import MessageCreate, UserCreate
+from pydantic_sqlalchemy.models import Message
+from pydantic_sqlalchemy.sharding import (
+    ShardedDatabaseService,
+    ShardedMessageService,
+    ShardedUserService,
+)
+
+NAMES = ['alice', 'bob', 'carol', 'dave', 'erin', 'frank']
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    """Fixture providing three shards with tables created."""
+    service = ShardedDatabaseService.in_directory(tmp_path / 'shards', 3)
+    service.create_tables()
+    yield service
+    service.dispose()
+
+
+@pytest.fixture
+def user_service(sharded):
+    return ShardedUserService(sharded)
+
+
+@pytest.fixture
+def message_service(sharded):
+    return ShardedMessageService(sharded)
+
+
+@pytest.fixture
+def users(user_service):
+    """Fixture providing six users spread over the shards."""
+    return [
+        user_service.create_user(UserCreate(username=name, email=f'{name}@example.com'))
+        for name in NAMES
+    ]
+
+
+class TestShardedUsers:
+    """Test cases for routing users by global ID."""
+
+    def test_users_spread_over_shards(self, sharded, users):
+        """Test that users land in several shards and IDs encode the shard."""
+        shards = {sharded.locate(user.id)[0] for user in users}
+
+        assert len(shards) > 1
+        for user in users:
+            assert sharded.locate(user.id)[0] == sharded.shard_for_username(user.username)
+
+    def test_lookup_by_id_and_username(self, user_service, users):
+        """Test that single-user reads return global IDs."""
+        for user in users:
+            assert user_service.get_user_by_id(user.id) == user
+            assert user_service.get_user_by_username(user.username) == user
+        assert user_service.get_user_by_id(999) is None
+
+    def test_email_unique_across_shards(self, user_service, users):
+        """Test that an email taken in another shard is rejected."""
+        with pytest.raises(ValueError):
+            user_service.create_user(UserCreate(username='zed', email='alice@example.com'))
+
+    def test_all_users_ordered_by_id(self, user_service, users):
+        """Test that fan-out results are merged by global ID."""
+        assert user_service.get_all_users() == sorted(users, key=lambda user: user.id)
+
+
+class TestShardedMessages:
+    """Test cases for per-shard writes and merged reads."""
+
+    @pytest.fixture
+    def messages(self, sharded, users):
+        """Fixture providing 24 messages at interleaved times, written directly."""
+        for i in range(24):
+            user = users[i % len(users)]
+            shard, local_id = sharded.locate(user.id)
+            with sharded.shards[shard].get_session() as session:
+                created_at = datetime(2024, 1, 1, i)
+                session.add(Message(user_id=local_id, message_text=f'm{i}', created_at=created_at))
+                session.commit()
+
+    def test_create_routes_to_owner_shard(self, sharded, message_service, users):
+        """Test that a message is stored in its author's shard only."""
+        message = message_service.create_message(
+            MessageCreate(user_id=users[1].id, message_text='hi')
+        )
+
+        assert message.user == users[1]
+        assert sharded.locate(message.id)[0] == sharded.locate(users[1].id)[0]
+        assert message_service.get_user_messages(users[1].id) == [message]
+
+    def test_bulk_create_keeps_input_order(self, message_service, users):
+        """Test that bulk writes across shards return results in input order."""
+        data = [MessageCreate(user_id=user.id, message_text=user.username) for user in users]
+
+        created = message_service.create_messages(data)
+
+        assert [m.message_text for m in created] == NAMES
+        assert [m.user_id for m in created] == [user.id for user in users]
+
+    def test_all_messages_merged_by_time(self, message_service, messages):
+        """Test the k-way merge of all shards by created_at."""
+        texts = [m.message_text for m in message_service.get_all_messages()]
+
+        assert texts == [f'm{i}' for i in range(24)]
+
+    def test_pages_cover_every_message_once(self, sharded, message_service, users, messages):
+        """Test cursor paging across shards, including equal timestamps."""
+        for user in users:
+            shard, local_id = sharded.locate(user.id)
+            with sharded.shards[shard].get_session() as session:
+                session.add(
+                    Message(user_id=local_id, message_text='tie', created_at=datetime(2024, 1, 1))
+                )
+                session.commit()
+
+        seen, cursor = [], None
+        while True:
+            page = message_service.get_messages_page(limit=4, cursor=cursor)
+            seen += page.items
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert seen == message_service.get_all_messages()
+
+    def test_stats_and_latest_fan_out(self, message_service, users, messages):
+        """Test statistics and latest-per-user reads over all shards."""
+        stats = message_service.get_conversation_stats()
+        latest = message_service.get_latest_messages_per_user()
+
+        assert sorted(row.username for row in stats) == sorted(NAMES)
+        assert {row.message_count for row in stats} == {4}
+        assert [m.user_id for m in latest] == sorted(user.id for user in users)
+        assert {m.message_text for m in latest} == {f'm{i}' for i in range(18, 24)}
+
+    def test_rooms_are_rejected(self, message_service, users):
+        """Test that room messages are not accepted in sharded mode."""
+        with pytest.raises(ValueError):
+            message_service.create_message(
+                MessageCreate(user_id=users[0].id, room_id=1, message_text='hi')
+            )
+
+
+def test_single_shard_keeps_local_ids(tmp_path):
+    """Test that with one shard global IDs equal local IDs."""
+    sharded = ShardedDatabaseService.in_directory(tmp_path, 1)
+    sharded.create_tables()
+    user = ShardedUserService(sharded).create_user(UserCreate(username='a', email='a@example.com'))
+
+    assert user.id == 1
+    sharded.dispose()
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.__main__ import main
+from pydantic_sqlalchemy.models import Message
+
+pytest.importorskip('pyarrow')
+
+from pydantic_sqlalchemy.snapshot import Snapshot, write_snapshot  # noqa: E402
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing users with messages spread over several hours."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    users = UserService(service)
+    for name in ('alice123', 'bob456', 'carol'):
+        users.create_user(UserCreate(username=name, email=f'{name}@example.com'))
+    MessageService(service).create_messages(
+        MessageCreate(user_id=1 + i % 2, message_text=f'msg {i}') for i in range(30)
+    )
+    with service.get_session() as session:
+        for message in session.query(Message):
+            message.created_at = datetime(2024, 1, 1, message.id % 5, 30, 0, 123456)
+        session.commit()
+    return service
+
+
+@pytest.fixture(params=['arrow', 'parquet'])
+def snapshot(request, db_service, tmp_path):
+    write_snapshot(db_service, tmp_path / 'snapshot', format=request.param, batch_size=7)
+    return Snapshot.open(tmp_path / 'snapshot')
+
+
+class TestSnapshot:
+    """Test cases for the columnar analytics snapshot."""
+
+    def test_tables_round_trip(self, snapshot):
+        """Test that every row lands in the snapshot with its timestamp intact."""
+        assert snapshot.users.num_rows == 3
+        assert snapshot.messages.num_rows == 30
+        assert snapshot.messages['created_at'][0].as_py() == datetime(2024, 1, 1, 1, 30, 0, 123456)
+
+    def test_conversation_stats_match_live(self, db_service, snapshot):
+        """Test that vectorized stats equal the SQLite query, zero counts included."""
+        live = MessageService(db_service).get_conversation_stats()
+
+        assert snapshot.conversation_stats() == [tuple(row) for row in live]
+        assert snapshot.conversation_stats()[-1] == ('carol', 0, None)
+
+    def test_last_message_at(self, snapshot):
+        """Test the per-user latest timestamp."""
+        assert snapshot.last_message_at() == {
+            1: datetime(2024, 1, 1, 4, 30, 0, 123456),
+            2: datetime(2024, 1, 1, 4, 30, 0, 123456),
+        }
+
+    def test_hourly_histogram(self, snapshot):
+        """Test message counts per hour of day, overall and for one user."""
+        assert snapshot.hourly_histogram() == [6] * 5 + [0] * 19
+        assert sum(snapshot.hourly_histogram(user_id=2)) == 15
+
+    def test_cli(self, db_service, tmp_path):
+        """Test that the snapshot command writes both tables."""
+        main(['--database-url', str(db_service.engine.url), 'snapshot', str(tmp_path / 'cli')])
+
+        assert Snapshot.open(tmp_path / 'cli').messages.num_rows == 30
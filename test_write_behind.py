@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from pydantic_sqlalchemy import (
+    DatabaseService,
+    MessageCreate,
+    MessageService,
+    UserCreate,
+    UserService,
+)
+from pydantic_sqlalchemy.hot_tier import HotMessageTier
+from pydantic_sqlalchemy.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    """Fixture providing a database with one user."""
+    service = DatabaseService(f'sqlite:///{tmp_path / "messenger.db"}')
+    service.create_tables()
+    UserService(service).create_user(UserCreate(username='alice123', email='alice@example.com'))
+    return service
+
+
+@pytest.fixture
+def message_service(db_service):
+    return MessageService(db_service)
+
+
+class TestWriteBehindQueue:
+    """Test cases for write-behind message ingestion with group commit."""
+
+    def test_futures_resolve_after_group_commit(self, message_service):
+        """Test that concurrent submits are written in few batches and keep their data."""
+        with WriteBehindQueue(message_service, max_batch=50, max_delay=0.05) as writer:
+            futures = [
+                writer.submit(MessageCreate(user_id=1, message_text=f'msg {i}'))
+                for i in range(120)
+            ]
+            responses = [future.result(timeout=5) for future in futures]
+
+        assert [r.message_text for r in responses] == [f'msg {i}' for i in range(120)]
+        assert [r.user.username for r in responses[:1]] == ['alice123']
+        assert len(message_service.get_all_messages()) == 120
+        assert writer.stats()['batches'] < 120
+
+    def test_send_returns_id(self, message_service):
+        """Test the blocking convenience API."""
+        with WriteBehindQueue(message_service, max_delay=0) as writer:
+            message_id = writer.send(MessageCreate(user_id=1, message_text='hi'), timeout=5)
+
+        assert message_service.get_all_messages()[0].id == message_id
+
+    def test_unknown_user_fails_only_its_future(self, message_service):
+        """Test that a bad message does not fail the rest of its batch."""
+        with WriteBehindQueue(message_service, max_delay=0.05) as writer:
+            good = writer.submit(MessageCreate(user_id=1, message_text='ok'))
+            bad = writer.submit(MessageCreate(user_id=999, message_text='lost'))
+            writer.flush()
+
+        assert good.result().message_text == 'ok'
+        with pytest.raises(ValueError, match='999'):
+            bad.result()
+
+    def test_close_flushes_pending(self, message_service):
+        """Test that closing writes everything already accepted."""
+        writer = WriteBehindQueue(message_service, max_batch=1000, max_delay=10)
+        futures = [writer.submit(MessageCreate(user_id=1, message_text='x')) for _ in range(30)]
+
+        writer.close()
+
+        assert all(future.done() for future in futures)
+        assert len(message_service.get_all_messages()) == 30
+        with pytest.raises(RuntimeError):
+            writer.submit(MessageCreate(user_id=1, message_text='late'))
+
+    def test_backpressure(self, message_service, monkeypatch):
+        """Test that a full queue rejects submits after put_timeout."""
+        release = threading.Event()
+        writer = WriteBehindQueue(message_service, max_delay=0, max_pending=2, put_timeout=0.05)
+        original = writer._insert
+        monkeypatch.setattr(writer, '_insert', lambda *args: release.wait() and original(*args))
+
+        try:
+            # Первое сообщение занимает поток записи, еще два заполняют очередь
+            writer.submit(MessageCreate(user_id=1, message_text='1'))
+            while len(writer):
+                pass
+            writer.submit(MessageCreate(user_id=1, message_text='2'))
+            writer.submit(MessageCreate(user_id=1, message_text='3'))
+            with pytest.raises(queue.Full):
+                writer.submit(MessageCreate(user_id=1, message_text='4'))
+        finally:
+            release.set()
+            writer.close()
+
+        assert len(message_service.get_all_messages()) == 3
+
+    def test_synchronous_knob(self, db_service, message_service):
+        """Test that the durability pragma stays on the writer connection."""
+        with WriteBehindQueue(message_service, synchronous='FULL') as writer:
+            writer.send(MessageCreate(user_id=1, message_text='durable'), timeout=5)
+
+        with db_service.engine.connect() as connection:
+            # 1 = NORMAL из профиля движка; FULL был бы 2
+            assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+
+    def test_connection_failure_keeps_writer_alive(self, db_service, message_service, monkeypatch):
+        """Test that a failed connect fails its batch and later batches are still written."""
+        engine = db_service.engine
+        connect = engine.connect
+        failures = iter([OperationalError('connect', {}, Exception('database is locked'))])
+
+        def flaky_connect():
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            return connect()
+
+        monkeypatch.setattr(engine, 'connect', flaky_connect)
+        with WriteBehindQueue(message_service, max_delay=0) as writer:
+            failed = writer.submit(MessageCreate(user_id=1, message_text='lost'))
+            with pytest.raises(OperationalError):
+                failed.result(timeout=5)
+
+            writer.send(MessageCreate(user_id=1, message_text='kept'), timeout=5)
+            writer.flush()
+
+        assert [m.message_text for m in message_service.get_all_messages()] == ['kept']
+
+    def test_send_sees_message_in_hot_tier(self, db_service, monkeypatch):
+        """Test that a read through the hot tier right after send() returns the message."""
+        tier = HotMessageTier()
+        service = MessageService(db_service, hot_tier=tier)
+        first = service.create_message(MessageCreate(user_id=1, message_text='first'))
+        service.get_user_messages(1, limit=5)  # Заполняет кольцо
+        add = tier.add
+
+        def slow_add(message):
+            time.sleep(0.05)
+            add(message)
+
+        monkeypatch.setattr(tier, 'add', slow_add)
+        with WriteBehindQueue(service, max_delay=0) as writer:
+            message_id = writer.send(MessageCreate(user_id=1, message_text='second'), timeout=5)
+            ids = [m.id for m in service.get_user_messages(1, limit=5)]
+
+        assert ids == [first.id, message_id]
+
+    def test_hot_tier_failure_keeps_batch_committed(self, db_service, monkeypatch):
+        """Test that an error after commit does not fail the futures of a written batch."""
+        tier = HotMessageTier()
+        service = MessageService(db_service, hot_tier=tier)
+
+        def broken_add(message):
+            raise RuntimeError('boom')
+
+        monkeypatch.setattr(tier, 'add', broken_add)
+        with WriteBehindQueue(service, max_delay=0) as writer:
+            message_id = writer.send(MessageCreate(user_id=1, message_text='kept'), timeout=5)
+
+        assert [m.id for m in service.get_all_messages()] == [message_id]